@@ -1,32 +1,129 @@
 # apis.py - External API integrations (Groq, Weather, Country info)
+import asyncio
 import json
-import requests
+import threading
 import time
 import logging
+from datetime import timedelta
 
+import groq
+import httpx  # installed with the groq SDK
 from langchain_groq import ChatGroq
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
-from config import GROQ_API_KEY, MODEL_NAME, MAX_CONVERSATION_HISTORY, TEMPERATURE, MAX_TOKENS_TOOL, MAX_TOKENS_GENERATION, WEATHER_API_KEY, API_DELAY_SECONDS
+from cache import TTLCache
+from circuit_breaker import get_circuit_breaker
+from daily_forecast import DailyForecast
+from deadline import record_degradation, remaining
+from errors import (
+    SERVICE_EXCEPTIONS, CircuitOpenError, DeadlineExceededError, RateLimitError, RequestError, ServiceError, ServiceTimeoutError,
+    classify_error
+)
+from hedging import Hedger
+from http_client import get_http_client
+from geocode_store import get_geocode_store
+from metrics import get_metrics
+from config import (
+    GROQ_API_KEY, MODEL_NAME, TEMPERATURE, MAX_TOKENS_TOOL, MAX_TOKENS_GENERATION, WEATHER_API_KEY,
+    WEATHER_CACHE_TTL, WEATHER_CACHE_STALE_TTL, WEATHER_CACHE_MAX_ENTRIES, WEATHER_CACHE_MAX_BYTES,
+    LLM_POOL_MAX_CONNECTIONS, LLM_POOL_MAX_KEEPALIVE, BACKEND_MODE, STAGE_MODELS,
+    WEATHER_RETRY_ATTEMPTS, WEATHER_BREAKER_FAILURES, WEATHER_BREAKER_RESET, WEATHER_HEDGE_ENABLED,
+    WEATHER_HEDGE_PERCENTILE, WEATHER_HEDGE_DEFAULT_DELAY, WEATHER_HEDGE_MIN_DELAY, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT,
+    DEADLINE_WEATHER_MIN, DEADLINE_MIN_LLM_TIMEOUT
+)
+from rate_limiter import get_rate_limiter, parse_duration
+from retry_policy import RetryPolicy
+from temporal import Period, resolve_period
+from tokens import estimate_message_tokens, estimate_tokens
+from tracing import add_tokens, set_attribute, span
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
-class LLMService:
-    def __init__(self):
-        """Initialize the Groq LLM service"""
-        self.llm = ChatGroq(
-            groq_api_key=GROQ_API_KEY,
-            model_name=MODEL_NAME,
-            temperature=TEMPERATURE,
-            max_tokens=MAX_TOKENS_TOOL  # Default to tool tokens
-        )
+def _create_chat_model(model_name: str, rate_limiter) -> ChatGroq:
+    """
+    Create a ChatGroq client whose HTTP responses feed the shared rate limiter
+    
+    Groq reports the remaining budget in x-ratelimit-* headers on every response,
+    which LangChain does not expose, so they are read with an httpx event hook.
+    """
+    def on_response(response):
+        rate_limiter.update_from_headers(response.headers)
+        if response.status_code == 429:
+            rate_limiter.on_rate_limited(parse_duration(response.headers.get("retry-after")))
+    
+    async def on_async_response(response):
+        on_response(response)
     
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=4, max=10),
-        retry=retry_if_exception_type((requests.exceptions.RequestException, Exception))
+    # RetryPolicy in LLMService is the only retry layer: the SDK's own retries would hide 429s from the fallback
+    client = groq.Groq(
+        api_key=GROQ_API_KEY,
+        max_retries=0,
+        http_client=httpx.Client(limits=_pool_limits(), event_hooks={"response": [on_response]})
     )
-    def run(self, system: str, user: str, history: list = None, max_tokens: int = None) -> str:
+    async_client = groq.AsyncGroq(
+        api_key=GROQ_API_KEY,
+        max_retries=0,
+        http_client=httpx.AsyncClient(limits=_pool_limits(), event_hooks={"response": [on_async_response]})
+    )
+    return ChatGroq(
+        groq_api_key=GROQ_API_KEY,
+        model_name=model_name,
+        temperature=TEMPERATURE,
+        max_tokens=MAX_TOKENS_TOOL,  # Default to tool tokens
+        client=client.chat.completions,
+        async_client=async_client.chat.completions
+    )
+
+def _pool_limits() -> httpx.Limits:
+    """Connection limits for the Groq HTTP clients"""
+    return httpx.Limits(max_connections=LLM_POOL_MAX_CONNECTIONS, max_keepalive_connections=LLM_POOL_MAX_KEEPALIVE)
+
+# One ChatGroq client per model, shared by every LLMService in the process
+_chat_models = {}
+_chat_models_lock = threading.Lock()
+
+def get_chat_model(model_name: str = MODEL_NAME) -> ChatGroq:
+    """Get the process-wide ChatGroq client for a model (a cassette stand-in when BACKEND_MODE is record/replay)"""
+    with _chat_models_lock:
+        if model_name not in _chat_models:
+            rate_limiter = get_rate_limiter(model_name)
+            if BACKEND_MODE == "replay":
+                from cassettes import ReplayChatModel, get_cassette
+                _chat_models[model_name] = ReplayChatModel(model_name, get_cassette("groq"), rate_limiter=rate_limiter)
+            elif BACKEND_MODE == "record":
+                from cassettes import RecordingChatModel, get_cassette
+                _chat_models[model_name] = RecordingChatModel(_create_chat_model(model_name, rate_limiter), model_name, get_cassette("groq"))
+            else:
+                _chat_models[model_name] = _create_chat_model(model_name, rate_limiter)
+        return _chat_models[model_name]
+
+class LLMService:
+    def __init__(self, model_name: str = MODEL_NAME, fallback_model_name: str = None, retry_policy: RetryPolicy = None):
+        """
+        Initialize the Groq LLM service
+        
+        The ChatGroq clients are shared and never modified; max_tokens and temperature
+        are passed with each call, so one instance can be used from many threads.
+        
+        Args:
+            model_name: Model answering the calls
+            fallback_model_name: Model the calls are downgraded to while model_name is rate limited
+            retry_policy: Retries of transient failures (a default "llm" policy if not given)
+        """
+        self.model_name = model_name
+        self.rate_limiter = get_rate_limiter(model_name)
+        self.llm = get_chat_model(model_name)
+        self.fallback_model_name = fallback_model_name if fallback_model_name and fallback_model_name != model_name else None
+        self.fallback_rate_limiter = get_rate_limiter(self.fallback_model_name) if self.fallback_model_name else None
+        self.fallback_llm = get_chat_model(self.fallback_model_name) if self.fallback_model_name else None
+        self.retry_policy = retry_policy or RetryPolicy("llm")
+    
+    @classmethod
+    def for_stage(cls, stage: str) -> "LLMService":
+        """LLMService with the model and fallback model configured for a pipeline stage (see config.STAGE_MODELS)"""
+        model_name, fallback_model_name = STAGE_MODELS[stage]
+        return cls(model_name, fallback_model_name)
+    
+    def run(self, system: str, user: str, history: list = None, max_tokens: int = None, temperature: float = None) -> str:
         """
         Generic method to run LLM with system and user messages
         
@@ -35,53 +132,301 @@ class LLMService:
             user: User message
             history: Optional conversation history
             max_tokens: Override max tokens for this call
+            temperature: Override temperature for this call
             
         Returns:
             LLM response as string
-        """
-        try:
-            # Use provided max_tokens or default
-            tokens_to_use = max_tokens if max_tokens else MAX_TOKENS_TOOL
             
-            # Update the existing LLM instance with new token limit
-            self.llm.max_tokens = tokens_to_use
-            
-            # Prepare messages for the LLM
-            messages = []
-            
-            # Add system prompt
-            messages.append({"role": "system", "content": system})
+        Raises:
+            ServiceError: RateLimitError, ServiceTimeoutError, ServerError or RequestError once retries
+                          and the fallback model are exhausted
+        """
+        # Use provided max_tokens or default
+        tokens_to_use = max_tokens if max_tokens else MAX_TOKENS_TOOL
+        messages = self._build_messages(system, user, history)
+        prompt_tokens = estimate_message_tokens(messages)
+        
+        def attempt(model_name, llm, rate_limiter):
+            # Wait only if the shared request/token budget is used up
+            with span("llm.rate_limit_wait"):
+                self._acquire(rate_limiter, prompt_tokens + tokens_to_use)
+            
+            # Get response from LLM (generation settings are per call - the client is shared)
+            try:
+                response = llm.invoke(messages, **self._call_params(tokens_to_use, temperature))
+            except Exception:
+                # A failed call gives its whole reservation back, so a burst of errors does not starve later calls
+                rate_limiter.refund(prompt_tokens + tokens_to_use)
+                raise
+            
+            # Give back the part of the completion budget that was not used
+            completion_tokens = estimate_tokens(response.content)
+            rate_limiter.refund(tokens_to_use - completion_tokens)
+            add_tokens(prompt_tokens, completion_tokens)
+            set_attribute("model", model_name)
+            return response.content.strip()
+        
+        tiers = self._tiers()
+        for i, tier in enumerate(tiers):
+            try:
+                return self.retry_policy.call(lambda: attempt(*tier), no_retry=self._no_retry(i, tiers))
+            except RateLimitError:
+                if i + 1 == len(tiers):
+                    raise
+                self._record_downgrade(tier[0], tiers[i + 1][0], "rate_limited")
+    
+    async def arun(self, system: str, user: str, history: list = None, max_tokens: int = None, temperature: float = None) -> str:
+        """
+        Async version of run() - awaits the LLM instead of blocking the thread
+        
+        Args:
+            system: System prompt
+            user: User message
+            history: Optional conversation history
+            max_tokens: Override max tokens for this call
+            temperature: Override temperature for this call
             
-            # Add conversation history if available
-            if history:
-                for msg in history[-MAX_CONVERSATION_HISTORY:]:  # Keep last N messages
-                    messages.append(msg)
+        Returns:
+            LLM response as string
             
-            # Add current user message
-            messages.append({"role": "user", "content": user})
+        Raises:
+            ServiceError: Like run()
+        """
+        tokens_to_use = max_tokens if max_tokens else MAX_TOKENS_TOOL
+        messages = self._build_messages(system, user, history)
+        prompt_tokens = estimate_message_tokens(messages)
+        
+        async def attempt(model_name, llm, rate_limiter):
+            with span("llm.rate_limit_wait"):
+                await self._aacquire(rate_limiter, prompt_tokens + tokens_to_use)
+            
+            try:
+                response = await llm.ainvoke(messages, **self._call_params(tokens_to_use, temperature))
+            except Exception:
+                rate_limiter.refund(prompt_tokens + tokens_to_use)
+                raise
+            
+            completion_tokens = estimate_tokens(response.content)
+            rate_limiter.refund(tokens_to_use - completion_tokens)
+            add_tokens(prompt_tokens, completion_tokens)
+            set_attribute("model", model_name)
+            return response.content.strip()
+        
+        tiers = self._tiers()
+        for i, tier in enumerate(tiers):
+            try:
+                return await self.retry_policy.acall(lambda: attempt(*tier), no_retry=self._no_retry(i, tiers))
+            except RateLimitError:
+                if i + 1 == len(tiers):
+                    raise
+                self._record_downgrade(tier[0], tiers[i + 1][0], "rate_limited")
+    
+    def stream(self, system: str, user: str, history: list = None, max_tokens: int = None, temperature: float = None):
+        """
+        Stream the LLM response as text chunks, as they are generated
+        
+        Failures before the first chunk are retried (and moved to the fallback
+        model on a 429); a stream that breaks off later just ends early.
+        
+        Args:
+            system: System prompt
+            user: User message
+            history: Optional conversation history
+            max_tokens: Override max tokens for this call
+            temperature: Override temperature for this call
             
-            # Get response from LLM
-            response = self.llm.invoke(messages)
+        Yields:
+            Text chunks
             
-            # Add delay to prevent rate limiting
-            time.sleep(API_DELAY_SECONDS)
+        Raises:
+            ServiceError: Like run(), if no text could be produced
+        """
+        tokens_to_use = max_tokens if max_tokens else MAX_TOKENS_TOOL
+        messages = self._build_messages(system, user, history)
+        params = self._call_params(tokens_to_use, temperature)
+        prompt_tokens = estimate_message_tokens(messages)
+        
+        received = []
+        tiers = self._tiers()
+        for i, (model_name, llm, rate_limiter) in enumerate(tiers):
+            attempt = 1
+            downgraded = False
+            while True:
+                with span("llm.rate_limit_wait"):
+                    self._acquire(rate_limiter, prompt_tokens + tokens_to_use)
+                try:
+                    for chunk in llm.stream(messages, **params):
+                        if chunk.content:
+                            received.append(chunk.content)
+                            yield chunk.content
+                    break
+                except SERVICE_EXCEPTIONS as e:
+                    if received:
+                        logger.error(f"LLM stream interrupted: {e}")
+                        break
+                    # Nothing was generated: the whole reservation goes back
+                    rate_limiter.refund(prompt_tokens + tokens_to_use)
+                    error = classify_error(e)
+                    wait = self.retry_policy.delay(attempt, error, self._no_retry(i, tiers))
+                    if wait is None:
+                        if isinstance(error, RateLimitError) and i + 1 < len(tiers):
+                            self._record_downgrade(model_name, tiers[i + 1][0], "rate_limited")
+                            downgraded = True
+                            break
+                        if error is e:
+                            raise
+                        raise error from e
+                    self.retry_policy.record_retry(attempt, error, wait)
+                    time.sleep(wait)
+                    attempt += 1
+            if downgraded:
+                continue
+            
+            completion_tokens = estimate_tokens("".join(received))
+            rate_limiter.refund(tokens_to_use - completion_tokens)
+            add_tokens(prompt_tokens, completion_tokens)
+            set_attribute("model", model_name)
+            return
+    
+    async def astream(self, system: str, user: str, history: list = None, max_tokens: int = None, temperature: float = None):
+        """
+        Async version of stream()
+        
+        Args:
+            system: System prompt
+            user: User message
+            history: Optional conversation history
+            max_tokens: Override max tokens for this call
+            temperature: Override temperature for this call
             
-            return response.content.strip()
+        Yields:
+            Text chunks
             
-        except Exception as e:
-            error_msg = str(e)
-            # Handle rate limit errors specifically
-            if "429" in error_msg or "rate limit" in error_msg.lower():
-                return "Sorry, I've reached the API rate limit. Please try again in a few minutes."
-            return f"Sorry, I encountered an error: {error_msg}"
+        Raises:
+            ServiceError: Like run(), if no text could be produced
+        """
+        tokens_to_use = max_tokens if max_tokens else MAX_TOKENS_TOOL
+        messages = self._build_messages(system, user, history)
+        params = self._call_params(tokens_to_use, temperature)
+        prompt_tokens = estimate_message_tokens(messages)
+        
+        received = []
+        tiers = self._tiers()
+        for i, (model_name, llm, rate_limiter) in enumerate(tiers):
+            attempt = 1
+            downgraded = False
+            while True:
+                with span("llm.rate_limit_wait"):
+                    await self._aacquire(rate_limiter, prompt_tokens + tokens_to_use)
+                try:
+                    async for chunk in llm.astream(messages, **params):
+                        if chunk.content:
+                            received.append(chunk.content)
+                            yield chunk.content
+                    break
+                except SERVICE_EXCEPTIONS as e:
+                    if received:
+                        logger.error(f"LLM stream interrupted: {e}")
+                        break
+                    rate_limiter.refund(prompt_tokens + tokens_to_use)
+                    error = classify_error(e)
+                    wait = self.retry_policy.delay(attempt, error, self._no_retry(i, tiers))
+                    if wait is None:
+                        if isinstance(error, RateLimitError) and i + 1 < len(tiers):
+                            self._record_downgrade(model_name, tiers[i + 1][0], "rate_limited")
+                            downgraded = True
+                            break
+                        if error is e:
+                            raise
+                        raise error from e
+                    self.retry_policy.record_retry(attempt, error, wait)
+                    await asyncio.sleep(wait)
+                    attempt += 1
+            if downgraded:
+                continue
+            
+            completion_tokens = estimate_tokens("".join(received))
+            rate_limiter.refund(tokens_to_use - completion_tokens)
+            add_tokens(prompt_tokens, completion_tokens)
+            set_attribute("model", model_name)
+            return
     
-
+    def _tiers(self) -> list:
+        """
+        Models to try for one call, in order, as (model name, client, rate limiter)
+        
+        The primary model comes first and the fallback is only used after a 429.
+        While the primary is paused by a 429, calls start on the fallback instead
+        of waiting out the pause.
+        """
+        primary = (self.model_name, self.llm, self.rate_limiter)
+        if self.fallback_llm is None:
+            return [primary]
+        fallback = (self.fallback_model_name, self.fallback_llm, self.fallback_rate_limiter)
+        if self.rate_limiter.blocked_for() > 0:
+            self._record_downgrade(self.model_name, self.fallback_model_name, "paused")
+            return [fallback, primary]
+        return [primary, fallback]
+    
+    @staticmethod
+    def _no_retry(i: int, tiers: list) -> tuple:
+        """A rate-limited model is not retried while another model can take the call"""
+        return (RateLimitError,) if i + 1 < len(tiers) else ()
+    
+    def _record_downgrade(self, model_name: str, fallback_model_name: str, reason: str):
+        """Log and count a call moved from a rate-limited model to another one"""
+        logger.warning(f"{model_name} is rate limited ({reason}), using {fallback_model_name}")
+        get_metrics().counter("travel_llm_downgrades_total", "LLM calls moved to another model because of rate limits").inc(
+            model=model_name, fallback=fallback_model_name, reason=reason)
+    
+    def _call_params(self, max_tokens: int, temperature: float = None) -> dict:
+        """Generation settings passed with a single call instead of set on the shared client"""
+        params = {"max_tokens": max_tokens}
+        if temperature is not None:
+            params["temperature"] = temperature
+        budget = self._time_budget()
+        if budget is not None:
+            # The request timeout follows the turn's deadline
+            params["timeout"] = budget
+        return params
+    
+    @staticmethod
+    def _time_budget():
+        """
+        Seconds a call may take under the running turn's deadline (None without one)
+        
+        A call is still given DEADLINE_MIN_LLM_TIMEOUT once the deadline has passed:
+        a short answer late beats no answer.
+        """
+        budget = remaining()
+        return None if budget is None else max(budget, DEADLINE_MIN_LLM_TIMEOUT)
+    
+    def _acquire(self, rate_limiter, tokens: int):
+        """Take rate limiter budget, waiting at most as long as the turn's deadline allows"""
+        if not rate_limiter.acquire(tokens, timeout=self._time_budget()):
+            raise DeadlineExceededError(f"{self.model_name}: rate limit budget not available before the deadline")
+    
+    async def _aacquire(self, rate_limiter, tokens: int):
+        """Async version of _acquire()"""
+        if not await rate_limiter.aacquire(tokens, timeout=self._time_budget()):
+            raise DeadlineExceededError(f"{self.model_name}: rate limit budget not available before the deadline")
+    
+    def _build_messages(self, system: str, user: str, history: list = None) -> list:
+        """Prepare the message list for the LLM: system prompt, recent history, user message"""
+        messages = []
+        
+        # Add system prompt
+        messages.append({"role": "system", "content": system})
+        
+        # Add conversation history if available (already windowed to the token budget by HistoryManager)
+        if history:
+            messages.extend(history)
+        
+        # Add current user message
+        messages.append({"role": "user", "content": user})
+        
+        return messages
     
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=4, max=10),
-        retry=retry_if_exception_type((requests.exceptions.RequestException, Exception))
-    )
     def run_json(self, system: str, user: str) -> dict:
         """
         Generic method to run LLM and return parsed JSON response
@@ -91,17 +436,36 @@ class LLMService:
             user: User message
             
         Returns:
-            Parsed JSON response as dictionary
+            Parsed JSON response as dictionary ({"error": ...} if the call or the parsing failed)
         """
         try:
             # Get response from LLM
             response = self.run(system, user)
-            logger.debug(f"Raw LLM Response: '{response}'")
+        except ServiceError as e:
+            return self._json_error(e)
+        return self._parse_json_response(response)
+    
+    async def arun_json(self, system: str, user: str) -> dict:
+        """
+        Async version of run_json()
+        
+        Args:
+            system: System prompt
+            user: User message
             
-            # Check if response is an error message (not JSON)
-            if response.startswith("Sorry, I've reached the API rate limit") or response.startswith("Sorry, I encountered an error"):
-                logger.error(f"API Error: {response}")
-                return {"error": "rate_limit", "message": response}
+        Returns:
+            Parsed JSON response as dictionary ({"error": ...} if the call or the parsing failed)
+        """
+        try:
+            response = await self.arun(system, user)
+        except ServiceError as e:
+            return self._json_error(e)
+        return self._parse_json_response(response)
+    
+    def _parse_json_response(self, response: str) -> dict:
+        """Extract and parse the JSON object from a raw LLM response"""
+        try:
+            logger.debug(f"Raw LLM Response: '{response}'")
             
             # Clean the response - remove any extra text before/after JSON
             response = response.strip()
@@ -128,370 +492,353 @@ class LLMService:
         except json.JSONDecodeError as e:
             logger.error(f"JSON Parse Error: {e}")
             logger.error(f"Raw response: '{response}'")
-            # Check if it's a rate limit error
-            if "429" in response or "rate limit" in response.lower():
-                return {"error": "rate_limit", "message": "API rate limit reached. Please try again in a few minutes."}
             return {"error": "JSON parse error", "raw_response": response}
-        except Exception as e:
-            logger.error(f"LLM Error: {e}")
-            error_msg = str(e)
-            if "429" in error_msg or "rate limit" in error_msg.lower():
-                return {"error": "rate_limit", "message": "API rate limit reached. Please try again in a few minutes."}
-            return {"error": "LLM error", "message": error_msg}
+    
+    def _json_error(self, e: ServiceError) -> dict:
+        """Turn a failed LLM call into an error dictionary"""
+        logger.error(f"LLM Error: {type(e).__name__}: {e}")
+        if isinstance(e, RateLimitError):
+            return {"error": "rate_limit", "message": "API rate limit reached. Please try again in a few minutes."}
+        return {"error": "LLM error", "message": str(e)}
 
 class WeatherService:
-    def __init__(self):
+    def __init__(self, http_client=None):
         """Initialize the weather service"""
         self.api_key = WEATHER_API_KEY
-        self.base_url = "https://api.openweathermap.org/data/2.5/weather"
+        self.http = http_client or get_http_client()  # Shared keep-alive connection pool
+        self.geocode_url = "https://api.openweathermap.org/geo/1.0/direct"
         self.forecast_url = "https://api.openweathermap.org/data/2.5/forecast"
-        self.cache = {}  # Simple cache for weather data
-        self.cache_duration = 300  # 5 minutes
-    
-    def _is_cache_valid(self, cache_time):
-        """Check if cache entry is still valid"""
-        return time.time() - cache_time < self.cache_duration
+        # 5-day forecasts, parsed into per-day summaries once and keyed by location (OpenWeatherMap updates them every 3 hours)
+        self.cache = TTLCache(
+            ttl=WEATHER_CACHE_TTL,
+            stale_ttl=WEATHER_CACHE_STALE_TTL,
+            max_entries=WEATHER_CACHE_MAX_ENTRIES,
+            max_bytes=WEATHER_CACHE_MAX_BYTES,
+            name="weather"
+        )
+        self.geocode_store = get_geocode_store()  # Persistent city name -> (lat, lon, country)
+        # Network geocode results for names not in the store yet (also remembers unknown names for a while)
+        self.geocode_lookups = TTLCache(ttl=WEATHER_CACHE_TTL, max_entries=WEATHER_CACHE_MAX_ENTRIES, name="geocode")
+        # While OpenWeatherMap is down, fail fast so the answer goes on without weather facts
+        self.breaker = get_circuit_breaker("weather", WEATHER_BREAKER_FAILURES, WEATHER_BREAKER_RESET)
+        # A request slower than the usual p95 gets a duplicate instead of waiting for its timeout
+        self.hedger = Hedger(
+            "weather",
+            percentile=WEATHER_HEDGE_PERCENTILE,
+            default_delay=WEATHER_HEDGE_DEFAULT_DELAY,
+            min_delay=WEATHER_HEDGE_MIN_DELAY,
+            timeout=HTTP_CONNECT_TIMEOUT + HTTP_READ_TIMEOUT,
+            enabled=WEATHER_HEDGE_ENABLED
+        )
+        self.retry_policy = RetryPolicy("weather", attempts=WEATHER_RETRY_ATTEMPTS)
     
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=2, max=8),
-        retry=retry_if_exception_type((requests.exceptions.RequestException, Exception))
-    )
     def get_weather(self, city: str, weather_type: str = "current", when: str = None) -> dict:
         """
         Get weather data for a specific city
         
+        The 5-day forecast for a location is fetched once, summarized per local
+        day and cached; current, forecast and climate views are all read from
+        those summaries. A `when` that resolves to dates picks the view itself:
+        a range the forecast reaches gets its days, anything further out or
+        longer gets the climate view.
+        
         Args:
             city: City name
-            weather_type: "current" for current weather, "climate" for seasonal info
+            weather_type: "current", "forecast" (e.g. tomorrow) or "climate" for seasonal info
+            when: Optional time reference from the router ("tomorrow", "next Tuesday", "mid-July", ...)
             
         Returns:
             Weather data dictionary
         """
-        # Check cache first
-        cache_key = f"{city}_{weather_type}"
-        if cache_key in self.cache:
-            cache_time, cached_data = self.cache[cache_key]
-            if self._is_cache_valid(cache_time):
-                logger.info(f"Using cached weather data for {city}")
-                return cached_data
-        
-        # Always use weather API - it can handle current, forecast, and historical data
-        return self._get_weather_data(city, weather_type, when)
-    
-    def _get_weather_data(self, city: str, weather_type: str, when: str = None) -> dict:
-        """
-        Unified weather data method that handles current, forecast, and climate data
-        """
         try:
-            # First, get coordinates for the city
-            geocode_url = "https://api.openweathermap.org/geo/1.0/direct"
-            geocode_params = {
-                'q': city,
-                'limit': 1,
-                'appid': self.api_key
-            }
-            
-            geocode_response = requests.get(geocode_url, params=geocode_params, timeout=10)
-            geocode_response.raise_for_status()
-            geocode_data = geocode_response.json()
-            
-            if not geocode_data:
+            with span("weather.geocode", city=city):
+                location = self._geocode(city)
+            if not location:
                 return {
                     'city': city,
                     'type': weather_type,
                     'message': f"Could not find location data for {city}. Please check local weather services."
                 }
             
-            lat = geocode_data[0]['lat']
-            lon = geocode_data[0]['lon']
-            country = geocode_data[0].get('country', 'Unknown')
+            lat, lon, country = location
+            with span("weather.forecast"):
+                forecast = self._get_forecast(lat, lon)
             
-            # Determine what type of weather data to fetch
-            if weather_type == "current":
-                return self._get_current_weather_data(lat, lon, city, country)
-            elif weather_type == "forecast":
-                return self._get_forecast_weather_data(lat, lon, city, country, when)
-            elif weather_type == "climate":
-                return self._get_climate_weather_data(lat, lon, city, country, when)
-            else:
-                # Default to current weather
-                return self._get_current_weather_data(lat, lon, city, country)
-                
-        except requests.exceptions.Timeout:
+        except CircuitOpenError:
+            logger.info(f"Weather circuit breaker open, answering without weather for {city}")
+            return self._fetch_error(city, weather_type, "api_error")
+        except DeadlineExceededError:
+            return self._fetch_error(city, weather_type, "deadline")
+        except ServiceTimeoutError:
             logger.warning(f"Weather API timeout for {city}")
-            return {
-                'city': city,
-                'type': weather_type,
-                'message': f"Weather data temporarily unavailable for {city}. Please check local weather services."
-            }
-        except requests.exceptions.RequestException as e:
+            return self._fetch_error(city, weather_type, "timeout")
+        except ServiceError as e:
+            if isinstance(e, RequestError) and e.status_code == 404:
+                logger.warning(f"City not found: {city}")
+                return self._fetch_error(city, weather_type, "not_found")
             logger.error(f"Weather API Error: {e}")
-            return {
-                'city': city,
-                'type': weather_type,
-                'message': f"Weather data unavailable for {city}. Please check local weather services."
-            }
+            return self._fetch_error(city, weather_type, "api_error")
         except Exception as e:
             logger.error(f"Weather Error: {e}")
-            return {
-                'city': city,
-                'type': weather_type,
-                'message': f"Weather data unavailable for {city}. Please check local weather services."
-            }
+            return self._fetch_error(city, weather_type, "unknown")
+        
+        # Dates are resolved against the city's own calendar
+        today = forecast.today()
+        period = resolve_period(when, today) if when else None
+        if period is not None:
+            mode = period.mode(today, forecast.dates[-1] if forecast.dates else None)
+            if mode != weather_type:
+                logger.debug(f"'{when}' is {period.start}..{period.end}: {mode} instead of {weather_type}")
+                weather_type = mode
+        
+        if weather_type == "forecast":
+            return self._forecast_view(forecast, city, country, when, period)
+        elif weather_type == "climate":
+            return self._climate_view(forecast, city, country, when, period, southern=lat < 0)
+        else:
+            # Default to current weather
+            return self._current_view(forecast, city, country)
     
-    def _get_current_weather_data(self, lat: float, lon: float, city: str, country: str) -> dict:
-        """Get current weather data"""
-        try:
-            params = {
-                'lat': lat,
-                'lon': lon,
-                'appid': self.api_key,
-                'units': 'metric'
-            }
-            
-            response = requests.get(self.base_url, params=params, timeout=10)
+    async def aget_weather(self, city: str, weather_type: str = "current", when: str = None) -> dict:
+        """
+        Async version of get_weather()
+        
+        The HTTP calls are made with requests, so they run in a worker thread
+        to keep the event loop free for other conversations.
+        """
+        return await asyncio.to_thread(self.get_weather, city, weather_type, when)
+    
+    def _geocode(self, city: str):
+        """Resolve a city name to (lat, lon, country), or None if it is unknown"""
+        # Most cities are already in the persistent store, which saves a round trip
+        location = self.geocode_store.get(city)
+        if location:
+            set_attribute("source", "store")
+            return location
+        
+        set_attribute("source", "network")
+        # Concurrent lookups of the same unknown city share one request
+        key = self.geocode_store.canonical_key(city)
+        return self.geocode_lookups.get_or_load(key, lambda: self._fetch_geocode(city))
+    
+    def _fetch_geocode(self, city: str):
+        """Resolve a city name over the network and remember the result"""
+        geocode_params = {
+            'q': city,
+            'limit': 1,
+            'appid': self.api_key
+        }
+        
+        with span("weather.geocode_fetch"):
+            geocode_data = self._get_json(self.geocode_url, geocode_params)
+        
+        if not geocode_data:
+            return None
+        
+        location = (geocode_data[0]['lat'], geocode_data[0]['lon'], geocode_data[0].get('country', 'Unknown'))
+        self.geocode_store.put(city, *location)
+        return location
+    
+    def _get_forecast(self, lat: float, lon: float) -> DailyForecast:
+        """
+        Get the 5-day / 3-hour forecast for a location, summarized per local day
+        
+        Concurrent misses for the same location share one request, and an
+        expired entry is served while a background refresh fetches a new one.
+        The payload is parsed only when it is fetched, not per question.
+        """
+        # Every mode reads the same forecast, so the key is the location only
+        cache_key = self._cache_key(lat, lon)
+        return self.cache.get_or_load(cache_key, lambda: DailyForecast(self._fetch_forecast_payload(lat, lon)))
+    
+    def _cache_key(self, lat: float, lon: float) -> str:
+        """Cache key for a location's forecast payload"""
+        return f"forecast:{lat:.4f},{lon:.4f}"
+    
+    def _fetch_forecast_payload(self, lat: float, lon: float) -> dict:
+        """Fetch the raw forecast payload from OpenWeatherMap"""
+        logger.info(f"Fetching forecast for {lat:.4f},{lon:.4f}")
+        forecast_params = {
+            'lat': lat,
+            'lon': lon,
+            'appid': self.api_key,
+            'units': 'metric'
+        }
+        
+        with span("weather.fetch"):
+            return self._get_json(self.forecast_url, forecast_params)
+    
+    def _get_json(self, url: str, params: dict):
+        """
+        GET a JSON document from OpenWeatherMap
+        
+        The request goes through the circuit breaker, is retried once on a
+        transient failure and hedged when it runs past the usual latency.
+        Under a deadline, its timeout is what is left of the turn's budget,
+        and it is not sent at all once less than DEADLINE_WEATHER_MIN is left.
+        
+        Raises:
+            CircuitOpenError: The breaker is open; no request was sent
+            DeadlineExceededError: Too little of the turn's budget is left; no request was sent
+            ServiceError: The typed error of the failed request
+        """
+        budget = remaining()
+        if budget is not None and budget < DEADLINE_WEATHER_MIN:
+            record_degradation("weather", "skipped")
+            raise DeadlineExceededError(f"Only {budget:.2f}s left for GET {url}")
+        
+        def fetch():
+            response = self.http.get(url, params=params, timeout=self._timeout())
             response.raise_for_status()
-            
-            data = response.json()
-            
-            # Extract relevant weather information
-            weather_info = {
-                'city': data['name'],
-                'country': data['sys']['country'],
-                'temperature': data['main']['temp'],
-                'description': data['weather'][0]['description'],
-                'humidity': data['main']['humidity'],
-                'wind_speed': data['wind']['speed'],
-                'type': 'current'
-            }
-            
-            # Cache the result
-            self.cache[f"{city}_current"] = (time.time(), weather_info)
-            
-            return weather_info
-            
-        except requests.exceptions.Timeout:
-            logger.warning(f"Weather API timeout for {city}")
-            return {"error": "timeout", "message": "The forecast service seems to be overloaded—we'll try again in a moment or continue without weather data."}
-        except requests.exceptions.RequestException as e:
-            if "404" in str(e):
-                logger.warning(f"City not found: {city}")
-                return {"error": "not_found", "message": f"I couldn't find the city '{city}'. Would you like to try an English name or a more precise name?"}
-            else:
-                logger.error(f"Weather API Error: {e}")
-                return {"error": "api_error", "message": "Weather service temporarily unavailable."}
-        except Exception as e:
-            logger.error(f"Weather Error: {e}")
-            return {"error": "unknown", "message": "Weather data unavailable."}
+            return response.json()
+        
+        def hedged():
+            timeout = self._timeout()
+            return self.hedger.call(fetch, timeout=sum(timeout) if timeout else None)
+        
+        return self.breaker.call(lambda: self.retry_policy.call(hedged))
     
-    def _get_forecast_weather_data(self, lat: float, lon: float, city: str, country: str, when: str = None) -> dict:
-        """Get forecast weather data for specific future days like 'tomorrow'"""
-        try:
-            # Use OpenWeatherMap forecast API for specific future days
-            forecast_params = {
-                'lat': lat,
-                'lon': lon,
-                'appid': self.api_key,
-                'units': 'metric'
-            }
-            
-            forecast_response = requests.get(self.forecast_url, params=forecast_params, timeout=10)
-            forecast_response.raise_for_status()
-            forecast_data = forecast_response.json()
-            
-            if 'list' in forecast_data and forecast_data['list']:
-                forecasts = forecast_data['list']
-                
-                # Handle specific time requests like "tomorrow"
-                if when:
-                    when_lower = when.lower().strip()
-                    
-                    if when_lower in ['tomorrow', 'next day']:
-                        # Get tomorrow's forecast (next 24-48 hours)
-                        tomorrow_forecasts = forecasts[8:16]  # Next day (8 * 3-hour intervals = 24 hours)
-                        
-                        if tomorrow_forecasts:
-                            # Calculate average temperature and find most common weather
-                            temps = [f['main']['temp'] for f in tomorrow_forecasts]
-                            descriptions = [f['weather'][0]['description'] for f in tomorrow_forecasts]
-                            humidities = [f['main']['humidity'] for f in tomorrow_forecasts]
-                            
-                            avg_temp = sum(temps) / len(temps)
-                            most_common_desc = max(set(descriptions), key=descriptions.count)
-                            avg_humidity = sum(humidities) / len(humidities)
-                            
-                            # Get min/max temps
-                            min_temp = min(temps)
-                            max_temp = max(temps)
-                            
-                            weather_info = {
-                                'city': city,
-                                'country': country,
-                                'type': 'forecast',
-                                'temperature': round(avg_temp, 1),
-                                'min_temp': round(min_temp, 1),
-                                'max_temp': round(max_temp, 1),
-                                'description': most_common_desc,
-                                'humidity': round(avg_humidity),
-                                'when': when,
-                                'message': f"Tomorrow's forecast for {city}"
-                            }
-                            
-                            # Cache the result
-                            cache_key = f"{city}_forecast_{when}"
-                            self.cache[cache_key] = (time.time(), weather_info)
-                            
-                            return weather_info
-                    else:
-                        # For other specific days, provide general forecast info
-                        avg_temp = sum(f['main']['temp'] for f in forecasts[:8]) / 8
-                        descriptions = [f['weather'][0]['description'] for f in forecasts[:8]]
-                        most_common_desc = max(set(descriptions), key=descriptions.count)
-                        
-                        return {
-                            'city': city,
-                            'country': country,
-                            'type': 'forecast',
-                            'temperature': round(avg_temp, 1),
-                            'description': most_common_desc,
-                            'when': when,
-                            'message': f"Forecast for {when} in {city}"
-                        }
-                else:
-                    # No specific time mentioned, provide next 24 hours
-                    next_24h = forecasts[:8]  # Next 24 hours
-                    avg_temp = sum(f['main']['temp'] for f in next_24h) / len(next_24h)
-                    descriptions = [f['weather'][0]['description'] for f in next_24h]
-                    most_common_desc = max(set(descriptions), key=descriptions.count)
-                    
-                    return {
-                        'city': city,
-                        'country': country,
-                        'type': 'forecast',
-                        'temperature': round(avg_temp, 1),
-                        'description': most_common_desc,
-                        'message': f"Next 24 hours forecast for {city}"
-                    }
+    def _timeout(self):
+        """(connect, read) timeout of one request, the read part cut to what is left of the turn's deadline"""
+        budget = remaining()
+        if budget is None:
+            return None  # The client's default
+        return (HTTP_CONNECT_TIMEOUT, max(0.1, min(HTTP_READ_TIMEOUT, budget)))
+    
+    def _fetch_error(self, city: str, weather_type: str, kind: str) -> dict:
+        """Error result for a failed fetch, in the shape each view returned before"""
+        if kind == "deadline":
+            # Not a failure of the service: the answer just goes on without weather
+            return {"error": "deadline", "message": "Weather lookup skipped to answer in time."}
+        if weather_type == "climate":
+            if kind == "timeout":
+                message = f"Forecast data temporarily unavailable for {city}. Please check local weather services."
             else:
-                return {
-                    'city': city,
-                    'type': 'forecast',
-                    'message': f"Forecast data unavailable for {city}. Please check local weather services."
-                }
-                
-        except requests.exceptions.Timeout:
-            logger.warning(f"Forecast API timeout for {city}")
+                message = f"Forecast data unavailable for {city}. Please check local weather services."
+            return {'city': city, 'type': 'climate', 'message': message}
+        
+        if kind == "timeout":
             return {"error": "timeout", "message": "The forecast service seems to be overloaded—we'll try again in a moment or continue without weather data."}
-        except requests.exceptions.RequestException as e:
-            if "404" in str(e):
-                logger.warning(f"City not found: {city}")
-                return {"error": "not_found", "message": f"I couldn't find the city '{city}'. Would you like to try an English name or a more precise name?"}
-            else:
-                logger.error(f"Forecast API Error: {e}")
-                return {"error": "api_error", "message": "Forecast service temporarily unavailable."}
-        except Exception as e:
-            logger.error(f"Forecast Error: {e}")
-            return {"error": "unknown", "message": "Forecast data unavailable."}
+        if kind == "not_found":
+            return {"error": "not_found", "message": f"I couldn't find the city '{city}'. Would you like to try an English name or a more precise name?"}
+        if kind == "api_error":
+            return {"error": "api_error", "message": "Weather service temporarily unavailable."}
+        return {"error": "unknown", "message": "Weather data unavailable."}
     
-    def _get_climate_weather_data(self, lat: float, lon: float, city: str, country: str, when: str = None) -> dict:
-        """Get seasonal snapshot information using OpenWeatherMap forecast API"""
-        try:
-            # Use the provided lat, lon directly (no duplicate geocoding)
-            # Use OpenWeatherMap forecast API for seasonal snapshot data
-            forecast_params = {
-                'lat': lat,
-                'lon': lon,
-                'appid': self.api_key,
-                'units': 'metric'
-            }
-            
-            forecast_response = requests.get(self.forecast_url, params=forecast_params, timeout=10)
-            forecast_response.raise_for_status()
-            forecast_data = forecast_response.json()
-            
-            if 'list' in forecast_data and forecast_data['list']:
-                # Analyze forecast data
-                forecasts = forecast_data['list']
-                
-                # If a specific time period is mentioned, provide relevant information
-                if when:
-                    when_lower = when.lower().strip()
-                    
-                    # Check for specific months/seasons
-                    month_seasons = {
-                        'january': 'winter', 'jan': 'winter',
-                        'february': 'winter', 'feb': 'winter', 
-                        'march': 'spring', 'mar': 'spring',
-                        'april': 'spring', 'apr': 'spring',
-                        'may': 'spring',
-                        'june': 'summer', 'jun': 'summer',
-                        'july': 'summer', 'jul': 'summer',
-                        'august': 'summer', 'aug': 'summer',
-                        'september': 'autumn', 'sep': 'autumn', 'sept': 'autumn',
-                        'october': 'autumn', 'oct': 'autumn',
-                        'november': 'autumn', 'nov': 'autumn',
-                        'december': 'winter', 'dec': 'winter',
-                        'winter': 'winter', 'spring': 'spring', 'summer': 'summer', 'autumn': 'autumn', 'fall': 'autumn'
-                    }
-                    
-                    for month_key, season in month_seasons.items():
-                        if month_key in when_lower:
-                            # Provide general seasonal information
-                            season_info = {
-                                'winter': 'cold weather, possible snow',
-                                'spring': 'mild temperatures, occasional rain',
-                                'summer': 'warm to hot weather, generally dry',
-                                'autumn': 'cooling temperatures, variable weather'
-                            }
-                            
-                            message = f"{when.title()} in {city} typically has {season_info.get(season, 'variable weather')}; this is a seasonal snapshot based on forecast data."
-                            break
-                    else:
-                        # Default message if no season/month found
-                        message = f"Weather information for {when} in {city} is available; this is a seasonal snapshot based on forecast data."
-                else:
-                    # Default: provide general forecast information
-                    avg_temp = sum(f['main']['temp'] for f in forecasts[:8]) / 8  # Average of next 24 hours
-                    descriptions = [f['weather'][0]['description'] for f in forecasts[:8]]
-                    most_common_desc = max(set(descriptions), key=descriptions.count)
-                    message = f"Next few days in {city}: {avg_temp:.1f}°C average, {most_common_desc}; this is a seasonal snapshot based on forecast data."
-            else:
-                message = f"Weather data for {city} is available; check local sources for specific conditions."
-            
-            result = {
-                'city': city,
-                'country': country,
-                'type': 'climate',
-                'message': message
-            }
-            
-            # Cache the result
-            self.cache[f"{city}_climate"] = (time.time(), result)
-            
-            return result
-            
-        except requests.exceptions.Timeout:
-            logger.warning(f"Forecast API timeout for {city}")
-            return {
-                'city': city,
-                'type': 'climate',
-                'message': f"Forecast data temporarily unavailable for {city}. Please check local weather services."
-            }
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Forecast API Error: {e}")
-            return {
-                'city': city,
-                'type': 'climate',
-                'message': f"Forecast data unavailable for {city}. Please check local weather services."
-            }
-        except Exception as e:
-            logger.error(f"Forecast Error: {e}")
+    def _current_view(self, forecast: DailyForecast, city: str, country: str) -> dict:
+        """Current conditions, taken from the forecast slot nearest to now"""
+        now = forecast.nearest()
+        if now is None:
+            return {"error": "unknown", "message": "Weather data unavailable."}
+        
+        return {
+            'city': city,
+            'country': country,
+            'temperature': now['temperature'],
+            'description': now['description'],
+            'humidity': now['humidity'],
+            'wind_speed': now['wind_speed'],
+            'precipitation_chance': now['precipitation_chance'],
+            'type': 'current'
+        }
+    
+    def _forecast_view(self, forecast: DailyForecast, city: str, country: str, when: str = None, period: Period = None) -> dict:
+        """Forecast for specific future days like 'tomorrow' or 'next 3 days', from the per-day summaries"""
+        if not len(forecast):
             return {
                 'city': city,
-                'type': 'climate',
+                'type': 'forecast',
                 'message': f"Forecast data unavailable for {city}. Please check local weather services."
             }
-
-
-
+        
+        today = forecast.today()
+        summary = None
+        
+        if period is not None:
+            # The days of the range the forecast covers, in the city's own time zone
+            summary = forecast.days(period.start, period.end)
+            if period.start == period.end == today + timedelta(days=1):
+                message = f"Tomorrow's forecast for {city}"
+            elif period.start == today and period.days > 1:
+                message = f"Next {period.days} days forecast for {city}"
+            elif period.days == 1:
+                message = f"Forecast for {period.start:%A %d %B} in {city}"
+            else:
+                message = f"Forecast for {period.text} in {city}"
+            if summary is not None and summary['last_date'] < period.end.isoformat():
+                message += f" (the forecast reaches {summary['last_date']})"
+        elif when:
+            # For other specific days, provide general forecast info
+            message = f"Forecast for {when} in {city}"
+        else:
+            # No specific time mentioned, provide next 24 hours
+            message = f"Next 24 hours forecast for {city}"
+        
+        detailed = summary is not None
+        if summary is None:
+            summary = forecast.window(max(time.time(), float(forecast.times[0])), 24)
+        if summary is None:
+            # A stale payload has no slot from now on: the latest one is the best there is
+            summary = forecast.nearest()
+            message += " (the forecast does not cover the coming hours; showing the latest available data)"
+        
+        weather_info = {
+            'city': city,
+            'country': country,
+            'type': 'forecast',
+            'temperature': summary['temperature'],
+            'description': summary['description'],
+            'message': message
+        }
+        if when:
+            weather_info['when'] = when
+        if detailed:
+            weather_info.update(
+                min_temp=summary['min_temp'],
+                max_temp=summary['max_temp'],
+                humidity=summary['humidity'],
+                precipitation_chance=summary['precipitation_chance'],
+                wind_speed=summary['wind_speed']
+            )
+            if len(summary['days']) > 1:
+                weather_info['days'] = summary['days']
+        
+        return weather_info
+    
+    def _climate_view(self, forecast: DailyForecast, city: str, country: str, when: str = None,
+                      period: Period = None, southern: bool = False) -> dict:
+        """Seasonal snapshot information based on the forecast"""
+        if len(forecast):
+            # If a specific time period is mentioned, provide relevant information
+            if period is not None:
+                # The season the user named, or the one the dates fall in at the city's hemisphere
+                season = period.season_in(southern)
+                season_info = {
+                    'winter': 'cold weather, possible snow',
+                    'spring': 'mild temperatures, occasional rain',
+                    'summer': 'warm to hot weather, generally dry',
+                    'autumn': 'cooling temperatures, variable weather'
+                }
+                named = when.title() if period.season else f"{when.title()} ({season})"
+                message = f"{named} in {city} typically has {season_info[season]}; this is a seasonal snapshot based on forecast data."
+            elif when:
+                # Default message if the time reference is not recognized
+                message = f"Weather information for {when} in {city} is available; this is a seasonal snapshot based on forecast data."
+            else:
+                # Default: provide general forecast information
+                summary = forecast.window(max(time.time(), float(forecast.times[0])), 24)  # Next 24 hours
+                if summary is not None:
+                    message = f"Next few days in {city}: {summary['temperature']:.1f}°C average, {summary['description']}; this is a seasonal snapshot based on forecast data."
+                else:
+                    # A stale payload has no slot from now on
+                    summary = forecast.nearest()
+                    message = f"Latest available data for {city}: {summary['temperature']:.1f}°C, {summary['description']}; the forecast does not cover the coming days."
+        else:
+            message = f"Weather data for {city} is available; check local sources for specific conditions."
+        
+        return {
+            'city': city,
+            'country': country,
+            'type': 'climate',
+            'message': message
+        }
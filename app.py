@@ -2,7 +2,7 @@
 import streamlit as st
 import logging
 from assistant import TravelAssistant
-import os
+from services import get_shared_services
 
 # --- Page Configuration (do this first) ---
 st.set_page_config(
@@ -36,18 +36,21 @@ st.markdown("""
 
 
 # --- State Management ---
-# Initialize the TravelAssistant object and message history in the session state.
-# This is crucial to ensure the assistant remembers the conversation across reruns.
+# Heavy services (LLM clients, weather service, caches) are created once per process and
+# shared by every browser session. Each session gets its own lightweight TravelAssistant,
+# so users never see each other's conversation and nobody pays re-initialization costs.
 @st.cache_resource
-def get_assistant():
-    """Initialize and cache the Travel Assistant to be used across the session."""
-    return TravelAssistant()
+def get_services():
+    """Initialize the shared services once for all sessions."""
+    return get_shared_services()
 
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
-# Load the assistant from the cache
-assistant = get_assistant()
+if "assistant" not in st.session_state:
+    st.session_state.assistant = TravelAssistant(services=get_services())
+
+assistant = st.session_state.assistant
 
 
 # --- Sidebar ---
@@ -55,8 +58,8 @@ with st.sidebar:
     # Clear conversation button
     if st.button("🗑️ New Conversation", help="Clear the chat history and start fresh."):
         st.session_state.messages = []
-        # We need to re-initialize the assistant to clear its internal history too
-        st.cache_resource.clear()
+        # Only this session's conversation is reset; shared services stay warm
+        assistant.clear_history()
         st.rerun()
     
     st.markdown("---")
@@ -76,8 +79,8 @@ with st.sidebar:
     # Settings
     reasoning_mode = st.toggle("Show Assistant's Reasoning", help="When enabled, the assistant will show its step-by-step thinking process for complex questions.")
     
-    # Set environment variable based on the toggle state for the assistant to use
-    os.environ["SHOW_CHAIN_OF_THOUGHT"] = "true" if reasoning_mode else "false"
+    # The toggle belongs to this browser session only (other sessions share the process)
+    assistant.session.show_chain_of_thought = reasoning_mode
 
 
 # --- Main Chat Interface ---
@@ -98,17 +101,22 @@ if prompt := st.chat_input("Ask me about destinations, packing, or weather..."):
 
     # Display assistant response in chat message container
     with st.chat_message("assistant"):
-        with st.spinner("Thinking..."):
-            try:
-                if assistant:
-                    response = assistant.get_response(prompt)
-                    st.markdown(response)
-                else:
-                    response = "Sorry, the assistant could not be initialized. Please check your API keys."
-                    st.error(response)
-            except Exception as e:
-                response = f"An unexpected error occurred: {str(e)}"
-                st.error(response)
+        placeholder = st.empty()
+        placeholder.markdown("_Thinking..._")
+        try:
+            if assistant:
+                # Render tokens as they arrive, with a cursor until the answer is complete
+                response = ""
+                for chunk in assistant.stream_response(prompt):
+                    response += chunk
+                    placeholder.markdown(response + "▌")
+                placeholder.markdown(response)
+            else:
+                response = "Sorry, the assistant could not be initialized. Please check your API keys."
+                placeholder.error(response)
+        except Exception as e:
+            response = f"An unexpected error occurred: {str(e)}"
+            placeholder.error(response)
     
     # Add assistant response to chat history
     st.session_state.messages.append({"role": "assistant", "content": response})
@@ -1,8 +1,18 @@
 # assistant.py - Main Travel Assistant class and conversation management
 import logging
-from apis import LLMService, WeatherService  # TripAdvisorService disabled
-from router import Router
-from config import MAX_CONVERSATION_HISTORY, MAX_TOKENS_GENERATION, MAX_TOKENS_DEBUG, SHOW_CHAIN_OF_THOUGHT
+import time
+from concurrent.futures import ThreadPoolExecutor
+from deadline import deadline_scope, record_degradation, remaining
+from errors import ServiceError
+from geocode_store import get_geocode_store
+from router import FALLBACK_REASONS, RATE_LIMIT_FALLBACK_REASON
+from services import AssistantServices, get_shared_services
+from session import ConversationSession
+from tracing import current_trace, set_attribute, span, start_trace
+from config import (
+    BATCH_MAX_WORKERS, MAX_TOKENS_GENERATION, MAX_TOKENS_DEBUG, TURN_DEADLINE,
+    DEADLINE_FIRST_TOKEN_SECONDS, DEADLINE_TOKENS_PER_SECOND, DEADLINE_MIN_TOKENS
+)
 from prompts import (
     DESTINATION_SYSTEM_PROMPT, COMPLEX_REASONING_PROMPT, NORMAL_MODE_INSTRUCTIONS, DEBUG_MODE_INSTRUCTIONS, 
     PACKING_SYSTEM_PROMPT, ATTRACTIONS_SYSTEM_PROMPT, WEATHER_SYSTEM_PROMPT, FALLBACK_SYSTEM_PROMPT
@@ -11,13 +21,25 @@ from prompts import (
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# Shown instead of a provider error in the final answer
+HIGH_DEMAND_MESSAGE = "I'm experiencing high demand right now. Please try again in a few minutes, or feel free to ask a more specific question about your travel plans."
+
 class TravelAssistant:
-    def __init__(self):
-        """Initialize the travel assistant"""
-        self.llm_service = LLMService()
-        self.weather_service = WeatherService()
-        self.router = Router()
-        self.conversation_history = []
+    def __init__(self, services: AssistantServices = None, session: ConversationSession = None):
+        """
+        Initialize the travel assistant for one conversation
+        
+        Args:
+            services: Shared LLM/weather/router/cache services (process-wide ones by default)
+            session: Conversation state (a new, empty session by default)
+        """
+        self.services = services or get_shared_services()
+        self.session = session or ConversationSession()
+        self.llm_service = self.services.llm_service
+        self.weather_service = self.services.weather_service
+        self.router = self.services.router
+        self.response_cache = self.services.response_cache
+        self.history_manager = self.services.history_manager
         
         # Category to system prompt mapping
         self.prompt_map = {
@@ -29,10 +51,27 @@ class TravelAssistant:
             "GENERAL": FALLBACK_SYSTEM_PROMPT
         }
     
+    @property
+    def conversation_history(self) -> list:
+        """Messages of this conversation (stored on the session)"""
+        return self.session.history
+    
+    @conversation_history.setter
+    def conversation_history(self, history: list):
+        self.session.history = history
+    
+    @property
+    def last_timing(self) -> dict:
+        """Time-to-first-token and total time of the last request"""
+        return self.session.last_timing
+    
+    @last_timing.setter
+    def last_timing(self, timing: dict):
+        self.session.last_timing = timing
+    
     def _get_complex_reasoning_prompt(self, user_message: str):
         """Get the unified complex reasoning prompt with appropriate formatting based on debug mode"""
-        import os
-        is_debug_mode = os.getenv("SHOW_CHAIN_OF_THOUGHT", "false").lower() == "true"
+        is_debug_mode = self.session.show_chain_of_thought
         
         # Select the appropriate formatting instructions
         output_instructions = DEBUG_MODE_INSTRUCTIONS if is_debug_mode else NORMAL_MODE_INSTRUCTIONS
@@ -46,88 +85,452 @@ class TravelAssistant:
         return final_prompt
     
     def add_to_history(self, role: str, content: str):
-        """Add a message to conversation history"""
-        self.conversation_history.append({"role": role, "content": content})
-        
-        # Keep only the last N messages to manage context length
-        if len(self.conversation_history) > MAX_CONVERSATION_HISTORY * 2:  # *2 for user+assistant pairs
-            self.conversation_history = self.conversation_history[-MAX_CONVERSATION_HISTORY * 2:]
+        """Add a message to conversation history (older turns are summarized once it exceeds the token budget)"""
+        self.history_manager.append(self.session, role, content)
     
-    def get_response(self, user_message: str) -> str:
+    def get_response(self, user_message: str, deadline: float = None) -> str:
         """
         Get a response from the assistant with question classification and weather integration
         
         Args:
             user_message: The user's input message
+            deadline: Latency budget of the turn in seconds (TURN_DEADLINE if not given, 0 for none).
+                      With little time left, the router uses only cached analyses, weather is
+                      only read from the cache and the answer is kept shorter.
             
         Returns:
             Assistant's response
         """
+        return "".join(self.stream_response(user_message, deadline))
+    
+    def get_responses(self, requests: list, max_workers: int = BATCH_MAX_WORKERS, sessions: dict = None, deadline: float = None) -> list:
+        """
+        Answer many messages at once, running different conversations in parallel
+        
+        Messages of the same session are answered one after another, in the
+        order given, so later turns see the earlier ones in their history.
+        Different sessions run concurrently on up to `max_workers` threads and
+        share the process-wide services, so duplicate questions in the batch
+        share one router analysis and one weather lookup (their caches load
+        each key only once, even under concurrency). The LLM rate limiter still
+        paces the actual API calls.
+        
+        Args:
+            requests: List of (session_id, message) pairs
+            max_workers: Maximum number of sessions answered at the same time
+            sessions: Optional {session_id: ConversationSession} to continue (and keep)
+                      conversations across batches; this assistant's own session
+                      is used for its session_id
+            deadline: Latency budget of each turn in seconds (see get_response())
+            
+        Returns:
+            Responses in the same order as `requests`
+        """
+        sessions = {} if sessions is None else sessions
+        sessions.setdefault(self.session.session_id, self.session)
+        
+        # One queue of (position, message) per session, in request order
+        queues = {}
+        for position, (session_id, message) in enumerate(requests):
+            queues.setdefault(session_id, []).append((position, message))
+        for session_id in queues:
+            if session_id not in sessions:
+                sessions[session_id] = ConversationSession(session_id)
+        
+        responses = [None] * len(requests)
+        
+        def answer_session(session_id: str):
+            assistant = TravelAssistant(services=self.services, session=sessions[session_id])
+            for position, message in queues[session_id]:
+                try:
+                    responses[position] = assistant.get_response(message, deadline)
+                except Exception as e:
+                    # One failing turn must not stop the rest of the batch
+                    logger.error(f"Batch request failed for session {session_id}: {e}")
+                    sessions[session_id].last_error = e
+                    responses[position] = f"Sorry, I encountered an error: {str(e)}"
+        
+        start_time = time.perf_counter()
+        workers = max(1, min(max_workers, len(queues)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="batch") as executor:
+            list(executor.map(answer_session, queues))
+        logger.info(f"Batch: {len(requests)} messages in {len(queues)} sessions answered in {time.perf_counter() - start_time:.2f}s ({workers} workers)")
+        return responses
+    
+    def stream_response(self, user_message: str, deadline: float = None):
+        """
+        Get the assistant's response as a stream of text chunks
+        
+        Runs the same pipeline as get_response() but yields the final answer
+        while it is being generated. Time-to-first-token and total time are
+        logged and kept in self.last_timing.
+        
+        Args:
+            user_message: The user's input message
+            deadline: Latency budget of the turn in seconds (see get_response())
+            
+        Yields:
+            Chunks of the assistant's response
+        """
+        with start_trace("get_response", session_id=self.session.session_id) as trace, self._deadline(deadline, trace):
+            for chunk in self._stream_turn(user_message):
+                yield chunk
+    
+    def _stream_turn(self, user_message: str):
+        """One traced turn of stream_response(); every stage is recorded as a span"""
+        start_time = time.perf_counter()
+        first_turn = not self.conversation_history
+        self.session.last_error = None
         logger.info(f"User Input: '{user_message}'")
         
         # Step 1: Unified analysis (classification, weather decision, location extraction)
         logger.info("Step 1: Analyzing question...")
-        analysis = self.router.analyze_question(user_message, self.conversation_history)
-        logger.info(f"Category: {analysis['category']}, Weather: {analysis['needs_weather']} ({analysis['mode']}), Location: {analysis.get('city', analysis.get('country', 'unknown'))}, Clarification: {analysis['needs_clarification']}")
-        
-        # Check for rate limit error in analysis
-        if analysis.get('reason') == 'Rate limit error - using fallback analysis':
-            logger.error("Rate limit error detected, using fallback analysis")
-            # Continue with the fallback analysis instead of returning error
+        with span("analysis"):
+            analysis = self.router.analyze_question(user_message, self.session.state)
+        self.session.last_analysis = analysis
+        self._log_analysis(analysis)
+        self.session.state.update_from_question(user_message, analysis, reliable=analysis.get('reason') not in FALLBACK_REASONS)
         
         # Step 2: Handle clarification requests for open-ended questions (except COMPLEX_REASONING)
-        if analysis['needs_clarification'] and analysis['category'] != 'COMPLEX_REASONING':
-            logger.info(f"Step 2: Handling clarification request for open-ended {analysis['category']} question")
-            if analysis['category'] == 'COMPLEX_REASONING':
-                system_prompt = self._get_complex_reasoning_prompt(user_message)
-            else:
-                system_prompt = self.prompt_map.get(analysis['category'], FALLBACK_SYSTEM_PROMPT)
+        if self._needs_clarification(analysis):
+            system_prompt = self._get_clarification_prompt(user_message, analysis)
             self.add_to_history("user", user_message)
-            response = self.llm_service.run(system_prompt, user_message, self.conversation_history, MAX_TOKENS_GENERATION)
-            self.add_to_history("assistant", response)
+            parts = []
+            partition = self._response_cache_partition(analysis, "", first_turn, variant="clarification")
+            max_tokens, shortened = self._fit_to_deadline(MAX_TOKENS_GENERATION)
+            chunks = self._cached_stream(partition, user_message, self._stage_llm("clarification").stream(system_prompt, user_message, self.history_manager.window(self.session), max_tokens), store=not shortened)
+            with span("generation", kind="clarification"):
+                for chunk in self._relay_stream(chunks, start_time, parts, replace_errors=False):
+                    yield chunk
+            self._record_answer("".join(parts).strip())
             logger.info("Clarification response generated successfully!")
-            return response
+            return
         
         # Step 3: Get weather data if needed
-        enhanced_message = user_message
         weather_context = ""
-        tripadvisor_context = ""  # TripAdvisor disabled - weather API provides external data
+        location = self._get_weather_location(analysis)
+        if location:
+            logger.info(f"Step 3: Fetching {analysis['mode']} weather for {location}")
+            with span("weather", mode=analysis['mode']):
+                weather_data = self.weather_service.get_weather(location, analysis['mode'], analysis.get('when'))
+            weather_context = self._build_weather_context(analysis, location, weather_data)
+        
+        # Steps 4-6: System prompt, history and enhanced message
+        with span("prompt_build"):
+            system_prompt, llm_user_message, max_tokens = self._prepare_generation(user_message, analysis, weather_context)
+        
+        # Step 7: Stream response from LLM with specialized prompt
+        logger.info("Generating response...")
+        parts = []
+        partition = self._response_cache_partition(analysis, weather_context, first_turn)
+        max_tokens, shortened = self._fit_to_deadline(max_tokens)
+        chunks = self._cached_stream(partition, user_message, self._stage_llm(self._generation_stage(analysis)).stream(system_prompt, llm_user_message, self.history_manager.window(self.session), max_tokens), store=not shortened)
+        with span("generation", kind="answer"):
+            for chunk in self._relay_stream(chunks, start_time, parts, replace_errors=True):
+                yield chunk
+        
+        self._finish_response("".join(parts).strip())
+    
+    async def aget_response(self, user_message: str, deadline: float = None) -> str:
+        """
+        Async version of get_response()
         
-        if analysis['needs_weather'] and analysis['mode'] in ['current', 'forecast', 'climate']:
-            # Determine location for weather API
-            location = analysis.get('city') or analysis.get('country')
+        Every stage (analysis, weather, generation) is awaited, so a single
+        event loop can serve many conversations at once. Each conversation
+        still needs its own TravelAssistant, since history lives on the instance.
+        
+        Args:
+            user_message: The user's input message
+            deadline: Latency budget of the turn in seconds (see get_response())
             
-            if location:
-                logger.info(f"Step 3: Fetching {analysis['mode']} weather for {location}")
-                weather_data = self.weather_service.get_weather(location, analysis['mode'], analysis.get('when'))
-                
-                if 'error' not in weather_data:
-                    if analysis['mode'] == 'current':
-                        logger.info(f"Current Weather: {weather_data['temperature']}°C, {weather_data['description']}")
-                        weather_context = f"Current weather in {location}: {weather_data['temperature']}°C, {weather_data['description']}, humidity {weather_data['humidity']}%"
-                    elif analysis['mode'] == 'forecast':
-                        if 'min_temp' in weather_data and 'max_temp' in weather_data:
-                            logger.info(f"Forecast Weather: {weather_data['temperature']}°C, {weather_data['description']}")
-                            weather_context = f"Tomorrow's forecast for {location}: {weather_data['min_temp']}°C to {weather_data['max_temp']}°C, {weather_data['description']}, humidity {weather_data['humidity']}%"
-                        else:
-                            logger.info(f"Forecast Weather: {weather_data['temperature']}°C, {weather_data['description']}")
-                            weather_context = f"Forecast for {location}: {weather_data['temperature']}°C, {weather_data['description']}"
-                    else:  # climate
-                        logger.info(f"Climate Info: {weather_data.get('message', 'Seasonal information available')}")
-                        weather_context = f"Climate in {location}: {weather_data.get('message', 'Check local weather services for seasonal conditions')}"
-                else:
-                    logger.warning(f"Weather Error: {weather_data.get('message', 'Unknown error')}")
-                    weather_context = f"Weather information unavailable: {weather_data.get('message', 'Service temporarily unavailable')}"
-            else:
-                logger.warning("No location found for weather data")
+        Returns:
+            Assistant's response
+        """
+        return "".join([chunk async for chunk in self.astream_response(user_message, deadline)])
+    
+    async def astream_response(self, user_message: str, deadline: float = None):
+        """
+        Async version of stream_response()
+        
+        Args:
+            user_message: The user's input message
+            deadline: Latency budget of the turn in seconds (see get_response())
+            
+        Yields:
+            Chunks of the assistant's response
+        """
+        with start_trace("get_response", session_id=self.session.session_id) as trace, self._deadline(deadline, trace):
+            async for chunk in self._astream_turn(user_message):
+                yield chunk
+    
+    def _deadline(self, deadline: float, trace):
+        """Deadline scope of one turn, noted on its trace"""
+        budget = TURN_DEADLINE if deadline is None else deadline
+        if budget:
+            trace.attributes["deadline"] = budget
+        return deadline_scope(budget)
+    
+    async def _astream_turn(self, user_message: str):
+        """Async version of _stream_turn()"""
+        start_time = time.perf_counter()
+        first_turn = not self.conversation_history
+        self.session.last_error = None
+        logger.info(f"User Input: '{user_message}'")
         
+        # Step 1: Unified analysis (classification, weather decision, location extraction)
+        logger.info("Step 1: Analyzing question...")
+        with span("analysis"):
+            analysis = await self.router.aanalyze_question(user_message, self.session.state)
+        self.session.last_analysis = analysis
+        self._log_analysis(analysis)
+        self.session.state.update_from_question(user_message, analysis, reliable=analysis.get('reason') not in FALLBACK_REASONS)
         
+        # Step 2: Handle clarification requests for open-ended questions (except COMPLEX_REASONING)
+        if self._needs_clarification(analysis):
+            system_prompt = self._get_clarification_prompt(user_message, analysis)
+            self.add_to_history("user", user_message)
+            parts = []
+            partition = self._response_cache_partition(analysis, "", first_turn, variant="clarification")
+            max_tokens, shortened = self._fit_to_deadline(MAX_TOKENS_GENERATION)
+            chunks = self._acached_stream(partition, user_message, self._stage_llm("clarification").astream(system_prompt, user_message, self.history_manager.window(self.session), max_tokens), store=not shortened)
+            with span("generation", kind="clarification"):
+                async for chunk in self._arelay_stream(chunks, start_time, parts, replace_errors=False):
+                    yield chunk
+            self._record_answer("".join(parts).strip())
+            logger.info("Clarification response generated successfully!")
+            return
+        
+        # Step 3: Get weather data if needed
+        weather_context = ""
+        location = self._get_weather_location(analysis)
+        if location:
+            logger.info(f"Step 3: Fetching {analysis['mode']} weather for {location}")
+            with span("weather", mode=analysis['mode']):
+                weather_data = await self.weather_service.aget_weather(location, analysis['mode'], analysis.get('when'))
+            weather_context = self._build_weather_context(analysis, location, weather_data)
+        
+        # Steps 4-6: System prompt, history and enhanced message
+        with span("prompt_build"):
+            system_prompt, llm_user_message, max_tokens = self._prepare_generation(user_message, analysis, weather_context)
+        
+        # Step 7: Stream response from LLM with specialized prompt
+        logger.info("Generating response...")
+        parts = []
+        partition = self._response_cache_partition(analysis, weather_context, first_turn)
+        max_tokens, shortened = self._fit_to_deadline(max_tokens)
+        chunks = self._acached_stream(partition, user_message, self._stage_llm(self._generation_stage(analysis)).astream(system_prompt, llm_user_message, self.history_manager.window(self.session), max_tokens), store=not shortened)
+        with span("generation", kind="answer"):
+            async for chunk in self._arelay_stream(chunks, start_time, parts, replace_errors=True):
+                yield chunk
+        
+        self._finish_response("".join(parts).strip())
+    
+    def _response_cache_partition(self, analysis: dict, weather_context: str, first_turn: bool, variant: str = ""):
+        """
+        Response cache partition for this turn, or None if the answer must not be shared
+        
+        Only first turns are cached: later answers depend on the conversation so far.
+        """
+        if self.response_cache is None or not first_turn:
+            return None
+        if analysis['category'] == 'COMPLEX_REASONING' and self.session.show_chain_of_thought:
+            variant = variant or "chain_of_thought"
+        location = analysis.get('city') or analysis.get('country') or ""
+        return self.response_cache.partition_key(analysis['category'], location, analysis.get('when') or "", weather_context, variant)
+    
+    def _cached_stream(self, partition, user_message: str, chunks, store: bool = True):
+        """
+        Serve the answer from the response cache, or stream it from `chunks` and cache it
+        
+        `chunks` is a not-yet-started LLM stream, so a cache hit costs no LLM call.
+        With store=False (an answer shortened for a deadline) the new answer is not cached.
+        """
+        if partition is not None:
+            cached = self.response_cache.get(partition, user_message)
+            set_attribute("response_cache", "hit" if cached is not None else "miss")
+            if cached is not None:
+                yield cached
+                return
+        
+        parts = []
+        for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+        
+        response = "".join(parts).strip()
+        if partition is not None and store and response:
+            self.response_cache.put(partition, user_message, response)
+    
+    async def _acached_stream(self, partition, user_message: str, chunks, store: bool = True):
+        """Async version of _cached_stream()"""
+        if partition is not None:
+            cached = self.response_cache.get(partition, user_message)
+            set_attribute("response_cache", "hit" if cached is not None else "miss")
+            if cached is not None:
+                yield cached
+                return
+        
+        parts = []
+        async for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+        
+        response = "".join(parts).strip()
+        if partition is not None and store and response:
+            self.response_cache.put(partition, user_message, response)
+    
+    def _relay_stream(self, chunks, start_time: float, parts: list, replace_errors: bool):
+        """
+        Pass LLM chunks through to the caller, collecting them into `parts` and timing the stream
+        
+        Leading whitespace is dropped. If the LLM call fails before producing
+        any text, the error's message is relayed instead (with replace_errors,
+        the friendly high-demand message).
+        """
+        first_token_time = None
+        try:
+            for chunk in chunks:
+                if not parts:
+                    chunk = chunk.lstrip()
+                    if not chunk:
+                        continue
+                    first_token_time = time.perf_counter()
+                parts.append(chunk)
+                yield chunk
+        except ServiceError as e:
+            # Raised before the first chunk: the LLM produced no text at all
+            self._mark_failed(e)
+            first_token_time = time.perf_counter()
+            chunk = HIGH_DEMAND_MESSAGE if replace_errors else e.user_message
+            parts.append(chunk)
+            yield chunk
+        self._record_timing(start_time, first_token_time)
+    
+    async def _arelay_stream(self, chunks, start_time: float, parts: list, replace_errors: bool):
+        """Async version of _relay_stream()"""
+        first_token_time = None
+        try:
+            async for chunk in chunks:
+                if not parts:
+                    chunk = chunk.lstrip()
+                    if not chunk:
+                        continue
+                    first_token_time = time.perf_counter()
+                parts.append(chunk)
+                yield chunk
+        except ServiceError as e:
+            # Raised before the first chunk: the LLM produced no text at all
+            self._mark_failed(e)
+            first_token_time = time.perf_counter()
+            chunk = HIGH_DEMAND_MESSAGE if replace_errors else e.user_message
+            parts.append(chunk)
+            yield chunk
+        self._record_timing(start_time, first_token_time)
+    
+    def _record_timing(self, start_time: float, first_token_time: float):
+        """Log and keep time-to-first-token and total time for the current request"""
+        end_time = time.perf_counter()
+        ttft = (first_token_time - start_time) if first_token_time else None
+        trace = current_trace()
+        self.last_timing = {"ttft": ttft, "total": end_time - start_time, "trace_id": trace.trace_id if trace else None}
+        if trace is not None:
+            trace.attributes["ttft"] = ttft
+        if ttft is not None:
+            logger.info(f"Timing: time to first token {ttft:.2f}s, total {end_time - start_time:.2f}s (trace {self.last_timing['trace_id']})")
+        else:
+            logger.info(f"Timing: no tokens received, total {end_time - start_time:.2f}s (trace {self.last_timing['trace_id']})")
+    
+    def _mark_failed(self, error: ServiceError):
+        """Record on the session and the current trace that the answer could not be generated"""
+        logger.error(f"LLM call failed, no answer generated: {type(error).__name__}: {error}")
+        self.session.last_error = error
+        trace = current_trace()
+        if trace is not None:
+            trace.attributes["outcome"] = "error"
+    
+    def _log_analysis(self, analysis: dict):
+        """Log the router's analysis result and note the category on the trace"""
+        trace = current_trace()
+        if trace is not None:
+            trace.attributes["category"] = analysis['category']
+        logger.info(f"Category: {analysis['category']}, Weather: {analysis['needs_weather']} ({analysis['mode']}), Location: {analysis.get('city', analysis.get('country', 'unknown'))}, Clarification: {analysis['needs_clarification']}")
+        
+        # Check for rate limit error in analysis
+        if analysis.get('reason') == RATE_LIMIT_FALLBACK_REASON:
+            logger.error("Rate limit error detected, using fallback analysis")
+            # Continue with the fallback analysis instead of returning error
+    
+    def _needs_clarification(self, analysis: dict) -> bool:
+        """Open-ended questions get a clarification response (except COMPLEX_REASONING)"""
+        return analysis['needs_clarification'] and analysis['category'] != 'COMPLEX_REASONING'
+    
+    def _stage_llm(self, stage: str):
+        """The LLM service (model and fallback model) of a pipeline stage"""
+        return self.services.llm_services.get(stage, self.llm_service)
+    
+    def _generation_stage(self, analysis: dict) -> str:
+        """Answers to COMPLEX_REASONING questions get their own model; everything else uses the generation model"""
+        return "complex_reasoning" if analysis['category'] == 'COMPLEX_REASONING' else "generation"
+    
+    def _get_clarification_prompt(self, user_message: str, analysis: dict) -> str:
+        """Get the system prompt used to ask the user for clarification"""
+        logger.info(f"Step 2: Handling clarification request for open-ended {analysis['category']} question")
+        if analysis['category'] == 'COMPLEX_REASONING':
+            return self._get_complex_reasoning_prompt(user_message)
+        return self.prompt_map.get(analysis['category'], FALLBACK_SYSTEM_PROMPT)
+    
+    def _get_weather_location(self, analysis: dict):
+        """Return the location to fetch weather for, or None if no weather is needed"""
+        if not (analysis['needs_weather'] and analysis['mode'] in ['current', 'forecast', 'climate']):
+            return None
+        
+        # Determine location for weather API
+        location = analysis.get('city') or analysis.get('country')
+        if not location:
+            logger.warning("No location found for weather data")
+        return location
+    
+    def _build_weather_context(self, analysis: dict, location: str, weather_data: dict) -> str:
+        """Turn weather API data into a one-line fact for the LLM"""
+        if weather_data.get('error') == 'deadline':
+            # Skipped to answer in time: the answer goes on without weather facts
+            return ""
+        if 'error' in weather_data:
+            logger.warning(f"Weather Error: {weather_data.get('message', 'Unknown error')}")
+            return f"Weather information unavailable: {weather_data.get('message', 'Service temporarily unavailable')}"
+        
+        # The weather service may have picked another mode for the dates asked about
+        mode = weather_data.get('type', analysis['mode'])
+        if mode == 'current':
+            logger.info(f"Current Weather: {weather_data['temperature']}°C, {weather_data['description']}")
+            return f"Current weather in {location}: {weather_data['temperature']}°C, {weather_data['description']}, humidity {weather_data['humidity']}%"
+        elif mode == 'forecast':
+            if 'min_temp' in weather_data and 'max_temp' in weather_data:
+                logger.info(f"Forecast Weather: {weather_data['temperature']}°C, {weather_data['description']}")
+                fact = f"{weather_data.get('message', f'Forecast for {location}')}: {weather_data['min_temp']}°C to {weather_data['max_temp']}°C, {weather_data['description']}, humidity {weather_data['humidity']}%"
+                if weather_data.get('precipitation_chance') is not None:
+                    fact += f", {weather_data['precipitation_chance']}% chance of precipitation"
+                if weather_data.get('days'):
+                    # Multi-day outlooks get one entry per local day
+                    fact += "; by day: " + ", ".join(f"{day['weekday'][:3]} {day['min_temp']}-{day['max_temp']}°C {day['description']}" for day in weather_data['days'])
+                return fact
+            logger.info(f"Forecast Weather: {weather_data['temperature']}°C, {weather_data['description']}")
+            return f"Forecast for {location}: {weather_data['temperature']}°C, {weather_data['description']}"
+        else:  # climate
+            logger.info(f"Climate Info: {weather_data.get('message', 'Seasonal information available')}")
+            return f"Climate in {location}: {weather_data.get('message', 'Check local weather services for seasonal conditions')}"
+    
+    def _prepare_generation(self, user_message: str, analysis: dict, weather_context: str):
+        """
+        Build everything the final LLM call needs and record the user turn
+        
+        Returns:
+            Tuple of (system_prompt, user message for the LLM, max_tokens)
+        """
         # Step 4: Get appropriate system prompt
         if analysis['category'] == 'COMPLEX_REASONING':
             system_prompt = self._get_complex_reasoning_prompt(user_message)
-            import os
-            debug_mode = os.getenv("SHOW_CHAIN_OF_THOUGHT", "false").lower() == "true"
-            logger.info(f"Using {analysis['category']} system prompt (debug mode: {debug_mode})")
+            logger.info(f"Using {analysis['category']} system prompt (debug mode: {self.session.show_chain_of_thought})")
         else:
             system_prompt = self.prompt_map.get(analysis['category'], FALLBACK_SYSTEM_PROMPT)
             logger.info(f"Using {analysis['category']} system prompt")
@@ -145,32 +548,47 @@ class TravelAssistant:
         else:
             enhanced_message = f"Task: {user_message}"
         
-        # Step 7: Get response from LLM with specialized prompt
-        logger.info("Generating response...")
-        
         # Use debug token limit if debug mode is enabled and this is a COMPLEX_REASONING question
-        max_tokens = MAX_TOKENS_DEBUG if (SHOW_CHAIN_OF_THOUGHT and analysis['category'] == 'COMPLEX_REASONING') else MAX_TOKENS_GENERATION
+        debug_mode = self.session.show_chain_of_thought and analysis['category'] == 'COMPLEX_REASONING'
+        max_tokens = MAX_TOKENS_DEBUG if debug_mode else MAX_TOKENS_GENERATION
         
-        if SHOW_CHAIN_OF_THOUGHT and analysis['category'] == 'COMPLEX_REASONING':
+        if debug_mode:
             logger.info(f"Using debug token limit: {max_tokens} tokens for chain of thought display")
         
         # For COMPLEX_REASONING, the user_message is already embedded in the system prompt
         if analysis['category'] == 'COMPLEX_REASONING':
-            response = self.llm_service.run(system_prompt, "", self.conversation_history, max_tokens)
-        else:
-            response = self.llm_service.run(system_prompt, enhanced_message, self.conversation_history, max_tokens)
-        
-        # Check for rate limit error in final response
-        if response.startswith("Sorry, I've reached the API rate limit") or response.startswith("Sorry, I encountered an error"):
-            logger.error(f"Rate limit error in final response: {response}")
-            response = "I'm experiencing high demand right now. Please try again in a few minutes, or feel free to ask a more specific question about your travel plans."
+            return system_prompt, "", max_tokens
+        return system_prompt, enhanced_message, max_tokens
+    
+    def _fit_to_deadline(self, max_tokens: int):
+        """
+        Lower max_tokens so the answer can be generated in the time left for the turn
         
+        Returns:
+            Tuple of (max_tokens, whether it was lowered)
+        """
+        budget = remaining()
+        if budget is None:
+            return max_tokens, False
+        affordable = int((budget - DEADLINE_FIRST_TOKEN_SECONDS) * DEADLINE_TOKENS_PER_SECOND)
+        if affordable >= max_tokens:
+            return max_tokens, False
+        record_degradation("generation", "shortened")
+        return max(DEADLINE_MIN_TOKENS, affordable), True
+    
+    def _finish_response(self, response: str):
+        """Record the assistant turn once the final answer is complete"""
         # Step 9: Add assistant response to history
-        self.add_to_history("assistant", response)
+        self._record_answer(response)
         
         logger.info("Response generated successfully!")
-        
-        return response
+    
+    def _record_answer(self, response: str):
+        """Add the answer to history and note the places it proposes in the conversation state"""
+        self.add_to_history("assistant", response)
+        if response and self.session.last_error is None:
+            store = get_geocode_store()
+            self.session.state.update_from_answer(response, lambda name: store.find(name) is not None)
     
     def get_conversation_history(self) -> list:
         """Get the current conversation history"""
@@ -178,6 +596,6 @@ class TravelAssistant:
     
     def clear_history(self):
         """Clear the conversation history"""
-        self.conversation_history = []
+        self.session.clear()
     
 
@@ -0,0 +1,90 @@
+# bench_async.py - Throughput benchmark for the async get_response pipeline (stub backends, no network)
+import argparse
+import asyncio
+import os
+import time
+
+# The config module requires API keys; the stubs never use them
+os.environ.setdefault("GROQ_API_KEY", "bench-stub-key")
+os.environ.setdefault("WEATHER_API_KEY", "bench-stub-key")
+# Stub calls should not be throttled by the Groq rate limiter
+os.environ.setdefault("GROQ_REQUESTS_PER_MINUTE", "1000000")
+os.environ.setdefault("GROQ_TOKENS_PER_MINUTE", "1000000000")
+# Measure the full pipeline, not answers or analyses served from caches
+os.environ.setdefault("RESPONSE_CACHE_ENABLED", "false")
+os.environ.setdefault("ROUTER_CACHE_TTL", "0")
+os.environ.setdefault("ROUTER_FAST_PATH_ENABLED", "false")
+
+from assistant import TravelAssistant
+from config import BACKEND_MODE
+from services import AssistantServices
+from stubs import StubChatModel, StubWeatherService, use_stub_llm
+
+QUESTION = "What should I pack for Tokyo in December?"
+
+
+def make_services(llm_latency: float, weather_latency: float) -> AssistantServices:
+    """
+    Create shared services whose LLM and weather backends are offline stubs
+
+    With BACKEND_MODE=replay the real services answer from cassettes instead
+    (latency then comes from the REPLAY_* settings).
+    """
+    if BACKEND_MODE == "replay":
+        return AssistantServices()
+    services = AssistantServices(weather_service=StubWeatherService(latency=weather_latency))
+    use_stub_llm(services, StubChatModel(latency=llm_latency))
+    return services
+
+
+def make_assistant(llm_latency: float, weather_latency: float) -> TravelAssistant:
+    """Create a single-conversation assistant backed by stub services"""
+    return TravelAssistant(services=make_services(llm_latency, weather_latency))
+
+
+async def run_level(concurrency: int, turns: int, llm_latency: float, weather_latency: float) -> dict:
+    """Run `concurrency` conversations at once, each answering `turns` questions"""
+    services = make_services(llm_latency, weather_latency)
+    assistants = [TravelAssistant(services=services) for _ in range(concurrency)]
+
+    async def conversation(assistant: TravelAssistant) -> list:
+        latencies = []
+        for _ in range(turns):
+            start = time.perf_counter()
+            await assistant.aget_response(QUESTION)
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(conversation(a) for a in assistants))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(l for conv in results for l in conv)
+    return {
+        "concurrency": concurrency,
+        "turns": len(latencies),
+        "elapsed": elapsed,
+        "throughput": len(latencies) / elapsed,
+        "mean_latency": sum(latencies) / len(latencies),
+        "max_latency": latencies[-1]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure async get_response throughput at increasing concurrency")
+    parser.add_argument("--levels", default="1,2,4,8,16,32", help="Comma-separated concurrency levels")
+    parser.add_argument("--turns", type=int, default=3, help="Turns per conversation")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Stub LLM latency in seconds")
+    parser.add_argument("--weather-latency", type=float, default=0.2, help="Stub weather latency in seconds")
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.levels.split(",")]
+
+    print(f"{'concurrency':>11} {'turns':>6} {'elapsed(s)':>10} {'turns/s':>8} {'mean(s)':>8} {'max(s)':>7}")
+    for level in levels:
+        r = asyncio.run(run_level(level, args.turns, args.llm_latency, args.weather_latency))
+        print(f"{r['concurrency']:>11} {r['turns']:>6} {r['elapsed']:>10.2f} {r['throughput']:>8.2f} {r['mean_latency']:>8.2f} {r['max_latency']:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# bench_http.py - Microbenchmark: pooled keep-alive client vs a new connection per request (local stub server)
+import argparse
+import json
+import os
+import shutil
+import socket
+import ssl
+import subprocess
+import tempfile
+import threading
+import time
+import warnings
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# The config module requires API keys; the stub server never checks them
+os.environ.setdefault("GROQ_API_KEY", "bench-stub-key")
+os.environ.setdefault("WEATHER_API_KEY", "bench-stub-key")
+
+import requests
+
+from http_client import PooledHTTPClient
+
+# Roughly the size of a real /data/2.5/forecast response
+STUB_BODY = json.dumps({
+    "cod": "200",
+    "list": [{"dt": 1700000000 + i * 10800, "main": {"temp": 12.3, "humidity": 70},
+              "weather": [{"description": "light rain"}], "wind": {"speed": 3.4}} for i in range(40)]
+}).encode("utf-8")
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers every GET with a canned forecast, keeping connections alive"""
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        # Headers and body are separate writes; without this, delayed ACKs stall keep-alive replies
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(STUB_BODY)))
+        self.end_headers()
+        self.wfile.write(STUB_BODY)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_certificate(directory: str):
+    """Create a throwaway self-signed certificate with openssl"""
+    cert, key = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-subj", "/CN=localhost", "-keyout", key, "-out", cert],
+        check=True, capture_output=True
+    )
+    return cert, key
+
+
+def start_server(tls_dir: str = None) -> ThreadingHTTPServer:
+    """Start the stub server on a free local port, optionally over TLS"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.connections = 0
+    if tls_dir:
+        cert, key = make_certificate(tls_dir)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert, key)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run(label: str, get, url: str, requests_count: int, server: ThreadingHTTPServer) -> dict:
+    """Time `requests_count` sequential GETs and count the connections the server accepted"""
+    start_connections = server.connections
+    latencies = []
+    for _ in range(requests_count):
+        start = time.perf_counter()
+        response = get(url)
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return {
+        "label": label,
+        "connections": server.connections - start_connections,
+        "mean_ms": 1000 * sum(latencies) / len(latencies),
+        "p95_ms": 1000 * latencies[int(0.95 * (len(latencies) - 1))],
+        "total_s": sum(latencies)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare pooled keep-alive requests with one connection per request")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per client")
+    parser.add_argument("--no-tls", action="store_true", help="Plain HTTP (measures TCP setup only)")
+    args = parser.parse_args()
+
+    use_tls = not args.no_tls and shutil.which("openssl") is not None
+    with tempfile.TemporaryDirectory() as tls_dir:
+        server = start_server(tls_dir if use_tls else None)
+        scheme = "https" if use_tls else "http"
+        url = f"{scheme}://127.0.0.1:{server.server_address[1]}/data/2.5/forecast"
+
+        pooled = PooledHTTPClient()
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")  # Self-signed certificate
+            results = [
+                run("new connection per request", lambda u: requests.get(u, timeout=10, verify=False), url, args.requests, server),
+                run("pooled keep-alive client", lambda u: pooled.get(u, verify=False), url, args.requests, server)
+            ]
+        server.shutdown()
+
+    print(f"{args.requests} sequential GETs over {scheme.upper()} against a local stub server")
+    print(f"{'client':<28} {'connections':>11} {'mean(ms)':>9} {'p95(ms)':>8} {'total(s)':>9}")
+    for r in results:
+        print(f"{r['label']:<28} {r['connections']:>11} {r['mean_ms']:>9.2f} {r['p95_ms']:>8.2f} {r['total_s']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
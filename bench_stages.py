@@ -0,0 +1,199 @@
+# bench_stages.py - Per-stage microbenchmarks of the get_response pipeline (stub backends, results kept over time)
+import argparse
+import json
+import os
+import platform
+import socket
+import subprocess
+import time
+
+# The config module requires API keys; the stubs never use them
+os.environ.setdefault("GROQ_API_KEY", "bench-stub-key")
+os.environ.setdefault("WEATHER_API_KEY", "bench-stub-key")
+# Stub calls should not be throttled by the Groq rate limiter
+os.environ.setdefault("GROQ_REQUESTS_PER_MINUTE", "1000000")
+os.environ.setdefault("GROQ_TOKENS_PER_MINUTE", "1000000000")
+# Measure the stages themselves, not answers or analyses served from caches or the fast path
+os.environ.setdefault("RESPONSE_CACHE_ENABLED", "false")
+os.environ.setdefault("ROUTER_FAST_PATH_ENABLED", "false")
+os.environ["BACKEND_MODE"] = "live"  # The stubs replace the backends themselves
+
+from apis import WeatherService
+from assistant import TravelAssistant
+from cache import TTLCache
+from config import CACHE_DIR
+from conversation_state import ConversationState
+from fast_path import FastPathClassifier
+from router import ANALYSIS_SYSTEM_MESSAGE, Router
+from services import AssistantServices
+from session import ConversationSession
+from stubs import STUB_ANALYSIS, STUB_ANSWER, StubChatModel, StubHTTPClient, use_stub_llm
+
+HISTORY_PATH = os.path.join(CACHE_DIR, "bench_stages.jsonl")
+QUESTION = "What should I pack for Tokyo in December?"
+CITY = "Tokyo"  # In the bundled gazetteer, so geocoding never leaves the process
+
+# A raw router reply with text around the JSON, as models often produce
+RAW_ANALYSIS_REPLY = "Here is the analysis:\n" + json.dumps(STUB_ANALYSIS) + "\nLet me know if you need more."
+
+
+def full_history() -> list:
+    """A ten-turn conversation, over the history token budget"""
+    history = []
+    for i in range(10):
+        history.append({"role": "user", "content": f"Question {i} about packing for Tokyo in December?"})
+        history.append({"role": "assistant", "content": "Bring a warm coat, layers and comfortable shoes. " * 4})
+    return history
+
+
+def measure(func, iterations: int, setup=None) -> dict:
+    """
+    Time `iterations` calls of func() and summarize them in microseconds
+
+    Args:
+        func: Zero-argument function to time
+        iterations: Number of timed calls (after a short warm-up)
+        setup: Optional zero-argument function run, untimed, before each call
+    """
+    for _ in range(min(10, iterations)):
+        if setup:
+            setup()
+        func()
+
+    samples = []
+    for _ in range(iterations):
+        if setup:
+            setup()
+        start = time.perf_counter_ns()
+        func()
+        samples.append(time.perf_counter_ns() - start)
+    samples.sort()
+    return {
+        "iterations": iterations,
+        "median_us": samples[len(samples) // 2] / 1000,
+        "p95_us": samples[int(0.95 * (len(samples) - 1))] / 1000,
+        "mean_us": sum(samples) / len(samples) / 1000
+    }
+
+
+def make_services() -> AssistantServices:
+    """Services on zero-latency stubs: the only time left is the project's own code"""
+    services = AssistantServices(weather_service=WeatherService(http_client=StubHTTPClient()),
+                                 router=Router(analysis_cache=TTLCache(ttl=0, name="bench-router")))
+    use_stub_llm(services, StubChatModel(latency=0))
+    return services
+
+
+def run_stages(iterations: int) -> dict:
+    """Benchmark every stage and return {stage: timing summary}"""
+    services = make_services()
+    router = services.router
+    weather = services.weather_service
+    assistant = TravelAssistant(services=services)
+    state = ConversationState()
+    state.update_from_question("Where should I go on a budget food trip to Japan in December?", STUB_ANALYSIS)
+    context_text = router._context_text(state)
+    results = {}
+
+    # Router: prompt formatting, JSON extraction, normalization and the whole analysis (stub LLM, no memo)
+    results["router.build_prompt"] = measure(lambda: router._build_analysis_prompt(QUESTION, context_text), iterations)
+    results["router.parse_json"] = measure(lambda: router.llm_service._parse_json_response(RAW_ANALYSIS_REPLY), iterations)
+    results["router.normalize"] = measure(lambda: router._normalize_analysis(dict(STUB_ANALYSIS)), iterations)
+    prompt = router._build_analysis_prompt(QUESTION, context_text)
+    results["router.run_json"] = measure(lambda: router.llm_service.run_json(ANALYSIS_SYSTEM_MESSAGE, prompt), iterations)
+    results["router.analyze_question"] = measure(lambda: router.analyze_question(QUESTION, state), iterations)
+    fast_classifier = FastPathClassifier(geocode_store=weather.geocode_store)
+    results["router.fast_path"] = measure(lambda: fast_classifier.classify(QUESTION, state), iterations)
+
+    # Weather: forecast cache miss (payload parsed from the stub HTTP response) vs hit
+    results["weather.cache_miss"] = measure(lambda: weather.get_weather(CITY, "forecast", "tomorrow"), iterations, setup=weather.cache.clear)
+    weather.get_weather(CITY, "forecast", "tomorrow")
+    results["weather.cache_hit"] = measure(lambda: weather.get_weather(CITY, "forecast", "tomorrow"), iterations)
+    results["weather.climate_hit"] = measure(lambda: weather.get_weather(CITY, "climate", "December"), iterations)
+
+    # Prompt and message assembly
+    results["state.update_from_answer"] = measure(lambda: state.update_from_answer(STUB_ANSWER, lambda name: weather.geocode_store.find(name) is not None), iterations)
+    results["assistant.complex_reasoning_prompt"] = measure(lambda: assistant._get_complex_reasoning_prompt(QUESTION), iterations)
+
+    def reset_history():
+        assistant.session.history = full_history()
+    results["history.window"] = measure(lambda: assistant.history_manager.window(assistant.session), iterations, setup=reset_history)
+    results["assistant.add_to_history"] = measure(lambda: assistant.add_to_history("user", QUESTION), iterations, setup=reset_history)
+
+    weather_data = weather.get_weather(CITY, "climate", "December")
+    weather_context = assistant._build_weather_context(STUB_ANALYSIS, CITY, weather_data)
+
+    def assemble():
+        system_prompt, user_message, _ = assistant._prepare_generation(QUESTION, STUB_ANALYSIS, weather_context)
+        return assistant.llm_service._build_messages(system_prompt, user_message, assistant.history_manager.window(assistant.session))
+    results["assistant.message_assembly"] = measure(assemble, iterations, setup=reset_history)
+
+    # The whole pipeline on zero-latency stubs: our total overhead per turn
+    def fresh_session():
+        assistant.session = ConversationSession()
+    results["assistant.get_response"] = measure(lambda: assistant.get_response(QUESTION), iterations, setup=fresh_session)
+    return results
+
+
+def git_revision() -> str:
+    """Current commit, or "unknown" outside a git checkout"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def load_previous(path: str, host: str):
+    """Latest saved run from the same machine (timings from other machines are not comparable)"""
+    if not os.path.exists(path):
+        return None
+    previous = None
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                run = json.loads(line)
+            except ValueError:
+                continue
+            if run.get("host") == host:
+                previous = run
+    return previous
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time each stage of the get_response pipeline against zero-latency stubs")
+    parser.add_argument("--iterations", type=int, default=500, help="Timed calls per stage")
+    parser.add_argument("--history", default=HISTORY_PATH, help="JSONL file the results are appended to")
+    parser.add_argument("--no-save", action="store_true", help="Do not append this run to the history")
+    args = parser.parse_args()
+
+    host = socket.gethostname()
+    previous = load_previous(args.history, host)
+    stages = run_stages(args.iterations)
+
+    print(f"{'stage':<36} {'median(us)':>11} {'p95(us)':>10} {'vs last':>8}")
+    for name, r in stages.items():
+        change = ""
+        before = (previous or {}).get("stages", {}).get(name)
+        if before and before["median_us"]:
+            change = f"{100 * (r['median_us'] / before['median_us'] - 1):+.0f}%"
+        print(f"{name:<36} {r['median_us']:>11.1f} {r['p95_us']:>10.1f} {change:>8}")
+    if previous:
+        print(f"\nCompared with {previous['revision']} from {previous['created_at']}")
+
+    if not args.no_save:
+        run = {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "revision": git_revision(),
+            "host": host,
+            "python": platform.python_version(),
+            "stages": stages
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(args.history)), exist_ok=True)
+        with open(args.history, "a", encoding="utf-8") as f:
+            f.write(json.dumps(run) + "\n")
+        print(f"Results appended to {args.history}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+# cache.py - Bounded TTL/LRU cache with single-flight loading and stale-while-revalidate
+import json
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Background refreshes of stale entries share one small pool
+_refresh_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cache-refresh")
+
+
+def estimate_size(value) -> int:
+    """Approximate memory footprint of a cached value in bytes"""
+    if hasattr(value, "estimated_size"):
+        return value.estimated_size()
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return sys.getsizeof(value)
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache with expiry, a memory cap and stampede protection
+
+    - Entries are fresh for `ttl` seconds, then stale for `stale_ttl` more
+      seconds: a stale hit is returned immediately while one background
+      refresh reloads it.
+    - Concurrent misses for the same key share a single load (single-flight).
+    - The least recently used entries are evicted when either `max_entries`
+      or `max_bytes` is exceeded.
+
+    Args:
+        ttl: Seconds an entry is fresh
+        stale_ttl: Extra seconds an expired entry may be served while refreshing
+        max_entries: Maximum number of entries
+        max_bytes: Approximate memory cap over all entries
+        name: Used in log messages
+    """
+    def __init__(self, ttl: float, stale_ttl: float = 0, max_entries: int = 256, max_bytes: int = None, name: str = "cache"):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.name = name
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (stored_at, value, size)
+        self._loading = {}  # key -> Future of an in-flight load
+        self._bytes = 0
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Return a fresh value, or None (stale entries count as missing here)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.time() - entry[0] < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def set(self, key, value):
+        """Store a value and evict least recently used entries over the limits"""
+        size = estimate_size(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old:
+                self._bytes -= old[2]
+            self._entries[key] = (time.time(), value, size)
+            self._bytes += size
+            self._evict()
+
+    def delete(self, key):
+        """Remove an entry if present"""
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old:
+                self._bytes -= old[2]
+
+    def clear(self):
+        """Remove all entries"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _evict(self):
+        """Drop least recently used entries until within limits (lock must be held)"""
+        while self._entries and (
+            len(self._entries) > self.max_entries
+            or (self.max_bytes is not None and self._bytes > self.max_bytes and len(self._entries) > 1)
+        ):
+            _, (_, _, size) = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.evictions += 1
+
+    def get_or_load(self, key, loader, should_cache=None):
+        """
+        Return the cached value for key, calling loader() at most once across threads on a miss
+
+        Args:
+            key: Cache key
+            loader: Zero-argument function producing the value
+            should_cache: Optional predicate; values it rejects are returned but not stored
+
+        Returns:
+            The cached, stale-but-refreshing, or freshly loaded value
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                age = time.time() - entry[0]
+                if age < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                if age < self.ttl + self.stale_ttl:
+                    self._entries.move_to_end(key)
+                    self.stale_hits += 1
+                    if key not in self._loading:
+                        future = Future()
+                        self._loading[key] = future
+                        _refresh_executor.submit(self._load, key, loader, should_cache, future)
+                    return entry[1]
+
+            self.misses += 1
+            future = self._loading.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._loading[key] = future
+
+        if owner:
+            self._load(key, loader, should_cache, future)
+        return future.result()
+
+    def _load(self, key, loader, should_cache, future: Future):
+        """Run loader for key, store the result and wake any waiting callers"""
+        try:
+            value = loader()
+        except BaseException as e:
+            with self._lock:
+                self._loading.pop(key, None)
+            logger.warning(f"{self.name}: load failed for {key}: {e}")
+            future.set_exception(e)
+            return
+
+        if should_cache is None or should_cache(value):
+            self.set(key, value)
+        with self._lock:
+            self._loading.pop(key, None)
+        future.set_result(value)
+
+    def stats(self) -> dict:
+        """Counters for hit-rate reporting"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
@@ -0,0 +1,370 @@
+# cassettes.py - Record real Groq/OpenWeatherMap exchanges and replay them offline (with injected latency and faults)
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+
+import groq
+import httpx
+import requests
+
+from config import (
+    CASSETTE_DIR, REPLAY_LATENCY, REPLAY_JITTER, REPLAY_RATE_LIMIT_RATE, REPLAY_TIMEOUT_RATE, REPLAY_SEED
+)
+from stubs import StubMessage
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Query parameters that must never be written to a cassette or take part in matching
+SECRET_PARAMS = {"appid", "api_key", "key"}
+# Facts that depend on the clock: the weather line of a prompt is built from the forecast slots around
+# the current time, so it changes from day to day while the question (and the recording) stays the same
+_VOLATILE_FACTS = re.compile(r"^- Weather: .*$", re.MULTILINE)
+
+
+class CassetteMiss(LookupError):
+    """Raised in replay mode when no recording matches a request"""
+
+
+class Cassette:
+    """
+    Append-only JSONL file of recorded request/response pairs
+
+    Requests are matched by a hash of their canonical JSON form, without the
+    volatile weather facts of LLM prompts (they are still written to the file);
+    when the same request was recorded more than once, the first recording is
+    replayed. Requests without a recording are kept in `misses`.
+
+    Args:
+        path: Cassette file
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = None  # key -> response
+        self.misses = []  # Descriptions of replayed requests that had no recording
+
+    @staticmethod
+    def key(request: dict) -> str:
+        """Stable hash of a request"""
+        canonical = json.dumps(_match_form(request), sort_keys=True, ensure_ascii=False)
+        return hashlib.sha1(canonical.encode("utf-8")).hexdigest()
+
+    def _load(self):
+        """Read the cassette file on first use (lock must be held)"""
+        if self._entries is not None:
+            return
+        self._entries = {}
+        if not os.path.exists(self.path):
+            logger.info(f"Cassette {self.path} not found, starting empty")
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                # Keys are recomputed, so cassettes recorded before a change in matching still replay
+                self._entries.setdefault(self.key(entry["request"]), entry["response"])
+
+    def find(self, request: dict):
+        """Return the recorded response for a request, or None"""
+        with self._lock:
+            self._load()
+            return self._entries.get(self.key(request))
+
+    def miss(self, description: str):
+        """Note a request that has no recording"""
+        logger.error(f"Cassette miss in {self.path}: {description}")
+        with self._lock:
+            self.misses.append(description)
+
+    def record(self, request: dict, response: dict):
+        """Append a request/response pair"""
+        key = self.key(request)
+        with self._lock:
+            self._load()
+            self._entries.setdefault(key, response)
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"key": key, "request": request, "response": response}, ensure_ascii=False) + "\n")
+
+
+class FaultProfile:
+    """
+    Latency and failures injected into replayed calls
+
+    Args:
+        latency: Seconds before each reply, or "recorded" to replay the recorded timing
+        jitter: Extra uniformly random seconds (0..jitter) added to the latency
+        rate_limit_rate: Fraction of calls answered with HTTP 429
+        timeout_rate: Fraction of calls that time out
+        seed: Random seed, so a run injects the same faults every time
+    """
+    def __init__(self, latency=REPLAY_LATENCY, jitter: float = REPLAY_JITTER, rate_limit_rate: float = REPLAY_RATE_LIMIT_RATE,
+                 timeout_rate: float = REPLAY_TIMEOUT_RATE, seed: int = REPLAY_SEED):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_rate = rate_limit_rate
+        self.timeout_rate = timeout_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay(self, recorded: float = 0.0) -> float:
+        """Seconds to wait before replying"""
+        base = recorded if self.latency == "recorded" else float(self.latency)
+        with self._lock:
+            return base + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+
+    def fault(self):
+        """Pick the failure for the next call (None, rate_limit or timeout)"""
+        with self._lock:
+            roll = self._random.random()
+        if roll < self.rate_limit_rate:
+            return "rate_limit"
+        if roll < self.rate_limit_rate + self.timeout_rate:
+            return "timeout"
+        return None
+
+
+def _match_form(request: dict) -> dict:
+    """The request as it takes part in matching (volatile weather facts masked out of prompts)"""
+    if "messages" not in request:
+        return request
+    messages = [{**m, "content": _VOLATILE_FACTS.sub("- Weather: <volatile>", m["content"])} for m in request["messages"]]
+    return {**request, "messages": messages}
+
+
+def _llm_request(model_name: str, messages: list) -> dict:
+    """The part of a chat call that selects its recording (generation settings are ignored)"""
+    return {"model": model_name, "messages": [{"role": m["role"], "content": m["content"]} for m in messages]}
+
+
+class RecordingChatModel:
+    """
+    Wraps a ChatGroq client and records every exchange to a cassette
+
+    Args:
+        model: The real ChatGroq client
+        model_name: Model the client talks to (part of the match key)
+        cassette: Where exchanges are written
+    """
+    def __init__(self, model, model_name: str, cassette: Cassette):
+        self.model = model
+        self.model_name = model_name
+        self.cassette = cassette
+
+    def invoke(self, messages: list, **kwargs):
+        start = time.perf_counter()
+        response = self.model.invoke(messages, **kwargs)
+        elapsed = time.perf_counter() - start
+        self.cassette.record(_llm_request(self.model_name, messages), {"content": response.content, "elapsed": elapsed, "first_chunk": elapsed})
+        return response
+
+    async def ainvoke(self, messages: list, **kwargs):
+        start = time.perf_counter()
+        response = await self.model.ainvoke(messages, **kwargs)
+        elapsed = time.perf_counter() - start
+        self.cassette.record(_llm_request(self.model_name, messages), {"content": response.content, "elapsed": elapsed, "first_chunk": elapsed})
+        return response
+
+    def stream(self, messages: list, **kwargs):
+        start = time.perf_counter()
+        first_chunk, chunks = None, []
+        for chunk in self.model.stream(messages, **kwargs):
+            if first_chunk is None:
+                first_chunk = time.perf_counter() - start
+            chunks.append(chunk.content)
+            yield chunk
+        self._record_stream(messages, chunks, start, first_chunk)
+
+    async def astream(self, messages: list, **kwargs):
+        start = time.perf_counter()
+        first_chunk, chunks = None, []
+        async for chunk in self.model.astream(messages, **kwargs):
+            if first_chunk is None:
+                first_chunk = time.perf_counter() - start
+            chunks.append(chunk.content)
+            yield chunk
+        self._record_stream(messages, chunks, start, first_chunk)
+
+    def _record_stream(self, messages: list, chunks: list, start: float, first_chunk: float):
+        elapsed = time.perf_counter() - start
+        self.cassette.record(
+            _llm_request(self.model_name, messages),
+            {"content": "".join(chunks), "chunks": chunks, "elapsed": elapsed, "first_chunk": first_chunk or elapsed}
+        )
+
+
+class ReplayChatModel:
+    """
+    Drop-in replacement for ChatGroq that answers from a cassette
+
+    Injected 429s are reported to the rate limiter just like real ones.
+
+    Args:
+        model_name: Model whose recordings are replayed
+        cassette: Recorded exchanges
+        profile: Injected latency and faults
+        rate_limiter: Optional limiter to notify about injected 429s
+    """
+    def __init__(self, model_name: str, cassette: Cassette, profile: FaultProfile = None, rate_limiter=None):
+        self.model_name = model_name
+        self.cassette = cassette
+        self.profile = profile or FaultProfile()
+        self.rate_limiter = rate_limiter
+        self.calls = 0
+
+    def _lookup(self, messages: list):
+        """Find the recording for a call and decide on latency and faults"""
+        self.calls += 1
+        recorded = self.cassette.find(_llm_request(self.model_name, messages))
+        if recorded is None:
+            description = f"No recorded {self.model_name} response for: {messages[-1]['content'][:80]!r}"
+            self.cassette.miss(description)
+            raise CassetteMiss(description)
+        return recorded, self.profile.fault()
+
+    def _raise_fault(self, fault: str):
+        request = httpx.Request("POST", "https://api.groq.com/openai/v1/chat/completions")
+        if fault == "rate_limit":
+            if self.rate_limiter is not None:
+                self.rate_limiter.on_rate_limited(1.0)
+            response = httpx.Response(429, request=request, headers={"retry-after": "1"})
+            raise groq.RateLimitError("Error code: 429 - rate limit exceeded (injected)", response=response, body=None)
+        raise groq.APITimeoutError(request=request)
+
+    def invoke(self, messages: list, **kwargs) -> StubMessage:
+        recorded, fault = self._lookup(messages)
+        time.sleep(self.profile.delay(recorded.get("elapsed", 0.0)))
+        if fault:
+            self._raise_fault(fault)
+        return StubMessage(recorded["content"])
+
+    async def ainvoke(self, messages: list, **kwargs) -> StubMessage:
+        recorded, fault = self._lookup(messages)
+        await asyncio.sleep(self.profile.delay(recorded.get("elapsed", 0.0)))
+        if fault:
+            self._raise_fault(fault)
+        return StubMessage(recorded["content"])
+
+    def stream(self, messages: list, **kwargs):
+        recorded, fault = self._lookup(messages)
+        time.sleep(self.profile.delay(recorded.get("first_chunk", 0.0)))
+        if fault:
+            self._raise_fault(fault)
+        for chunk in recorded.get("chunks") or [recorded["content"]]:
+            yield StubMessage(chunk)
+
+    async def astream(self, messages: list, **kwargs):
+        recorded, fault = self._lookup(messages)
+        await asyncio.sleep(self.profile.delay(recorded.get("first_chunk", 0.0)))
+        if fault:
+            self._raise_fault(fault)
+        for chunk in recorded.get("chunks") or [recorded["content"]]:
+            yield StubMessage(chunk)
+
+
+def _http_request(url: str, params: dict) -> dict:
+    """The part of a GET that selects its recording (API keys are left out)"""
+    return {"url": url, "params": {k: v for k, v in (params or {}).items() if k not in SECRET_PARAMS}}
+
+
+class RecordingHTTPClient:
+    """
+    Wraps the pooled HTTP client and records every GET to a cassette
+
+    Args:
+        client: The real PooledHTTPClient
+        cassette: Where exchanges are written
+    """
+    def __init__(self, client, cassette: Cassette):
+        self.client = client
+        self.cassette = cassette
+
+    def get(self, url: str, params: dict = None, timeout=None, **kwargs) -> requests.Response:
+        start = time.perf_counter()
+        response = self.client.get(url, params=params, timeout=timeout, **kwargs)
+        self.cassette.record(_http_request(url, params), {
+            "status": response.status_code,
+            "content_type": response.headers.get("Content-Type", "application/json"),
+            "body": response.text,
+            "elapsed": time.perf_counter() - start
+        })
+        return response
+
+    def close(self):
+        self.client.close()
+
+
+class ReplayHTTPClient:
+    """
+    Drop-in replacement for PooledHTTPClient that answers from a cassette
+
+    A request without a recording fails like an unreachable server (and is
+    noted as a miss of the cassette).
+
+    Args:
+        cassette: Recorded exchanges
+        profile: Injected latency and faults
+    """
+    def __init__(self, cassette: Cassette, profile: FaultProfile = None):
+        self.cassette = cassette
+        self.profile = profile or FaultProfile()
+        self.calls = 0
+
+    def get(self, url: str, params: dict = None, timeout=None, **kwargs) -> requests.Response:
+        self.calls += 1
+        recorded = self.cassette.find(_http_request(url, params))
+        if recorded is None:
+            description = f"No recorded response for GET {url} {_http_request(url, params)['params']}"
+            self.cassette.miss(description)
+            raise requests.exceptions.ConnectionError(description)
+
+        fault = self.profile.fault()
+        time.sleep(self.profile.delay(recorded.get("elapsed", 0.0)))
+        if fault == "timeout":
+            raise requests.exceptions.ReadTimeout(f"Read timed out (injected) for GET {url}")
+
+        response = requests.Response()
+        response.url = url
+        response.encoding = "utf-8"
+        if fault == "rate_limit":
+            response.status_code = 429
+            response.headers["Retry-After"] = "1"
+            response._content = b'{"cod": 429, "message": "rate limit exceeded (injected)"}'
+        else:
+            response.status_code = recorded["status"]
+            response.headers["Content-Type"] = recorded.get("content_type", "application/json")
+            response._content = recorded["body"].encode("utf-8")
+        return response
+
+    def close(self):
+        pass
+
+
+# One cassette per file, shared by every client in the process
+_cassettes = {}
+_cassettes_lock = threading.Lock()
+
+
+def get_cassette(name: str) -> Cassette:
+    """Get the process-wide cassette stored as CASSETTE_DIR/<name>.jsonl"""
+    with _cassettes_lock:
+        if name not in _cassettes:
+            _cassettes[name] = Cassette(os.path.join(CASSETTE_DIR, f"{name}.jsonl"))
+        return _cassettes[name]
+
+
+def cassette_misses() -> list:
+    """Distinct requests of this process that had no recording, as "<cassette>: <description>" """
+    with _cassettes_lock:
+        cassettes = dict(_cassettes)
+    # Retries repeat a miss: report each request once
+    return list(dict.fromkeys(f"{name}: {miss}" for name, cassette in sorted(cassettes.items()) for miss in list(cassette.misses)))
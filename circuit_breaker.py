@@ -0,0 +1,160 @@
+# circuit_breaker.py - Fail fast while a backend is down instead of waiting on its timeouts
+import logging
+import threading
+import time
+
+from errors import SERVICE_EXCEPTIONS, CircuitOpenError, classify_error
+from metrics import get_metrics
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+
+# Gauge values of the states
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker around calls to one backend
+
+    - Closed: calls go through; `failure_threshold` failures in a row open it.
+    - Open: calls raise CircuitOpenError at once, for `reset_timeout` seconds.
+    - Half-open: one trial call goes through (the others are still rejected);
+      its success closes the breaker, its failure opens it again.
+
+    Only failures of the backend itself (timeouts, 5xx, rate limits, broken
+    connections) count; a rejected request (404, bad key) means it is up.
+
+    Args:
+        name: Label for logs and metrics ("weather", ...)
+        failure_threshold: Consecutive failures that open the breaker
+        reset_timeout: Seconds the breaker stays open before a trial call
+    """
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self.trips = 0
+        self.rejected = 0
+        self._report_state()
+        # Expose a zero trip count from the start so dashboards see the series
+        get_metrics().counter("travel_circuit_trips_total", "Times a circuit breaker opened").inc(0, breaker=name)
+
+    @property
+    def state(self) -> str:
+        """Current state; an open breaker whose timeout has passed reports half-open"""
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return HALF_OPEN
+            return self._state
+
+    def call(self, func):
+        """
+        Call func() unless the breaker is open
+
+        Raises:
+            CircuitOpenError: The breaker is open (func is not called)
+            ServiceError: The typed error func failed with
+            Exception: Anything that is not a service failure, unchanged (it does not count either way)
+        """
+        trial = self._before_call()
+        try:
+            result = func()
+        except SERVICE_EXCEPTIONS as e:
+            error = classify_error(e)
+            if error.retryable:
+                self._on_failure(trial)
+            else:
+                self._on_success(trial)
+            if error is e:
+                raise
+            raise error from e
+        except BaseException:
+            self._release(trial)
+            raise
+        self._on_success(trial)
+        return result
+
+    def _before_call(self) -> bool:
+        """Let a call through or reject it; returns whether it is the half-open trial call"""
+        with self._lock:
+            if self._state == CLOSED:
+                return False
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._set_state(HALF_OPEN)
+            if self._state == HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            self.rejected += 1
+            retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+        get_metrics().counter("travel_circuit_rejected_total", "Calls rejected by an open circuit breaker").inc(breaker=self.name)
+        raise CircuitOpenError(f"{self.name} circuit breaker is open", retry_after=retry_in)
+
+    def _on_success(self, trial: bool):
+        with self._lock:
+            self._failures = 0
+            if trial:
+                self._trial_running = False
+                self._set_state(CLOSED)
+                logger.info(f"{self.name} circuit breaker closed: trial call succeeded")
+
+    def _release(self, trial: bool):
+        """Let another trial call through after one that ended without a verdict on the backend"""
+        if trial:
+            with self._lock:
+                self._trial_running = False
+
+    def _on_failure(self, trial: bool):
+        with self._lock:
+            self._failures += 1
+            if trial:
+                self._trial_running = False
+            elif self._state != CLOSED or self._failures < self.failure_threshold:
+                return
+            self._opened_at = time.monotonic()
+            self._set_state(OPEN)
+            self.trips += 1
+        logger.warning(f"{self.name} circuit breaker opened after {self._failures} failures in a row, "
+                       f"failing fast for {self.reset_timeout:g}s")
+        get_metrics().counter("travel_circuit_trips_total", "Times a circuit breaker opened").inc(breaker=self.name)
+
+    def _set_state(self, state: str):
+        """Change state (caller holds the lock)"""
+        self._state = state
+        self._report_state()
+
+    def _report_state(self):
+        get_metrics().gauge("travel_circuit_state", "Circuit breaker state (0 closed, 1 half-open, 2 open)").set(
+            _STATE_VALUES[self._state], breaker=self.name)
+
+    def stats(self) -> dict:
+        """State, consecutive failures, trips and rejected calls"""
+        with self._lock:
+            return {
+                "state": self._state,
+                "failures": self._failures,
+                "trips": self.trips,
+                "rejected": self.rejected
+            }
+
+
+# One breaker per backend and process, so every client of a backend shares its state
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_circuit_breaker(name: str, failure_threshold: int = 5, reset_timeout: float = 30.0) -> CircuitBreaker:
+    """Get the process-wide breaker of a backend (the settings apply when it is first created)"""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name, failure_threshold, reset_timeout)
+        return _breakers[name]
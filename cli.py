@@ -66,9 +66,11 @@ def main():
             elif not user_input:
                 continue
             
-            # Get response from assistant (action steps logged to file)
-            response = assistant.get_response(user_input)
-            print(f"\nAssistant: {response}")
+            # Stream response from assistant as it is generated (action steps logged to file)
+            print("\nAssistant: ", end="", flush=True)
+            for chunk in assistant.stream_response(user_input):
+                print(chunk, end="", flush=True)
+            print()
             
         except KeyboardInterrupt:
             print("\n\nGoodbye! Safe travels!")
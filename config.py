@@ -13,11 +13,43 @@ except Exception:
 # Load environment variables
 load_dotenv()
 
+# Backends: "live" (real APIs), "record" (real APIs, exchanges saved to cassettes) or "replay" (cassettes only, no network)
+BACKEND_MODE = os.getenv("BACKEND_MODE", "live").lower()
+if BACKEND_MODE not in ("live", "record", "replay"):
+    raise ValueError(f"BACKEND_MODE must be live, record or replay, not {BACKEND_MODE!r}")
+if BACKEND_MODE == "replay":
+    # Replays never reach the APIs, so keys are optional
+    os.environ.setdefault("GROQ_API_KEY", "replay-no-key")
+    os.environ.setdefault("WEATHER_API_KEY", "replay-no-key")
+    # ...and are not paced by the Groq rate limits unless those are set explicitly
+    os.environ.setdefault("GROQ_REQUESTS_PER_MINUTE", "1000000")
+    os.environ.setdefault("GROQ_TOKENS_PER_MINUTE", "1000000000")
+
 # Groq API Configuration
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 if not GROQ_API_KEY:
     raise ValueError("GROQ_API_KEY not found in environment variables. Please create a .env file with your API key.")
-MODEL_NAME = "llama-3.3-70b-versatile"
+MODEL_NAME = os.getenv("MODEL_NAME", "llama-3.3-70b-versatile")  # Large model: answers
+SMALL_MODEL_NAME = os.getenv("SMALL_MODEL_NAME", "llama-3.1-8b-instant")  # Fast model: routing JSON, clarifications, summaries
+
+# Model per pipeline stage, and the fallback it is downgraded to while that model is rate limited ("" for none)
+ROUTER_MODEL = os.getenv("ROUTER_MODEL", SMALL_MODEL_NAME)
+ROUTER_FALLBACK_MODEL = os.getenv("ROUTER_FALLBACK_MODEL", MODEL_NAME)
+CLARIFICATION_MODEL = os.getenv("CLARIFICATION_MODEL", SMALL_MODEL_NAME)
+CLARIFICATION_FALLBACK_MODEL = os.getenv("CLARIFICATION_FALLBACK_MODEL", MODEL_NAME)
+GENERATION_MODEL = os.getenv("GENERATION_MODEL", MODEL_NAME)
+GENERATION_FALLBACK_MODEL = os.getenv("GENERATION_FALLBACK_MODEL", SMALL_MODEL_NAME)
+COMPLEX_REASONING_MODEL = os.getenv("COMPLEX_REASONING_MODEL", MODEL_NAME)
+COMPLEX_REASONING_FALLBACK_MODEL = os.getenv("COMPLEX_REASONING_FALLBACK_MODEL", SMALL_MODEL_NAME)
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", SMALL_MODEL_NAME)
+SUMMARY_FALLBACK_MODEL = os.getenv("SUMMARY_FALLBACK_MODEL", MODEL_NAME)
+STAGE_MODELS = {
+    "router": (ROUTER_MODEL, ROUTER_FALLBACK_MODEL),
+    "clarification": (CLARIFICATION_MODEL, CLARIFICATION_FALLBACK_MODEL),
+    "generation": (GENERATION_MODEL, GENERATION_FALLBACK_MODEL),
+    "complex_reasoning": (COMPLEX_REASONING_MODEL, COMPLEX_REASONING_FALLBACK_MODEL),
+    "summary": (SUMMARY_MODEL, SUMMARY_FALLBACK_MODEL)
+}
 
 # Weather API Configuration
 WEATHER_API_KEY = os.getenv("WEATHER_API_KEY")
@@ -26,6 +58,60 @@ if not WEATHER_API_KEY:
 
 # External APIs Configuration
 
+# Local cache directory (persistent geocode index, learned locations)
+CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"))
+GEOCODE_CACHE_DIR = os.getenv("GEOCODE_CACHE_DIR", CACHE_DIR)
+
+# Record/replay cassettes (BACKEND_MODE=record or replay)
+CASSETTE_DIR = os.getenv("CASSETTE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cassettes"))
+REPLAY_LATENCY = os.getenv("REPLAY_LATENCY", "0")  # Seconds per replayed call, or "recorded"
+REPLAY_JITTER = float(os.getenv("REPLAY_JITTER", "0"))  # Extra random 0..N seconds per call
+REPLAY_RATE_LIMIT_RATE = float(os.getenv("REPLAY_RATE_LIMIT_RATE", "0"))  # Fraction of calls answered with 429
+REPLAY_TIMEOUT_RATE = float(os.getenv("REPLAY_TIMEOUT_RATE", "0"))  # Fraction of calls that time out
+REPLAY_SEED = int(os.getenv("REPLAY_SEED", "0"))
+
+# Groq client connection pool (one client per model, shared by all threads)
+LLM_POOL_MAX_CONNECTIONS = int(os.getenv("LLM_POOL_MAX_CONNECTIONS", "100"))
+LLM_POOL_MAX_KEEPALIVE = int(os.getenv("LLM_POOL_MAX_KEEPALIVE", "20"))
+
+# Weather cache: raw forecasts are fresh for WEATHER_CACHE_TTL seconds, then served stale
+# for up to WEATHER_CACHE_STALE_TTL more seconds while a background refresh runs
+WEATHER_CACHE_TTL = int(os.getenv("WEATHER_CACHE_TTL", "1800"))
+WEATHER_CACHE_STALE_TTL = int(os.getenv("WEATHER_CACHE_STALE_TTL", "3600"))
+WEATHER_CACHE_MAX_ENTRIES = int(os.getenv("WEATHER_CACHE_MAX_ENTRIES", "512"))
+WEATHER_CACHE_MAX_BYTES = int(os.getenv("WEATHER_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+# Pooled HTTP connections for external APIs (keep-alive, per-host limits, timeouts in seconds)
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "10"))  # Hosts to keep pools for
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "10"))  # Connections per host
+HTTP_POOL_BLOCK = os.getenv("HTTP_POOL_BLOCK", "true").lower() == "true"
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "10"))
+
+# Router analysis memo (keyed by normalized message + conversation context)
+ROUTER_CACHE_TTL = int(os.getenv("ROUTER_CACHE_TTL", "3600"))
+ROUTER_CACHE_MAX_ENTRIES = int(os.getenv("ROUTER_CACHE_MAX_ENTRIES", "1024"))
+
+# Local fast path that answers easy analyses without the router LLM call
+ROUTER_FAST_PATH_ENABLED = os.getenv("ROUTER_FAST_PATH_ENABLED", "true").lower() == "true"
+ROUTER_FAST_PATH_THRESHOLD = float(os.getenv("ROUTER_FAST_PATH_THRESHOLD", "0.75"))  # Minimum class probability
+
+# Semantic response cache (answers reused for near-identical questions)
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_EMBEDDER = os.getenv("RESPONSE_CACHE_EMBEDDER", "hashing")  # "hashing" or "module:factory"
+RESPONSE_CACHE_THRESHOLD = float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.9"))  # Minimum cosine similarity
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+RESPONSE_CACHE_WEATHER_BUCKET_SECONDS = int(os.getenv("RESPONSE_CACHE_WEATHER_BUCKET_SECONDS", "10800"))  # Forecast step
+
+# Batch answering (TravelAssistant.get_responses): sessions processed in parallel
+BATCH_MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", "8"))
+
+# Tracing and metrics
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "")  # JSONL file for finished traces (empty = keep in memory only)
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "200"))  # Recent traces served on /traces
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # Serve /metrics and /traces on this port (0 = off)
+
 # Model Parameters (can be overridden by environment variables)
 TEMPERATURE = float(os.getenv("TEMPERATURE", "0.7"))
 MAX_TOKENS_TOOL = int(os.getenv("MAX_TOKENS_TOOL", "128"))  # For classification/decision calls
@@ -33,12 +119,38 @@ MAX_TOKENS_GENERATION = int(os.getenv("MAX_TOKENS_GENERATION", "1024"))  # For f
 MAX_TOKENS_DEBUG = int(os.getenv("MAX_TOKENS_DEBUG", "1024"))  # For debug mode with chain of thought
 
 # Conversation settings (can be overridden by environment variables)
-MAX_CONVERSATION_HISTORY = int(os.getenv("MAX_CONVERSATION_HISTORY", "10"))  # Keep last 10 messages for context
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1500"))  # Most history tokens sent with a request
+HISTORY_KEEP_TOKENS = int(os.getenv("HISTORY_KEEP_TOKENS", "750"))  # Recent tokens kept verbatim when older turns are summarized
+HISTORY_SUMMARY_MAX_TOKENS = int(os.getenv("HISTORY_SUMMARY_MAX_TOKENS", "200"))  # Length of the rolling summary
+
+# Rate limiting settings (one token bucket per model, see rate_limiter.py)
+# Defaults match Groq's free tier for llama-3.3-70b-versatile; the buckets are corrected from response headers
+GROQ_REQUESTS_PER_MINUTE = int(os.getenv("GROQ_REQUESTS_PER_MINUTE", "30"))
+GROQ_TOKENS_PER_MINUTE = int(os.getenv("GROQ_TOKENS_PER_MINUTE", "12000"))
+
+# Retries of transient failures (see retry_policy.py); a server's Retry-After replaces the backoff
+RETRY_ATTEMPTS = int(os.getenv("RETRY_ATTEMPTS", "3"))  # Calls in total, the first one included
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "0.25"))  # Seconds, doubled per retry, randomized
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "4"))
+RETRY_MAX_RETRY_AFTER = float(os.getenv("RETRY_MAX_RETRY_AFTER", "20"))  # Longer Retry-After waits are not worth it
+
+# Latency budget per turn (see deadline.py); stages skip or shorten work when little of it is left
+TURN_DEADLINE = float(os.getenv("TURN_DEADLINE", "0"))  # Default budget in seconds of get_response (0 = none)
+DEADLINE_ROUTER_MIN = float(os.getenv("DEADLINE_ROUTER_MIN", "2.0"))  # Less left: the router only uses cached analyses
+DEADLINE_WEATHER_MIN = float(os.getenv("DEADLINE_WEATHER_MIN", "1.5"))  # Less left: weather only comes from the cache
+DEADLINE_FIRST_TOKEN_SECONDS = float(os.getenv("DEADLINE_FIRST_TOKEN_SECONDS", "0.5"))  # Expected wait for the first token
+DEADLINE_TOKENS_PER_SECOND = float(os.getenv("DEADLINE_TOKENS_PER_SECOND", "200"))  # Expected generation speed, sizes max_tokens
+DEADLINE_MIN_TOKENS = int(os.getenv("DEADLINE_MIN_TOKENS", "128"))  # Shortest answer allowed when the budget is tight
+DEADLINE_MIN_LLM_TIMEOUT = float(os.getenv("DEADLINE_MIN_LLM_TIMEOUT", "1.0"))  # An answer is still attempted past the deadline
 
-# Rate limiting settings
-# Set to 1.0 for normal CLI use (balanced speed/reliability)
-# Set to 2.0 for batch testing to avoid rate limits
-API_DELAY_SECONDS = 1.0
+# OpenWeatherMap resilience (see circuit_breaker.py and hedging.py)
+WEATHER_RETRY_ATTEMPTS = int(os.getenv("WEATHER_RETRY_ATTEMPTS", "2"))  # Calls in total; the hedge covers slow ones
+WEATHER_BREAKER_FAILURES = int(os.getenv("WEATHER_BREAKER_FAILURES", "5"))  # Failed calls in a row that open the breaker
+WEATHER_BREAKER_RESET = float(os.getenv("WEATHER_BREAKER_RESET", "30"))  # Seconds of failing fast before a trial call
+WEATHER_HEDGE_ENABLED = os.getenv("WEATHER_HEDGE_ENABLED", "true").lower() == "true"
+WEATHER_HEDGE_PERCENTILE = float(os.getenv("WEATHER_HEDGE_PERCENTILE", "95"))  # Send a duplicate past this latency percentile
+WEATHER_HEDGE_DEFAULT_DELAY = float(os.getenv("WEATHER_HEDGE_DEFAULT_DELAY", "1.0"))  # Until enough latencies are observed
+WEATHER_HEDGE_MIN_DELAY = float(os.getenv("WEATHER_HEDGE_MIN_DELAY", "0.05"))
 
 # Debug settings
 # Set to True to show chain of thought reasoning in responses (for evaluation/demonstration)
@@ -0,0 +1,133 @@
+# conversation_state.py - Compact slot state of a conversation (destination, dates, budget, interests), updated every turn
+import re
+
+# Words in a user message that reveal a budget level
+_BUDGET_WORDS = {
+    "low": ("budget", "cheap", "affordable", "inexpensive", "backpacking", "backpacker", "low cost", "shoestring"),
+    "high": ("luxury", "luxurious", "splurge", "five star", "5 star", "high end", "upscale", "honeymoon")
+}
+_BUDGET_AMOUNT = re.compile(r"([$€£]\s?\d[\d,.]*\s?k?|\d[\d,.]*\s?(?:usd|eur|euros?|dollars?|pounds?|gbp))", re.IGNORECASE)
+
+# Interest keyword -> slot value
+_INTERESTS = {
+    "beach": "beaches", "beaches": "beaches", "hiking": "hiking", "hike": "hiking", "trek": "hiking", "trekking": "hiking",
+    "museum": "museums", "museums": "museums", "art": "art", "history": "history", "historic": "history",
+    "food": "food", "foodie": "food", "restaurants": "food", "cuisine": "food", "wine": "wine",
+    "nightlife": "nightlife", "party": "nightlife", "clubs": "nightlife", "shopping": "shopping",
+    "culture": "culture", "cultural": "culture", "romantic": "romance", "romance": "romance",
+    "kids": "family", "family": "family", "children": "family", "adventure": "adventure",
+    "skiing": "skiing", "ski": "skiing", "diving": "diving", "snorkeling": "diving", "surfing": "surfing",
+    "nature": "nature", "wildlife": "wildlife", "photography": "photography", "relax": "relaxation", "relaxing": "relaxation"
+}
+
+# Capitalized word runs in an answer are candidate place names ("New York", "Lisbon")
+_PROPER_NOUNS = re.compile(r"\b[A-Z][a-zà-ÿ]+(?:[ -][A-Z][a-zà-ÿ]+){0,2}\b")
+
+MAX_INTERESTS = 6
+MAX_SUGGESTED = 3
+MAX_QUESTION_WORDS = 30
+
+
+class ConversationState:
+    """
+    What the router needs to know about earlier turns, in a few dozen tokens
+
+    Slots are filled from the router's own analysis of each message (city,
+    country, time reference, category), a keyword scan of the user's words
+    (budget, interests) and the known places named in the assistant's
+    answers, so questions like "what should I pack for that trip?" resolve
+    without resending whole answers.
+    """
+    def __init__(self):
+        self.city = ""
+        self.country = ""
+        self.when = ""
+        self.budget = ""
+        self.interests = []
+        self.last_category = ""
+        self.last_question = ""
+        self.suggested = []  # Places the assistant proposed in its last answer
+
+    @property
+    def destination(self) -> str:
+        """City and country of the current destination ("Tokyo, Japan")"""
+        return ", ".join(part for part in (self.city, self.country) if part)
+
+    def is_empty(self) -> bool:
+        return not (self.destination or self.when or self.budget or self.interests or self.last_category or self.suggested)
+
+    def update_from_question(self, user_message: str, analysis: dict, reliable: bool = True):
+        """
+        Fold one user message and its analysis into the state
+
+        Args:
+            user_message: What the user asked
+            analysis: Router output for the message
+            reliable: False for fallback analyses (LLM errors); their slots are ignored
+        """
+        if reliable:
+            city = (analysis.get("city") or "").strip()
+            country = (analysis.get("country") or "").strip()
+            if city or country:
+                # A newly named place replaces the previous destination as a whole
+                self.city, self.country = city, country
+                self.suggested = []
+            if analysis.get("when"):
+                self.when = str(analysis["when"]).strip()
+            self.last_category = analysis.get("category") or self.last_category
+
+        text = user_message.lower()
+        for level, words in _BUDGET_WORDS.items():
+            if any(re.search(rf"\b{re.escape(word)}\b", text) for word in words):
+                self.budget = level
+        amount = _BUDGET_AMOUNT.search(user_message)
+        if amount:
+            self.budget = amount.group(0).strip()
+
+        for word in re.findall(r"[a-z]+", text):
+            interest = _INTERESTS.get(word)
+            if interest and interest not in self.interests:
+                self.interests.append(interest)
+        self.interests = self.interests[-MAX_INTERESTS:]
+
+        words = user_message.split()
+        self.last_question = " ".join(words[:MAX_QUESTION_WORDS]) + (" ..." if len(words) > MAX_QUESTION_WORDS else "")
+
+    def update_from_answer(self, response: str, is_known_place):
+        """
+        Remember the first few known places an answer proposes
+
+        Args:
+            response: The assistant's answer
+            is_known_place: Function telling whether a name is a known location
+        """
+        suggested = []
+        for match in _PROPER_NOUNS.finditer(response or ""):
+            name = match.group(0)
+            if name not in suggested and name != self.city and is_known_place(name):
+                suggested.append(name)
+                if len(suggested) == MAX_SUGGESTED:
+                    break
+        if suggested:
+            self.suggested = suggested
+
+    def to_context(self) -> str:
+        """One-line summary for the router prompt ("" when nothing is known yet)"""
+        if self.is_empty():
+            return ""
+        parts = []
+        if self.destination:
+            parts.append(f"destination: {self.destination}")
+        if self.when:
+            parts.append(f"dates: {self.when}")
+        if self.budget:
+            parts.append(f"budget: {self.budget}")
+        if self.interests:
+            parts.append(f"interests: {', '.join(self.interests)}")
+        if self.suggested:
+            parts.append(f"places just suggested: {', '.join(self.suggested)}")
+        if self.last_category:
+            parts.append(f"last topic: {self.last_category}")
+        if self.last_question:
+            parts.append(f'last question: "{self.last_question}"')
+        return "; ".join(parts)
@@ -0,0 +1,205 @@
+# daily_forecast.py - Per-local-day summaries of an OpenWeatherMap 5-day / 3-hour forecast (vectorized with NumPy)
+import logging
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+SECONDS_PER_DAY = 86400
+_EPOCH = date(1970, 1, 1)
+
+
+class DailyForecast:
+    """
+    A forecast payload turned into arrays once, with every local day summarized in one pass
+
+    The 3-hour slots are grouped by calendar day in the city's own time zone
+    (the payload's UTC offset), so "tomorrow" starts at local midnight. Per
+    day: min/max/mean temperature, mean humidity, the highest precipitation
+    probability, mean and top wind speed and the most frequent condition.
+    Instances are immutable and cached with the payload's location, so any
+    day-specific question is answered from the precomputed days; range
+    summaries are memoized too. Returned dicts are shared: read them only.
+
+    Args:
+        payload: Response of /data/2.5/forecast
+    """
+    def __init__(self, payload: dict):
+        slots = sorted(payload.get('list') or [], key=lambda s: s['dt'])
+        count = len(slots)
+        self.utc_offset = int((payload.get('city') or {}).get('timezone') or 0)
+
+        # Slot arrays (pop and wind are missing from some payloads: NaN)
+        self.times = np.fromiter((s['dt'] for s in slots), dtype=np.int64, count=count)
+        self.temps = np.fromiter((s['main']['temp'] for s in slots), dtype=np.float64, count=count)
+        self.humidity = np.fromiter((s['main'].get('humidity', np.nan) for s in slots), dtype=np.float64, count=count)
+        self.pop = np.fromiter((s.get('pop', np.nan) for s in slots), dtype=np.float64, count=count)
+        self.wind = np.fromiter(((s.get('wind') or {}).get('speed', np.nan) for s in slots), dtype=np.float64, count=count)
+        descriptions = np.array([s['weather'][0]['description'] if s.get('weather') else "" for s in slots], dtype=str)
+        self.conditions, self.condition_codes = np.unique(descriptions, return_inverse=True)
+
+        # Local calendar day of every slot; slots are sorted, so each day is one contiguous run
+        self.slot_days = (self.times + self.utc_offset) // SECONDS_PER_DAY
+        self.day_numbers, starts, self.slot_day_index = np.unique(self.slot_days, return_index=True, return_inverse=True)
+        if count == 0:
+            starts = np.zeros(0, dtype=np.int64)
+        self.slot_counts = np.bincount(self.slot_day_index, minlength=len(self.day_numbers))
+
+        # Per-day aggregates
+        self.mean_temps = self._day_mean(self.temps)
+        self.min_temps = np.minimum.reduceat(self.temps, starts) if count else self.temps
+        self.max_temps = np.maximum.reduceat(self.temps, starts) if count else self.temps
+        self.mean_humidity = self._day_mean(self.humidity)
+        self.max_pop = np.fmax.reduceat(self.pop, starts) if count else self.pop
+        self.mean_wind = self._day_mean(self.wind)
+        self.max_wind = np.fmax.reduceat(self.wind, starts) if count else self.wind
+        # Slots per (day, condition): the dominant condition of a day or a range of days is the largest column
+        self.condition_counts = np.zeros((len(self.day_numbers), len(self.conditions)), dtype=np.int32)
+        np.add.at(self.condition_counts, (self.slot_day_index, self.condition_codes), 1)
+
+        # Local dates covered (the first and last are usually partial) and their summaries
+        self.dates = [_EPOCH + timedelta(days=int(d)) for d in self.day_numbers]
+        self._day_summaries = [self._day_summary(i) for i in range(len(self.day_numbers))]
+        self._ranges = {}  # (first day index, end day index) -> summary
+        self._windows = {}  # (first slot index, end slot index) -> summary
+
+    def _day_mean(self, values: np.ndarray) -> np.ndarray:
+        """Mean of each day's slots, ignoring NaN (NaN for a day without any value)"""
+        present = ~np.isnan(values)
+        totals = np.bincount(self.slot_day_index, weights=np.where(present, values, 0.0), minlength=len(self.day_numbers))
+        counts = np.bincount(self.slot_day_index, weights=present, minlength=len(self.day_numbers))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return totals / counts
+
+    def __len__(self):
+        return len(self.times)
+
+    def estimated_size(self) -> int:
+        """Approximate memory footprint in bytes, for the cache's memory cap"""
+        arrays = (self.times, self.temps, self.humidity, self.pop, self.wind, self.condition_codes, self.slot_days,
+                  self.slot_day_index, self.conditions, self.condition_counts)
+        return sum(a.nbytes for a in arrays) + 10 * 8 * len(self.day_numbers)
+
+    def today(self, now: float = None) -> date:
+        """The city's local date (at `now`, a Unix time, by default the current time)"""
+        now = time.time() if now is None else now
+        return _EPOCH + timedelta(days=int((now + self.utc_offset) // SECONDS_PER_DAY))
+
+    def nearest(self, now: float = None) -> dict:
+        """The slot closest to `now`: current conditions (None if there are no slots)"""
+        if not len(self):
+            return None
+        now = time.time() if now is None else now
+        i = int(np.argmin(np.abs(self.times - now)))
+        return {
+            'temperature': float(self.temps[i]),
+            'description': str(self.conditions[self.condition_codes[i]]),
+            'humidity': _round(self.humidity[i], 0),
+            'wind_speed': _round(self.wind[i], 1),
+            'precipitation_chance': _percent(self.pop[i])
+        }
+
+    def day(self, day: date) -> dict:
+        """Summary of one local day, or None if the forecast does not cover it"""
+        return self.days(day, day)
+
+    def days(self, first: date, last: date) -> dict:
+        """
+        Summary of the local days from `first` to `last` (inclusive)
+
+        Returns:
+            Dictionary with the range's temperature/humidity/precipitation/wind/condition
+            and a 'days' list of per-day summaries, or None if no day of the range is covered
+        """
+        first_number = (first - _EPOCH).days
+        last_number = (last - _EPOCH).days
+        lo, hi = (int(i) for i in np.searchsorted(self.day_numbers, [first_number, last_number + 1]))
+        if lo >= hi:
+            return None
+        summary = self._ranges.get((lo, hi))
+        if summary is None:
+            summary = self._ranges[(lo, hi)] = self._range_summary(lo, hi)
+        return summary
+
+    def _range_summary(self, lo: int, hi: int) -> dict:
+        """Summary of the covered days lo..hi-1"""
+        counts = self.slot_counts[lo:hi]
+        return {
+            'first_date': self.dates[lo].isoformat(),
+            'last_date': self.dates[hi - 1].isoformat(),
+            'temperature': round(float(np.average(self.mean_temps[lo:hi], weights=counts)), 1),
+            'min_temp': round(float(self.min_temps[lo:hi].min()), 1),
+            'max_temp': round(float(self.max_temps[lo:hi].max()), 1),
+            'description': str(self.conditions[self.condition_counts[lo:hi].sum(axis=0).argmax()]),
+            'humidity': _round(_nanaverage(self.mean_humidity[lo:hi], counts), 0),
+            'precipitation_chance': _percent(_nanmax(self.max_pop[lo:hi])),
+            'wind_speed': _round(_nanaverage(self.mean_wind[lo:hi], counts), 1),
+            'max_wind_speed': _round(_nanmax(self.max_wind[lo:hi]), 1),
+            'days': self._day_summaries[lo:hi]
+        }
+
+    def window(self, start: float, hours: float) -> dict:
+        """Summary of the slots from Unix time `start` (the slot in progress included) over the next `hours`, or None"""
+        # Slots are sorted, so the window is one contiguous run
+        lo, hi = (int(i) for i in np.searchsorted(self.times, [start - 1.5 * 3600, start + hours * 3600]))
+        if lo >= hi:
+            return None
+        summary = self._windows.get((lo, hi))
+        if summary is None:
+            summary = self._windows[(lo, hi)] = {
+                'temperature': round(float(self.temps[lo:hi].mean()), 1),
+                'min_temp': round(float(self.temps[lo:hi].min()), 1),
+                'max_temp': round(float(self.temps[lo:hi].max()), 1),
+                'description': str(self.conditions[np.bincount(self.condition_codes[lo:hi], minlength=len(self.conditions)).argmax()]),
+                'humidity': _round(_nanaverage(self.humidity[lo:hi]), 0),
+                'precipitation_chance': _percent(_nanmax(self.pop[lo:hi]))
+            }
+        return summary
+
+    def _day_summary(self, i: int) -> dict:
+        """Summary of the i-th covered day"""
+        day = self.dates[i]
+        return {
+            'date': day.isoformat(),
+            'weekday': day.strftime("%A"),
+            'temperature': round(float(self.mean_temps[i]), 1),
+            'min_temp': round(float(self.min_temps[i]), 1),
+            'max_temp': round(float(self.max_temps[i]), 1),
+            'description': str(self.conditions[self.condition_counts[i].argmax()]),
+            'humidity': _round(self.mean_humidity[i], 0),
+            'precipitation_chance': _percent(self.max_pop[i]),
+            'wind_speed': _round(self.mean_wind[i], 1),
+            'max_wind_speed': _round(self.max_wind[i], 1),
+            'partial': bool(self.slot_counts[i] < 8)
+        }
+
+
+def _nanaverage(values: np.ndarray, weights: np.ndarray = None) -> float:
+    """Weighted mean ignoring NaN (NaN if every value is)"""
+    present = ~np.isnan(values)
+    if not present.any():
+        return np.nan
+    return float(np.average(values[present], weights=None if weights is None else weights[present]))
+
+
+def _nanmax(values: np.ndarray) -> float:
+    """Largest value ignoring NaN (NaN if every value is)"""
+    present = values[~np.isnan(values)]
+    return float(present.max()) if len(present) else np.nan
+
+
+def _round(value, digits: int):
+    """Rounded float (int for 0 digits), or None for NaN"""
+    if np.isnan(value):
+        return None
+    return int(round(float(value))) if digits == 0 else round(float(value), digits)
+
+
+def _percent(probability):
+    """A 0..1 probability as a whole percentage, or None for NaN"""
+    if np.isnan(probability):
+        return None
+    return int(round(float(probability) * 100))
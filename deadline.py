@@ -0,0 +1,76 @@
+# deadline.py - Per-turn latency budget that every stage of the turn can see and shorten its work to
+import contextvars
+import logging
+import time
+from contextlib import contextmanager
+
+from metrics import get_metrics
+from tracing import reset_context, set_attribute
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# The deadline of the running turn. Like the trace, it follows the turn into
+# asyncio tasks, asyncio.to_thread workers and hedged requests.
+_current_deadline = contextvars.ContextVar("current_deadline", default=None)
+
+
+class Deadline:
+    """
+    Point in time by which a turn should be answered
+
+    Args:
+        budget: Seconds from now
+    """
+    def __init__(self, budget: float):
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+
+    def remaining(self) -> float:
+        """Seconds left (0 once expired)"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+
+@contextmanager
+def deadline_scope(budget):
+    """
+    Run the enclosed stages under a deadline
+
+    Args:
+        budget: Seconds from now, a Deadline, or None/0 for no deadline
+
+    Yields:
+        The Deadline (None if there is none)
+    """
+    # Set even without a budget: a streamed turn closed from another thread cannot
+    # unset its deadline in the caller's context, and the next turn must not inherit it
+    deadline = None if not budget else budget if isinstance(budget, Deadline) else Deadline(budget)
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        reset_context(_current_deadline, token)
+
+
+def current_deadline():
+    """The deadline of the running turn, or None"""
+    return _current_deadline.get()
+
+
+def remaining():
+    """Seconds left in the running turn's budget, or None if it has no deadline"""
+    deadline = _current_deadline.get()
+    return deadline.remaining() if deadline is not None else None
+
+
+def record_degradation(stage: str, action: str):
+    """Log, count and trace a stage that cut its work short to stay within the deadline"""
+    left = remaining()
+    logger.warning(f"Deadline: {stage} {action.replace('_', ' ')} ({left or 0:.2f}s left)")
+    set_attribute("deadline", action)
+    get_metrics().counter("travel_deadline_degradations_total", "Stages that skipped or shortened work to meet a turn's deadline").inc(
+        stage=stage, action=action)
@@ -0,0 +1,118 @@
+# errors.py - Typed failures of external services (Groq, OpenWeatherMap) and how they map from client exceptions
+import groq
+import httpx  # installed with the groq SDK
+import requests
+
+from rate_limiter import parse_duration
+
+
+class ServiceError(Exception):
+    """
+    An external service call that failed
+
+    Args:
+        message: What went wrong
+        retry_after: Seconds the server asked us to wait before trying again, if it said
+        status_code: HTTP status of the failed response, if there was one
+    """
+    retryable = False
+    user_message = "Sorry, I encountered an error while preparing your answer. Please try again."
+
+    def __init__(self, message: str, retry_after: float = None, status_code: int = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.status_code = status_code
+
+
+class RateLimitError(ServiceError):
+    """The service answered 429: over the request or token budget"""
+    retryable = True
+    user_message = "Sorry, I've reached the API rate limit. Please try again in a few minutes."
+
+
+class ServiceTimeoutError(ServiceError):
+    """The service did not answer in time"""
+    retryable = True
+    user_message = "Sorry, the service took too long to answer. Please try again."
+
+
+class ServerError(ServiceError):
+    """The service failed on its side (5xx) or the connection to it broke"""
+    retryable = True
+
+
+class RequestError(ServiceError):
+    """The service rejected the request itself (bad request, authentication); trying again will not help"""
+
+
+class DeadlineExceededError(ServiceError):
+    """Not enough of the turn's latency budget is left to make the call"""
+    user_message = "Sorry, I couldn't answer in time. Please try again."
+
+
+class CircuitOpenError(ServiceError):
+    """The service failed repeatedly, so its circuit breaker rejects calls without trying them for a while"""
+    user_message = "Sorry, the service is temporarily unavailable. Please try again in a moment."
+
+
+# Exceptions a failed service call raises. Anything else (TypeError, KeyError, a replay CassetteMiss, ...)
+# is a bug or a broken test setup, not a service failure: it is never classified, retried or
+# turned into a user-facing "try again" message, but propagates unchanged.
+SERVICE_EXCEPTIONS = (
+    ServiceError, groq.APIError, httpx.HTTPError, requests.exceptions.RequestException, TimeoutError, ConnectionError
+)
+
+
+def _retry_after(response) -> float:
+    """Retry-After of an HTTP response in seconds (None if absent)"""
+    if response is None:
+        return None
+    return parse_duration(response.headers.get("retry-after"))
+
+
+def _from_status(message: str, status_code: int, retry_after: float = None) -> ServiceError:
+    if status_code == 429:
+        return RateLimitError(message, retry_after, status_code)
+    if status_code == 408:
+        return ServiceTimeoutError(message, retry_after, status_code)
+    if status_code >= 500:
+        return ServerError(message, retry_after, status_code)
+    return RequestError(message, retry_after, status_code)
+
+
+def classify_error(e: Exception) -> ServiceError:
+    """
+    Map an exception from the Groq, httpx or requests clients to a typed ServiceError
+
+    Args:
+        e: Exception raised by a service call (one of SERVICE_EXCEPTIONS)
+
+    Returns:
+        The matching ServiceError (e itself if it already is one)
+    """
+    if isinstance(e, ServiceError):
+        return e
+    message = str(e) or type(e).__name__
+
+    # Groq SDK (and the cassettes, which raise the same exceptions)
+    if isinstance(e, groq.APITimeoutError):
+        return ServiceTimeoutError(message)
+    if isinstance(e, groq.APIConnectionError):
+        return ServerError(message)
+    if isinstance(e, groq.APIStatusError):
+        return _from_status(message, e.status_code, _retry_after(e.response))
+
+    # httpx and requests transports
+    if isinstance(e, (httpx.TimeoutException, requests.exceptions.Timeout, TimeoutError)):
+        return ServiceTimeoutError(message)
+    if isinstance(e, (httpx.TransportError, requests.exceptions.ConnectionError, ConnectionError)):
+        return ServerError(message)
+    if isinstance(e, httpx.HTTPStatusError):
+        return _from_status(message, e.response.status_code, _retry_after(e.response))
+    if isinstance(e, requests.exceptions.HTTPError) and e.response is not None:
+        return _from_status(message, e.response.status_code, _retry_after(e.response))
+
+    # Other client errors that only keep the provider's message
+    if "429" in message or "rate limit" in message.lower():
+        return RateLimitError(message)
+    return ServiceError(message)
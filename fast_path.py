@@ -0,0 +1,297 @@
+# fast_path.py - Local pre-classifier that answers easy router analyses without an LLM call
+import csv
+import logging
+import os
+import re
+import threading
+from datetime import date
+
+import numpy as np
+
+from config import ROUTER_FAST_PATH_THRESHOLD
+from geocode_store import get_geocode_store, normalize_location
+from response_cache import HashingEmbedder
+from temporal import find_period, resolve_period
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+EXAMPLES_PATH = os.path.join(DATA_DIR, "router_examples.csv")
+COUNTRIES_PATH = os.path.join(DATA_DIR, "countries.csv")
+
+CATEGORIES = ("DESTINATION", "COMPLEX_REASONING", "PACKING", "ATTRACTIONS", "WEATHER", "GENERAL")
+# Categories answered locally. With an explicit place these never need clarification;
+# open-ended recommendations and general questions always go to the LLM.
+FAST_CATEGORIES = {"DESTINATION", "PACKING", "ATTRACTIONS", "WEATHER"}
+FAST_PATH_REASON = "Local classifier"
+
+# Softmax regression on hashed n-grams; a few hundred full-batch steps converge on the bundled examples
+FEATURE_DIM = 2048
+TRAINING_STEPS = 300
+LEARNING_RATE = 4.0
+L2_PENALTY = 1e-4
+
+_MONTHS = ("january", "february", "march", "april", "may", "june", "july", "august",
+           "september", "october", "november", "december")
+_SEASONS = ("spring", "summer", "autumn", "fall", "winter", "christmas", "easter", "new year")
+
+# Words that never start or end a place name, and lowercase words that are places only when capitalized
+_STOPWORDS = {
+    "a", "an", "the", "in", "to", "for", "of", "at", "on", "and", "or", "is", "it", "i", "my", "me", "what", "where",
+    "when", "which", "how", "should", "do", "does", "can", "could", "would", "will", "be", "there", "this", "that",
+    "next", "best", "good", "top", "trip", "visit", "go", "going", "weather", "pack", "bring", "wear"
+} | set(_MONTHS) | set(_SEASONS)
+_COMMON_WORDS = {"nice", "reading", "mobile", "split", "bath", "orange", "victoria"}
+_WORD = re.compile(r"[^\W\d_][\w.'-]*")
+MAX_PLACE_WORDS = 3
+
+
+def _read_countries(path: str) -> dict:
+    """Read the country lexicon into {"code": name} and {normalized name or alias: name}"""
+    names, lookup = {}, {}
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            names[row["code"]] = row["name"]
+            for alias in [row["name"]] + [a for a in (row.get("aliases") or "").split("|") if a]:
+                lookup[normalize_location(alias)] = row["name"]
+    return names, lookup
+
+
+class FastPathClassifier:
+    """
+    Answers the router's analysis locally when the question is easy
+
+    A question takes the fast path when it names exactly one known place
+    (bundled gazetteer, learned geocodes, country lexicon) and a linear model
+    over hashed n-grams is confident it is a destination, packing,
+    attractions or weather question. Time expressions are resolved to date
+    ranges locally (temporal.py), and the range picks the weather mode.
+    Everything else returns None and goes to the LLM router.
+
+    Args:
+        threshold: Minimum predicted class probability for a local answer
+        examples_path: CSV of labeled questions (question,category) to train on
+        countries_path: CSV country lexicon (code,name,aliases)
+        geocode_store: Known places; defaults to the process-wide store
+    """
+    def __init__(self, threshold: float = ROUTER_FAST_PATH_THRESHOLD, examples_path: str = EXAMPLES_PATH,
+                 countries_path: str = COUNTRIES_PATH, geocode_store=None):
+        self.threshold = threshold
+        self.examples_path = examples_path
+        self.countries_path = countries_path
+        self.geocode_store = geocode_store or get_geocode_store()
+        self.embedder = HashingEmbedder(FEATURE_DIM)
+        self._lock = threading.Lock()
+        self._model = None  # (weights, bias), published in one assignment once trained
+        self._country_names = {}
+        self._countries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def classify(self, user_message: str, conversation_state=None):
+        """
+        Analyze a question locally
+
+        Args:
+            user_message: User's input message
+            conversation_state: Slot state of the conversation, used to carry the dates of the same destination
+
+        Returns:
+            Dictionary in the router's analysis format, or None when the LLM should decide
+        """
+        try:
+            analysis = self._classify(user_message, conversation_state)
+        except Exception as e:
+            logger.warning(f"Fast path failed, using the LLM router: {e}")
+            analysis = None
+        with self._lock:
+            if analysis:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return analysis
+
+    def predict(self, user_message: str):
+        """Return (category, probability) from the linear model alone"""
+        self._ensure_trained()
+        places = self._find_places(user_message)
+        when = self._find_when(user_message)
+        return self._predict(self._masked(user_message, places, when))
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
+
+    def _classify(self, user_message: str, conversation_state):
+        self._ensure_trained()
+        places = self._find_places(user_message)
+        location = self._single_location(places)
+        if location is None:
+            return None
+
+        when = self._find_when(user_message)
+        category, probability = self._predict(self._masked(user_message, places, when))
+        if category not in FAST_CATEGORIES or probability < self.threshold:
+            return None
+
+        city, country = location
+        when_text, mode = (when[2], when[3]) if when else ("", "none")
+        # "What should I pack for Tokyo?" after "Tokyo in December" keeps the dates, as the LLM router would
+        if not when and conversation_state is not None and conversation_state.when:
+            if (conversation_state.city or conversation_state.country) == (city or country):
+                when_text = conversation_state.when
+                mode = self._when_mode(when_text) or "climate"
+
+        if category == "ATTRACTIONS" or (mode == "none" and category != "WEATHER"):
+            needs_weather, mode = False, "none"
+        else:
+            needs_weather, mode = True, mode if mode != "none" else "current"
+
+        return {
+            "category": category,
+            "needs_weather": needs_weather,
+            "mode": mode,
+            "city": city,
+            "country": country,
+            "when": when_text,
+            "needs_clarification": False,
+            "confidence": round(probability, 3),
+            "reason": f"{FAST_PATH_REASON} (p={probability:.2f})"
+        }
+
+    def _ensure_trained(self):
+        """Load the lexicons and fit the model on first use"""
+        if self._model is not None:
+            return
+        with self._lock:
+            if self._model is not None:
+                return
+            self._country_names, self._countries = _read_countries(self.countries_path)
+            with open(self.examples_path, newline="", encoding="utf-8") as f:
+                examples = [(row["question"], row["category"]) for row in csv.DictReader(f) if row["category"] in CATEGORIES]
+            self._model = self._train(examples)
+            logger.info(f"Fast path classifier trained on {len(examples)} examples")
+
+    def _train(self, examples: list):
+        """Fit multinomial logistic regression by full-batch gradient descent"""
+        features = np.stack([
+            self._features(self._masked(question, self._find_places(question), self._find_when(question)))
+            for question, _ in examples
+        ])
+        targets = np.zeros((len(examples), len(CATEGORIES)), dtype=np.float32)
+        targets[np.arange(len(examples)), [CATEGORIES.index(category) for _, category in examples]] = 1.0
+
+        weights = np.zeros((FEATURE_DIM, len(CATEGORIES)), dtype=np.float32)
+        bias = np.zeros(len(CATEGORIES), dtype=np.float32)
+        for _ in range(TRAINING_STEPS):
+            gradient = (self._softmax(features @ weights + bias) - targets) / len(examples)
+            weights -= LEARNING_RATE * (features.T @ gradient + L2_PENALTY * weights)
+            bias -= LEARNING_RATE * gradient.sum(axis=0)
+        return weights, bias
+
+    @staticmethod
+    def _softmax(logits: np.ndarray) -> np.ndarray:
+        exp = np.exp(logits - logits.max(axis=-1, keepdims=True))
+        return exp / exp.sum(axis=-1, keepdims=True)
+
+    def _predict(self, masked_text: str):
+        weights, bias = self._model
+        probabilities = self._softmax(self._features(masked_text) @ weights + bias)
+        best = int(np.argmax(probabilities))
+        return CATEGORIES[best], float(probabilities[best])
+
+    def _features(self, masked_text: str) -> np.ndarray:
+        return self.embedder.embed(" ".join(re.findall(r"[a-z0-9]+", masked_text.lower())))
+
+    def _masked(self, text: str, places: list, when) -> str:
+        """Replace places and dates with placeholder words, so the model learns the question, not the city"""
+        spans = [(start, end, " xplace ") for start, end, _, _ in places]
+        if when:
+            spans.append((when[0], when[1], " xmonth " if when[3] == "climate" else " xsoon "))
+        for start, end, replacement in sorted(spans, reverse=True):
+            text = text[:start] + replacement + text[end:]
+        return text
+
+    def _find_places(self, text: str) -> list:
+        """
+        Known places named in the text, longest match first
+
+        Returns:
+            List of (start, end, city, country) tuples; city is "" for a country
+        """
+        words = list(_WORD.finditer(text))
+        places = []
+        i = 0
+        while i < len(words):
+            for n in range(min(MAX_PLACE_WORDS, len(words) - i), 0, -1):
+                place = self._lookup_place(text, words[i:i + n])
+                if place:
+                    places.append((words[i].start(), words[i + n - 1].end()) + place)
+                    i += n
+                    break
+            else:
+                i += 1
+        return places
+
+    def _lookup_place(self, text: str, words: list):
+        """(city, country) for a run of words, or None"""
+        first, last = words[0].group(0), words[-1].group(0)
+        if first.lower() in _STOPWORDS or last.lower().rstrip(".") in _STOPWORDS:
+            return None
+        phrase = text[words[0].start():words[-1].end()].rstrip(".")
+        if len(words) == 1 and phrase.islower() and (len(phrase) <= 3 or phrase in _COMMON_WORDS):
+            return None
+
+        key = normalize_location(phrase)
+        if key in self._countries:
+            return "", self._countries[key]
+        location = self.geocode_store.find(phrase)
+        if location:
+            city = phrase.title() if phrase.islower() else phrase
+            return city, self._country_names.get(location[2], "")
+        return None
+
+    def _single_location(self, places: list):
+        """The one (city, country) the question is about, or None if there is none or several"""
+        cities = {normalize_location(city): (city, country) for _, _, city, country in places if city}
+        countries = {country for _, _, city, country in places if not city}
+        if len(cities) > 1:
+            return None
+        if cities:
+            city, country = next(iter(cities.values()))
+            # "Kyoto, Japan" names one place; "Kyoto or Spain" does not
+            if countries - {country}:
+                return None
+            return city, country
+        if len(countries) == 1:
+            return "", countries.pop()
+        return None
+
+    def _find_when(self, text: str):
+        """The first time expression in the text as (start, end, text, mode), or None"""
+        found = find_period(text)
+        if not found:
+            return None
+        start, end, period = found
+        return start, end, period.text, period.mode(date.today())
+
+    def _when_mode(self, when_text: str):
+        """Weather mode of a stored time reference, or None if it is not recognized"""
+        period = resolve_period(when_text)
+        return period.mode(date.today()) if period else None
+
+
+# One classifier per process; training happens on its first question
+_classifier = None
+_classifier_lock = threading.Lock()
+
+
+def get_fast_classifier() -> FastPathClassifier:
+    """Get the process-wide fast path classifier"""
+    global _classifier
+    with _classifier_lock:
+        if _classifier is None:
+            _classifier = FastPathClassifier()
+        return _classifier
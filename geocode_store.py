@@ -0,0 +1,206 @@
+# geocode_store.py - Persistent city name -> (lat, lon, country) store, seeded from a bundled gazetteer
+import csv
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import unicodedata
+
+import numpy as np
+
+from config import GEOCODE_CACHE_DIR
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "gazetteer.csv")
+
+# Fixed-width records so the index can be memory-mapped and binary-searched
+INDEX_DTYPE = np.dtype([("key", "<u8"), ("lat", "<f8"), ("lon", "<f8"), ("country", "S2")])
+
+
+def normalize_location(name: str) -> str:
+    """Lowercase, strip accents and punctuation, and collapse whitespace ("São Paulo!" -> "sao paulo")"""
+    if not name:
+        return ""
+    text = unicodedata.normalize("NFKD", name)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    return " ".join(text.split())
+
+
+def _hash_key(key: str) -> int:
+    """Stable 64-bit hash of a normalized location key"""
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class GeocodeStore:
+    """
+    Persistent geocode cache backed by a memory-mapped, sorted index
+
+    The index is built from the bundled gazetteer plus every location resolved
+    over the network (appended to a learned file), and is only rebuilt when one
+    of those sources is newer than it. Lookups binary-search the mapped file,
+    so nothing is loaded until the first lookup and restarts keep their hits.
+
+    Args:
+        cache_dir: Directory for the index and learned-locations files
+        gazetteer_path: CSV with name,country,lat,lon,aliases columns
+    """
+    def __init__(self, cache_dir: str = GEOCODE_CACHE_DIR, gazetteer_path: str = GAZETTEER_PATH):
+        self.cache_dir = cache_dir
+        self.gazetteer_path = gazetteer_path
+        self.index_path = os.path.join(cache_dir, "geocode_index.npy")
+        self.learned_path = os.path.join(cache_dir, "geocode_learned.jsonl")
+        self._lock = threading.Lock()
+        self._index = None
+        self._aliases = None
+        self._learned = {}  # Locations resolved since the index was built
+        self.hits = 0
+        self.misses = 0
+
+    def canonical_key(self, name: str) -> str:
+        """Normalized key with aliases resolved ("NYC", "New York City" -> "new york")"""
+        self._ensure_loaded()
+        key = normalize_location(name)
+        return self._aliases.get(key, key)
+
+    def get(self, name: str):
+        """Return (lat, lon, country) for a location name, or None if it has never been resolved"""
+        location = self.find(name)
+        if location:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return location
+
+    def find(self, name: str):
+        """Like get(), without counting the lookup as a cache hit or miss"""
+        key = self.canonical_key(name)
+        if not key:
+            return None
+
+        if key in self._learned:
+            return self._learned[key]
+
+        hashed = _hash_key(key)
+        index = self._index
+        pos = int(np.searchsorted(index["key"], hashed))
+        if pos < len(index) and int(index["key"][pos]) == hashed:
+            record = index[pos]
+            return (float(record["lat"]), float(record["lon"]), record["country"].decode("ascii"))
+        return None
+
+    def put(self, name: str, lat: float, lon: float, country: str):
+        """Remember a location resolved over the network, for this process and future ones"""
+        key = self.canonical_key(name)
+        if not key:
+            return
+        location = (float(lat), float(lon), (country or "")[:2])
+        with self._lock:
+            self._learned[key] = location
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with open(self.learned_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"key": key, "lat": location[0], "lon": location[1], "country": location[2]}) + "\n")
+            except OSError as e:
+                logger.warning(f"Could not persist geocode for {name}: {e}")
+
+    def _ensure_loaded(self):
+        """Load aliases and map the index on first use, rebuilding it if stale"""
+        if self._index is not None:
+            return
+        with self._lock:
+            if self._index is not None:
+                return
+            gazetteer, aliases = self._read_gazetteer()
+            self._aliases = aliases
+            if self._index_is_stale():
+                self._build_index(gazetteer)
+            try:
+                self._index = np.load(self.index_path, mmap_mode="r")
+            except (OSError, ValueError) as e:
+                # Read-only or broken cache directory: keep the index in memory
+                logger.warning(f"Geocode index unavailable ({e}), using in-memory gazetteer")
+                self._index = self._records(gazetteer)
+
+    def _read_gazetteer(self):
+        """Read the bundled gazetteer into {key: location} and {alias: key}"""
+        gazetteer, aliases = {}, {}
+        try:
+            with open(self.gazetteer_path, newline="", encoding="utf-8") as f:
+                for row in csv.DictReader(f):
+                    key = normalize_location(row["name"])
+                    gazetteer[key] = (float(row["lat"]), float(row["lon"]), row["country"])
+                    for alias in (row.get("aliases") or "").split("|"):
+                        alias_key = normalize_location(alias)
+                        if alias_key and alias_key != key:
+                            aliases[alias_key] = key
+        except OSError as e:
+            logger.warning(f"Gazetteer not found: {e}")
+        return gazetteer, aliases
+
+    def _read_learned(self) -> dict:
+        """Read locations previously resolved over the network"""
+        learned = {}
+        if not os.path.exists(self.learned_path):
+            return learned
+        with open(self.learned_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    learned[entry["key"]] = (entry["lat"], entry["lon"], entry["country"])
+                except (ValueError, KeyError):
+                    continue
+        return learned
+
+    def _index_is_stale(self) -> bool:
+        """The index must be rebuilt if it is missing or older than its sources"""
+        if not os.path.exists(self.index_path):
+            return True
+        index_time = os.path.getmtime(self.index_path)
+        for source in (self.gazetteer_path, self.learned_path):
+            if os.path.exists(source) and os.path.getmtime(source) > index_time:
+                return True
+        return False
+
+    def _records(self, locations: dict) -> np.ndarray:
+        """Sorted fixed-width records for a {key: (lat, lon, country)} mapping"""
+        records = np.zeros(len(locations), dtype=INDEX_DTYPE)
+        for i, (key, (lat, lon, country)) in enumerate(locations.items()):
+            records[i] = (_hash_key(key), lat, lon, country.encode("ascii", "ignore")[:2])
+        records.sort(order="key")
+        return records
+
+    def _build_index(self, gazetteer: dict):
+        """Merge gazetteer and learned locations into a new index file"""
+        locations = dict(gazetteer)
+        try:
+            locations.update(self._read_learned())
+        except OSError as e:
+            logger.warning(f"Could not read learned geocodes: {e}")
+        records = self._records(locations)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = self.index_path + ".tmp.npy"
+            np.save(tmp_path, records)
+            os.replace(tmp_path, self.index_path)
+            logger.info(f"Built geocode index with {len(records)} locations")
+        except OSError as e:
+            logger.warning(f"Could not write geocode index: {e}")
+
+
+# One store per process, shared by every WeatherService
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_geocode_store() -> GeocodeStore:
+    """Get the process-wide geocode store"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = GeocodeStore()
+        return _store
@@ -0,0 +1,143 @@
+# hedging.py - Hedged requests: send a duplicate when a call runs past the usual latency
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from metrics import get_metrics
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Hedged calls and their duplicates run here, so the caller can wait on whichever answers first
+_hedge_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="hedge")
+
+
+class Hedger:
+    """
+    Runs idempotent calls with a hedge against slow responses
+
+    A call that has not answered after the observed `percentile` latency of
+    recent calls gets one duplicate; the first successful answer is used and
+    the other one is ignored when it arrives. Only a slow tail pays for the
+    second request: with the 95th percentile, about 5% of calls are hedged.
+    Failed and timed-out attempts count at the time they took (at most the
+    request timeout), so a degrading backend raises the percentile instead
+    of being hedged ever more aggressively.
+
+    Args:
+        name: Label for logs and metrics ("weather", ...)
+        percentile: Latency percentile after which a duplicate is sent
+        min_samples: Observed calls needed before the percentile is trusted
+        default_delay: Seconds to wait before hedging until then
+        min_delay: Shortest wait before hedging, so fast backends are not doubled
+        window: Number of recent latencies the percentile is taken over
+        enabled: Whether to hedge at all (calls still go through the executor)
+        timeout: Request timeout in seconds, the longest latency an attempt is recorded with
+    """
+    def __init__(self, name: str, percentile: float = 95, min_samples: int = 20, default_delay: float = 1.0,
+                 min_delay: float = 0.05, window: int = 200, enabled: bool = True, timeout: float = None):
+        self.name = name
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.enabled = enabled
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def observe(self, seconds: float):
+        """Record the latency of an attempt"""
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait for an answer before sending the duplicate"""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return self.default_delay
+            ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))
+        return max(self.min_delay, ordered[index])
+
+    def _submit(self, func, timeout: float = None):
+        """Run func in the pool, timing it whether or not it succeeds; each run gets its own copy of the context (trace spans)"""
+        def timed():
+            start = time.perf_counter()
+            try:
+                return func()
+            finally:
+                elapsed = time.perf_counter() - start
+                self.observe(min(elapsed, timeout) if timeout else elapsed)
+        return _hedge_executor.submit(contextvars.copy_context().run, timed)
+
+    def call(self, func, timeout: float = None):
+        """
+        Call func(), and once more in parallel if it is slower than usual
+
+        Args:
+            func: An idempotent call (e.g. an HTTP GET)
+            timeout: This call's request timeout, if shorter than the usual one
+
+        Returns:
+            The result of the first attempt to succeed
+
+        Raises:
+            Exception: What the last attempt raised, if none succeeded
+        """
+        if not self.enabled:
+            return func()
+        with self._lock:
+            self.calls += 1
+
+        timeout = timeout or self.timeout
+        primary = self._submit(func, timeout)
+        done, _ = wait([primary], timeout=self.hedge_delay())
+        if done:
+            return primary.result()
+
+        hedge = self._submit(func, timeout)
+        with self._lock:
+            self.hedged += 1
+        logger.info(f"{self.name} call slower than its p{self.percentile:g}, sent a hedged duplicate")
+
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                winner = "hedge" if future is hedge else "primary"
+                self._record_hedge(winner)
+                return result
+        self._record_hedge("none")
+        raise error
+
+    def _record_hedge(self, winner: str):
+        if winner == "hedge":
+            with self._lock:
+                self.hedge_wins += 1
+        get_metrics().counter("travel_hedged_requests_total", "Duplicate requests sent for slow calls, by which copy answered first").inc(
+            service=self.name, winner=winner)
+
+    def stats(self) -> dict:
+        """Calls, hedged calls, hedges that answered first and the current hedge delay"""
+        with self._lock:
+            calls, hedged, hedge_wins = self.calls, self.hedged, self.hedge_wins
+        return {
+            "calls": calls,
+            "hedged": hedged,
+            "hedge_wins": hedge_wins,
+            "hedge_rate": round(hedged / calls, 3) if calls else 0.0,
+            "hedge_delay": round(self.hedge_delay(), 4)
+        }
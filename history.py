@@ -0,0 +1,142 @@
+# history.py - Token-budgeted conversation window with a rolling summary built in the background
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from config import HISTORY_TOKEN_BUDGET, HISTORY_KEEP_TOKENS, HISTORY_SUMMARY_MAX_TOKENS
+from errors import ServiceError
+from prompts import HISTORY_SUMMARY_PROMPT
+from tokens import estimate_message_tokens
+from tracing import span
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Summaries are written off the request path; one small pool serves every session
+_summary_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="history-summary")
+
+# History may grow past the budget while summaries fail; beyond this the oldest turns are dropped
+HARD_LIMIT_FACTOR = 4
+
+
+class HistoryManager:
+    """
+    Keeps the conversation sent to the LLM within a token budget
+
+    Tokens are counted locally. Once a session's history exceeds
+    `token_budget`, its oldest messages are folded into a rolling summary by a
+    background LLM call, keeping the newest `keep_tokens` verbatim. Requests
+    get the summary plus as many recent messages as fit in the budget, so the
+    prompt size stays flat however long the conversation gets.
+
+    Args:
+        llm_service: LLMService used to write the summaries
+        token_budget: Most history tokens (summary included) sent with a request
+        keep_tokens: Recent tokens kept verbatim when older messages are summarized
+        summary_max_tokens: Completion limit for the summary
+    """
+    def __init__(self, llm_service, token_budget: int = HISTORY_TOKEN_BUDGET, keep_tokens: int = HISTORY_KEEP_TOKENS,
+                 summary_max_tokens: int = HISTORY_SUMMARY_MAX_TOKENS):
+        self.llm_service = llm_service
+        self.token_budget = token_budget
+        self.keep_tokens = min(keep_tokens, token_budget)
+        self.summary_max_tokens = summary_max_tokens
+        self.summaries = 0
+        self.summary_failures = 0
+
+    def append(self, session, role: str, content: str):
+        """Add a message to a session, starting a background summary if the history is over budget"""
+        with session.lock:
+            session.history.append({"role": role, "content": content})
+        self._schedule(session)
+
+    def window(self, session) -> list:
+        """
+        Messages to send with the next request: the summary, then the newest messages that fit
+
+        Returns:
+            List of {"role", "content"} messages within the token budget
+        """
+        with session.lock:
+            history = list(session.history)
+            summary = session.summary
+
+        prefix = []
+        budget = self.token_budget
+        if summary:
+            prefix = [{"role": "system", "content": f"Summary of the earlier conversation: {summary}"}]
+            budget -= estimate_message_tokens(prefix)
+
+        recent, used = [], 0
+        for message in reversed(history):
+            cost = estimate_message_tokens([message])
+            if used + cost > budget:
+                break
+            recent.append(message)
+            used += cost
+        recent.reverse()
+        return prefix + recent
+
+    def _fold_count(self, history: list) -> int:
+        """How many of the oldest messages to fold into the summary (0 while within budget)"""
+        costs = [estimate_message_tokens([message]) for message in history]
+        if sum(costs) <= self.token_budget:
+            return 0
+        kept_tokens, kept = 0, 0
+        for cost in reversed(costs):
+            # Always keep the latest exchange verbatim, however long it is
+            if kept >= 2 and kept_tokens + cost > self.keep_tokens:
+                break
+            kept_tokens += cost
+            kept += 1
+        return len(costs) - kept
+
+    def _schedule(self, session):
+        """Start a summary of the oldest messages if needed and none is running for the session"""
+        with session.lock:
+            if session.summary_pending:
+                return
+            count = self._fold_count(session.history)
+            if not count:
+                return
+            session.summary_pending = True
+            folded = session.history[:count]
+            previous_summary = session.summary
+        _summary_executor.submit(self._summarize, session, folded, previous_summary)
+
+    def _summarize(self, session, folded: list, previous_summary: str):
+        """Fold messages into the session's summary (runs on the summary pool)"""
+        transcript = "\n".join(f"{message['role']}: {message['content']}" for message in folded)
+        user = f"Current summary:\n{previous_summary or '(none)'}\n\nNew messages:\n{transcript}"
+        error = None
+        try:
+            with span("history.summarize", messages=len(folded)):
+                summary = self.llm_service.run(HISTORY_SUMMARY_PROMPT, user, max_tokens=self.summary_max_tokens)
+        except ServiceError as e:
+            summary, error = "", e
+        except Exception as e:
+            # A bug or a replay miss: log it (nobody reads the pool's future) and still release the session
+            logger.exception(f"Conversation summary crashed for session {session.session_id}")
+            summary, error = "", e
+        failed = not summary
+
+        with session.lock:
+            session.summary_pending = False
+            # The conversation may have been cleared or replaced while the summary was written
+            unchanged = len(session.history) >= len(folded) and all(a is b for a, b in zip(session.history, folded))
+            if not unchanged:
+                return
+            if not failed:
+                session.summary = summary.strip()
+                del session.history[:len(folded)]
+                self.summaries += 1
+            else:
+                self.summary_failures += 1
+                logger.warning(f"Conversation summary failed for session {session.session_id}: {error or 'empty summary'}")
+                # Without a summary the old turns are already outside the window; only bound the memory
+                if estimate_message_tokens(session.history) > HARD_LIMIT_FACTOR * self.token_budget:
+                    del session.history[:len(folded)]
+                return
+
+        logger.info(f"Folded {len(folded)} messages into the summary of session {session.session_id}")
+        # More messages may have arrived while this summary was written
+        self._schedule(session)
@@ -0,0 +1,74 @@
+# http_client.py - Shared keep-alive HTTP connection pool for external API calls
+import logging
+import threading
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import BACKEND_MODE, HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE, HTTP_POOL_BLOCK, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+class PooledHTTPClient:
+    """
+    Thread-safe HTTP client that reuses TCP+TLS connections across calls
+
+    Args:
+        pool_connections: Number of hosts to keep connection pools for
+        pool_maxsize: Maximum open connections per host
+        pool_block: Wait for a free connection instead of opening extra ones past pool_maxsize
+        connect_timeout: Seconds to establish a connection
+        read_timeout: Seconds to wait for the response
+    """
+    def __init__(self, pool_connections: int = HTTP_POOL_CONNECTIONS, pool_maxsize: int = HTTP_POOL_MAXSIZE,
+                 pool_block: bool = HTTP_POOL_BLOCK, connect_timeout: float = HTTP_CONNECT_TIMEOUT,
+                 read_timeout: float = HTTP_READ_TIMEOUT):
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = requests.Session()
+        # The session is shared by every thread; refusing cookies keeps it free of per-request state
+        self.session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=pool_block)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def get(self, url: str, params: dict = None, timeout=None, **kwargs) -> requests.Response:
+        """
+        Send a GET request over a pooled keep-alive connection
+
+        Args:
+            url: Request URL
+            params: Query parameters
+            timeout: Override (connect, read) timeout in seconds
+
+        Returns:
+            The requests Response
+        """
+        return self.session.get(url, params=params, timeout=timeout or self.timeout, **kwargs)
+
+    def close(self):
+        """Close all pooled connections"""
+        self.session.close()
+
+
+# One pool per process, shared by every WeatherService
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_http_client():
+    """Get the process-wide pooled HTTP client (a cassette stand-in when BACKEND_MODE is record/replay)"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            if BACKEND_MODE == "replay":
+                from cassettes import ReplayHTTPClient, get_cassette
+                _client = ReplayHTTPClient(get_cassette("openweathermap"))
+            elif BACKEND_MODE == "record":
+                from cassettes import RecordingHTTPClient, get_cassette
+                _client = RecordingHTTPClient(PooledHTTPClient(), get_cassette("openweathermap"))
+            else:
+                _client = PooledHTTPClient()
+        return _client
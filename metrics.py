@@ -0,0 +1,239 @@
+# metrics.py - Process-wide counters, gauges and histograms with a Prometheus text exposition endpoint
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Seconds; covers in-process stages (sub-millisecond) up to slow LLM generations
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Cache stats that only ever grow are exposed as counters, everything else as gauges
+_COUNTER_STATS = {"hits", "stale_hits", "misses", "evictions"}
+
+
+def _format_labels(labels: tuple) -> str:
+    """Render ((name, value), ...) as {name="value",...}"""
+    if not labels:
+        return ""
+    parts = []
+    for name, value in labels:
+        escaped = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{name}="{escaped}"')
+    return "{" + ",".join(parts) + "}"
+
+
+class Counter:
+    """
+    Monotonically increasing value per label set
+
+    Args:
+        name: Metric name
+        help: One-line description
+    """
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._lock = threading.Lock()
+        self._values = {}  # sorted label tuple -> value
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(labels)} {value}")
+        return lines
+
+
+class Gauge:
+    """
+    Value per label set that can go up and down
+
+    Args:
+        name: Metric name
+        help: One-line description
+    """
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._lock = threading.Lock()
+        self._values = {}  # sorted label tuple -> value
+
+    def set(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(labels)} {value}")
+        return lines
+
+
+class Histogram:
+    """
+    Distribution of observed values per label set, in cumulative buckets
+
+    Args:
+        name: Metric name
+        help: One-line description
+        buckets: Upper bounds of the buckets (+Inf is added)
+    """
+    def __init__(self, name: str, help: str, buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._series = {}  # sorted label tuple -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f"{self.name}_bucket{_format_labels(labels + (('le', repr(bound)),))} {count}")
+                lines.append(f"{self.name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {series[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(labels)} {series[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(labels)} {series[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    All metrics of the process, plus collectors that report cache stats at scrape time
+
+    Collectors are functions returning a stats dict (like TTLCache.stats()); each
+    numeric entry is exposed as travel_cache_<stat>{cache="<name>"}.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._collectors = {}
+
+    def counter(self, name: str, help: str) -> Counter:
+        """Get or create a counter"""
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Counter(name, help)
+            return self._metrics[name]
+
+    def gauge(self, name: str, help: str) -> Gauge:
+        """Get or create a gauge"""
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Gauge(name, help)
+            return self._metrics[name]
+
+    def histogram(self, name: str, help: str, buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        """Get or create a histogram"""
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Histogram(name, help, buckets)
+            return self._metrics[name]
+
+    def register_cache(self, cache_name: str, stats):
+        """Report a cache's stats() on every scrape (replaces an earlier cache of the same name)"""
+        with self._lock:
+            self._collectors[cache_name] = stats
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors.items())
+
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+
+        series = {}  # stat -> [(cache name, value)]
+        for cache_name, stats in collectors:
+            try:
+                values = stats()
+            except Exception as e:
+                logger.warning(f"Could not collect stats for cache {cache_name}: {e}")
+                continue
+            for stat, value in values.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool) and stat != "hit_rate":
+                    series.setdefault(stat, []).append((cache_name, value))
+        for stat, values in sorted(series.items()):
+            is_counter = stat in _COUNTER_STATS
+            name = f"travel_cache_{stat}_total" if is_counter else f"travel_cache_{stat}"
+            lines.append(f"# HELP {name} Cache {stat.replace('_', ' ')} per cache")
+            lines.append(f"# TYPE {name} {'counter' if is_counter else 'gauge'}")
+            for cache_name, value in sorted(values):
+                lines.append(f'{name}{{cache="{cache_name}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+# One registry per process
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_metrics() -> MetricsRegistry:
+    """Get the process-wide metrics registry"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = MetricsRegistry()
+        return _registry
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    """Serves /metrics (Prometheus text) and /traces (recent traces as JSON)"""
+    def do_GET(self):
+        if self.path.split("?")[0] == "/metrics":
+            body = get_metrics().render().encode("utf-8")
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        elif self.path.split("?")[0] == "/traces":
+            from tracing import recent_traces
+            body = json.dumps(recent_traces(), ensure_ascii=False).encode("utf-8")
+            content_type = "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serve /metrics and /traces from a background thread (once per process)"""
+    global _server
+    with _registry_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            _server.daemon_threads = True
+            threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+            logger.info(f"Metrics on http://{host}:{port}/metrics, recent traces on /traces")
+        return _server
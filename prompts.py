@@ -142,7 +142,7 @@ Examples:
 - "Best places for a family with kids on a budget?" -> COMPLEX_REASONING, needs_weather: false, mode: none, city: null, country: null, when: null, needs_clarification: false
 - "So what should I pack for that kind of trip?" (with context about Spain in June) -> PACKING, needs_weather: true, mode: climate, city: null, country: Spain, when: June, needs_clarification: false
 
-Conversation Context: {context}
+Conversation State (earlier turns): {context}
 
 Question: "{user_message}"
 
@@ -180,3 +180,8 @@ You can help with:
 - Travel tips and advice
 
 Always be friendly, helpful, and keep responses under 3-4 sentences when possible."""
+
+# Rolling conversation summary (older turns folded in by history.py)
+HISTORY_SUMMARY_PROMPT = """You maintain a running summary of a conversation between a traveler and a travel assistant.
+Update the summary with the new messages. Keep every fact later answers may depend on: destinations, dates or months, trip length, travelers, budget, preferences, and recommendations already given.
+Drop greetings, formatting and repetition. Write plain sentences, at most 120 words. Return only the updated summary."""
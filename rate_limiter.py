@@ -0,0 +1,196 @@
+# rate_limiter.py - Process-wide token-bucket rate limiter for Groq requests and tokens
+import asyncio
+import logging
+import re
+import threading
+import time
+
+from config import GROQ_REQUESTS_PER_MINUTE, GROQ_TOKENS_PER_MINUTE
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Groq reset headers look like "2m59.56s", "7.66s" or "120ms"
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+
+# Wait used after a 429 that came without a Retry-After header
+DEFAULT_RATE_LIMIT_BACKOFF = 2.0
+
+
+def parse_duration(value) -> float:
+    """Parse a Groq reset/Retry-After header value into seconds (None if unparseable)"""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+class RateLimiter:
+    """
+    Token bucket over requests-per-minute and tokens-per-minute
+
+    Callers reserve budget before each LLM call and only wait when the bucket
+    is empty. The buckets are corrected from the provider's rate-limit headers,
+    and a 429 pauses everyone until the server's Retry-After has passed.
+
+    Args:
+        requests_per_minute: Request budget refilled every minute
+        tokens_per_minute: Token budget (prompt + completion) refilled every minute
+    """
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._lock = threading.Lock()
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self.total_wait = 0.0
+        self.rate_limited_count = 0
+
+    def _refill(self, now: float):
+        """Add the budget earned since the last update (lock must be held)"""
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60.0)
+        self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60.0)
+
+    def _reserve(self, tokens: int) -> float:
+        """Take budget for one request if available, otherwise return how long to wait"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+
+            if now < self._blocked_until:
+                return self._blocked_until - now
+
+            # A single call larger than the whole bucket must still be able to run
+            tokens = min(tokens, self.tokens_per_minute)
+            if self._requests >= 1 and self._tokens >= tokens:
+                self._requests -= 1
+                self._tokens -= tokens
+                return 0.0
+
+            request_wait = max(0.0, (1 - self._requests) * 60.0 / self.requests_per_minute)
+            token_wait = max(0.0, (tokens - self._tokens) * 60.0 / self.tokens_per_minute)
+            return max(request_wait, token_wait)
+
+    def acquire(self, tokens: int = 0, timeout: float = None) -> bool:
+        """
+        Block until one request using `tokens` tokens fits in the budget
+
+        Args:
+            tokens: Prompt plus completion tokens the request may use
+            timeout: Longest wait in seconds (None to wait as long as it takes)
+
+        Returns:
+            False if the budget would not be available within `timeout` (nothing is taken)
+        """
+        waited = 0.0
+        while True:
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                return True
+            if timeout is not None and waited + wait > timeout:
+                logger.info(f"Rate limiter: budget for {tokens} tokens not available within {timeout:.2f}s")
+                return False
+            logger.info(f"Rate limiter: waiting {wait:.2f}s for budget ({tokens} tokens)")
+            self._record_wait(wait)
+            waited += wait
+            time.sleep(wait)
+
+    async def aacquire(self, tokens: int = 0, timeout: float = None) -> bool:
+        """Async version of acquire() - waits without blocking the event loop"""
+        waited = 0.0
+        while True:
+            wait = self._reserve(tokens)
+            if wait <= 0:
+                return True
+            if timeout is not None and waited + wait > timeout:
+                logger.info(f"Rate limiter: budget for {tokens} tokens not available within {timeout:.2f}s")
+                return False
+            logger.info(f"Rate limiter: waiting {wait:.2f}s for budget ({tokens} tokens)")
+            self._record_wait(wait)
+            waited += wait
+            await asyncio.sleep(wait)
+
+    def _record_wait(self, wait: float):
+        """Add to the total time callers spent waiting for budget"""
+        with self._lock:
+            self.total_wait += wait
+
+    def blocked_for(self) -> float:
+        """Seconds until requests are allowed again after a 429 or an exhausted budget (0 if not paused)"""
+        with self._lock:
+            return max(0.0, self._blocked_until - time.monotonic())
+
+    def refund(self, tokens: int):
+        """Return tokens that were reserved but not used (a short completion, or a call that failed)"""
+        if tokens <= 0:
+            return
+        with self._lock:
+            self._tokens = min(self.tokens_per_minute, self._tokens + tokens)
+
+    def on_rate_limited(self, retry_after: float = None):
+        """Pause all callers after a 429, for Retry-After seconds if the server sent one"""
+        wait = retry_after if retry_after is not None else DEFAULT_RATE_LIMIT_BACKOFF
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._blocked_until = max(self._blocked_until, now + wait)
+            self._requests = 0.0
+            self.rate_limited_count += 1
+        logger.warning(f"Rate limited by provider, pausing requests for {wait:.2f}s")
+
+    def update_from_headers(self, headers):
+        """
+        Correct the buckets from Groq's x-ratelimit-* response headers
+
+        Groq reports remaining tokens per minute and remaining requests per day;
+        the local buckets never hold more than the server says is left.
+        """
+        if not headers:
+            return
+        remaining_tokens = headers.get("x-ratelimit-remaining-tokens")
+        remaining_requests = headers.get("x-ratelimit-remaining-requests")
+        retry_after = parse_duration(headers.get("retry-after"))
+
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if remaining_tokens is not None:
+                try:
+                    self._tokens = min(self._tokens, float(remaining_tokens))
+                except ValueError:
+                    pass
+                if self._tokens <= 0:
+                    reset = parse_duration(headers.get("x-ratelimit-reset-tokens"))
+                    if reset:
+                        self._blocked_until = max(self._blocked_until, now + reset)
+            if remaining_requests is not None and str(remaining_requests).strip() == "0":
+                reset = parse_duration(headers.get("x-ratelimit-reset-requests"))
+                if reset:
+                    self._blocked_until = max(self._blocked_until, now + reset)
+            if retry_after is not None:
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+
+
+# One limiter per model, shared by every LLMService in the process
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(model_name: str) -> RateLimiter:
+    """Get the process-wide rate limiter for a model"""
+    with _limiters_lock:
+        if model_name not in _limiters:
+            _limiters[model_name] = RateLimiter(GROQ_REQUESTS_PER_MINUTE, GROQ_TOKENS_PER_MINUTE)
+        return _limiters[model_name]
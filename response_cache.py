@@ -0,0 +1,272 @@
+# response_cache.py - Semantic cache for generated answers (NumPy cosine-similarity index)
+import hashlib
+import importlib
+import logging
+import re
+import threading
+import time
+
+import numpy as np
+
+from config import (
+    RESPONSE_CACHE_EMBEDDER, RESPONSE_CACHE_THRESHOLD, RESPONSE_CACHE_TTL,
+    RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_WEATHER_BUCKET_SECONDS
+)
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Words that change the phrasing but not the answer
+_FILLER_WORDS = {
+    "a", "an", "the", "what", "whats", "which", "are", "is", "some", "me", "tell", "please",
+    "can", "could", "you", "i", "my", "does", "should", "would", "there", "any", "to",
+    "in", "for", "of", "on"
+}
+# Category words map only from words of the same category: generic ones ("things", "places", "take")
+# also appear in packing and destination questions and would pull them next to cached attraction answers
+_SYNONYMS = {
+    "top": "best", "greatest": "best", "must": "best", "popular": "best", "famous": "best",
+    "sights": "attractions", "sightseeing": "attractions", "landmarks": "attractions",
+    "bring": "pack", "packing": "pack", "clothes": "clothing", "wear": "clothing"
+}
+
+
+def normalize_question(text: str) -> str:
+    """Lowercase, drop punctuation and filler words, and map common synonyms"""
+    words = re.findall(r"[a-z0-9]+", text.lower())
+    return " ".join(_SYNONYMS.get(w, w) for w in words if w not in _FILLER_WORDS)
+
+
+def question_terms(text: str) -> tuple:
+    """
+    What a cached answer's question must share with a new question to be served for it
+
+    The embedding scores "attractions in Paris for kids" close to "attractions in
+    Paris" and ignores the order of "Paris or Rome", so a hit also needs the same
+    content words (qualifiers such as "kids" or "free") and the same places in order.
+
+    Returns:
+        Tuple of (content words without a plural "s", capitalized words after the first in order)
+    """
+    words = normalize_question(text).split()
+    content = frozenset(w[:-1] if len(w) > 3 and w.endswith("s") and not w.endswith("ss") else w for w in words)
+    places = tuple(w.lower() for w in re.findall(r"[A-Za-z]+", text)[1:] if w[0].isupper() and w != "I")
+    return content, places
+
+
+class HashingEmbedder:
+    """
+    Local embedder using the hashing trick - no model download needed
+
+    Word unigrams, word bigrams and character trigrams are hashed into a
+    fixed-size vector, which is L2-normalized so a dot product is the cosine.
+
+    Args:
+        dim: Vector size
+    """
+    def __init__(self, dim: int = 1024):
+        self.dim = dim
+
+    def _bucket(self, feature: str) -> int:
+        return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=4).digest(), "little") % self.dim
+
+    def embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        words = text.split()
+        for word in words:
+            vector[self._bucket("w:" + word)] += 2.0
+            padded = f" {word} "
+            for i in range(len(padded) - 2):
+                vector[self._bucket("c:" + padded[i:i + 3])] += 0.5
+        for first, second in zip(words, words[1:]):
+            vector[self._bucket(f"b:{first} {second}")] += 1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+def load_embedder(spec: str = RESPONSE_CACHE_EMBEDDER):
+    """
+    Create the configured embedder
+
+    Args:
+        spec: "hashing" for the built-in HashingEmbedder, or "module:factory" for any
+              object with an embed(text) -> 1-D numpy array method
+    """
+    if not spec or spec == "hashing":
+        return HashingEmbedder()
+    module_name, _, factory_name = spec.partition(":")
+    factory = getattr(importlib.import_module(module_name), factory_name)
+    return factory()
+
+
+class SemanticResponseCache:
+    """
+    Cache of final answers, looked up by meaning rather than exact text
+
+    Each entry belongs to a partition (category, location, time reference and
+    a bucket of the weather facts the answer was based on). A lookup only
+    matches entries of the same partition whose question embedding has a
+    cosine similarity of at least `threshold` and whose question has the same
+    content words and places (see question_terms()).
+
+    Args:
+        embedder: Object with embed(text) -> 1-D numpy array
+        threshold: Minimum cosine similarity for a hit
+        ttl: Seconds an answer stays valid
+        max_entries: Least recently used answers are evicted past this size
+    """
+    def __init__(self, embedder=None, threshold: float = RESPONSE_CACHE_THRESHOLD,
+                 ttl: float = RESPONSE_CACHE_TTL, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.embedder = embedder or load_embedder()
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._vectors = None  # (capacity, dim) float32, rows [0, size) are live
+        self._partitions = np.zeros(0, dtype=np.int64)
+        self._created = np.zeros(0, dtype=np.float64)
+        self._last_used = np.zeros(0, dtype=np.float64)
+        self._entries = []  # (partition, normalized question, response, question terms) per row
+        self._partition_ids = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def partition_key(category: str, location: str = "", when: str = "", weather_context: str = "", variant: str = "") -> str:
+        """
+        Build the partition an answer belongs to
+
+        Weather facts are bucketed by time, so an answer based on this morning's
+        forecast is not reused after the next forecast update.
+        """
+        weather_bucket = "none"
+        if weather_context:
+            window = int(time.time() // RESPONSE_CACHE_WEATHER_BUCKET_SECONDS)
+            digest = hashlib.blake2b(weather_context.encode("utf-8"), digest_size=6).hexdigest()
+            weather_bucket = f"{window}:{digest}"
+        parts = [category, (location or "").lower().strip(), (when or "").lower().strip(), weather_bucket, variant]
+        return "|".join(parts)
+
+    def _partition_id(self, partition: str) -> int:
+        if partition not in self._partition_ids:
+            self._partition_ids[partition] = len(self._partition_ids)
+        return self._partition_ids[partition]
+
+    def get(self, partition: str, question: str):
+        """Return a cached answer for a similar question in the same partition, or None"""
+        query = self.embedder.embed(normalize_question(question))
+        terms = question_terms(question)
+        with self._lock:
+            size = len(self._entries)
+            partition_id = self._partition_ids.get(partition)
+            if not size or partition_id is None:
+                self.misses += 1
+                return None
+
+            now = time.time()
+            scores = self._vectors[:size] @ query
+            valid = (self._partitions[:size] == partition_id) & (now - self._created[:size] < self.ttl)
+            scores = np.where(valid, scores, -1.0)
+            # The most similar entry that also asks about the same things
+            candidates = np.nonzero(scores >= self.threshold)[0]
+            best = next((int(row) for row in candidates[np.argsort(-scores[candidates])] if self._entries[row][3] == terms), None)
+            if best is None:
+                self.misses += 1
+                return None
+
+            self._last_used[best] = now
+            self.hits += 1
+            logger.info(f"Response cache hit (similarity {scores[best]:.2f}): '{self._entries[best][1]}'")
+            return self._entries[best][2]
+
+    def put(self, partition: str, question: str, response: str):
+        """Store an answer, evicting expired and least recently used entries as needed"""
+        normalized = normalize_question(question)
+        vector = self.embedder.embed(normalized).astype(np.float32)
+        with self._lock:
+            now = time.time()
+            self._drop_expired(now)
+            while len(self._entries) >= self.max_entries:
+                self._remove(int(np.argmin(self._last_used[:len(self._entries)])))
+                self.evictions += 1
+
+            if len(self._partition_ids) > 4 * self.max_entries:
+                self._compact_partitions()
+
+            row = len(self._entries)
+            self._ensure_capacity(row + 1, vector.shape[0])
+            self._vectors[row] = vector
+            self._partitions[row] = self._partition_id(partition)
+            self._created[row] = now
+            self._last_used[row] = now
+            self._entries.append((partition, normalized, response, question_terms(question)))
+
+    def _ensure_capacity(self, size: int, dim: int):
+        """Grow the index arrays (doubling) so they hold at least `size` rows"""
+        capacity = 0 if self._vectors is None else self._vectors.shape[0]
+        if size <= capacity:
+            return
+        new_capacity = max(16, capacity * 2, size)
+        vectors = np.zeros((new_capacity, dim), dtype=np.float32)
+        if capacity:
+            vectors[:capacity] = self._vectors
+        self._vectors = vectors
+        self._partitions = np.resize(self._partitions, new_capacity)
+        self._created = np.resize(self._created, new_capacity)
+        self._last_used = np.resize(self._last_used, new_capacity)
+
+    def _remove(self, row: int):
+        """Remove a row by moving the last row into its place (lock must be held)"""
+        last = len(self._entries) - 1
+        if row != last:
+            self._vectors[row] = self._vectors[last]
+            self._partitions[row] = self._partitions[last]
+            self._created[row] = self._created[last]
+            self._last_used[row] = self._last_used[last]
+            self._entries[row] = self._entries[last]
+        self._entries.pop()
+
+    def _compact_partitions(self):
+        """Forget partitions with no live entries, renumbering the rest (lock must be held)"""
+        self._partition_ids = {}
+        for row, (partition, *_) in enumerate(self._entries):
+            self._partitions[row] = self._partition_id(partition)
+
+    def _drop_expired(self, now: float):
+        """Remove entries older than the TTL (lock must be held)"""
+        size = len(self._entries)
+        expired = np.nonzero(now - self._created[:size] >= self.ttl)[0]
+        for row in sorted(expired.tolist(), reverse=True):
+            self._remove(row)
+
+    def clear(self):
+        """Remove all entries"""
+        with self._lock:
+            self._entries = []
+            self._partition_ids = {}
+
+    def stats(self) -> dict:
+        """Hit/miss counters for reporting"""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+
+# One cache per process, shared by every assistant
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> SemanticResponseCache:
+    """Get the process-wide response cache"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SemanticResponseCache()
+        return _cache
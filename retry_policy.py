@@ -0,0 +1,107 @@
+# retry_policy.py - Retries with jittered exponential backoff that honor the server's Retry-After
+import asyncio
+import logging
+import random
+import time
+
+from config import RETRY_ATTEMPTS, RETRY_BASE_DELAY, RETRY_MAX_DELAY, RETRY_MAX_RETRY_AFTER
+from deadline import remaining
+from errors import SERVICE_EXCEPTIONS, classify_error
+from metrics import get_metrics
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+
+class RetryPolicy:
+    """
+    When and how long to wait before trying a failed call again
+
+    Only retryable errors (rate limits, timeouts, server errors) are retried.
+    The wait is the server's Retry-After when it sent one, otherwise a random
+    ("full jitter") delay up to an exponentially growing cap, so a transient
+    502 costs a fraction of a second and concurrent callers do not retry in
+    lockstep. A Retry-After longer than `max_retry_after` is not waited out:
+    the error goes to the caller, which can fall back or answer right away.
+    Neither is a wait that would outlast the running turn's deadline.
+
+    Args:
+        name: Label for logs and the retry counter ("llm", "weather", ...)
+        attempts: Most calls made in total, the first one included
+        base_delay: Cap of the first backoff in seconds (doubles per retry)
+        max_delay: Largest backoff cap in seconds
+        max_retry_after: Longest Retry-After in seconds that is waited out
+    """
+    def __init__(self, name: str, attempts: int = RETRY_ATTEMPTS, base_delay: float = RETRY_BASE_DELAY,
+                 max_delay: float = RETRY_MAX_DELAY, max_retry_after: float = RETRY_MAX_RETRY_AFTER):
+        self.name = name
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+
+    def delay(self, attempt: int, error, no_retry: tuple = ()) -> float:
+        """
+        Seconds to wait before the next try, or None to give up
+
+        Args:
+            attempt: Number of the call that just failed (1 for the first)
+            error: The ServiceError it failed with
+            no_retry: Error types not to retry here (e.g. rate limits when another model can take the call)
+        """
+        if not error.retryable or isinstance(error, no_retry) or attempt >= self.attempts:
+            return None
+        if error.retry_after is not None:
+            wait = error.retry_after if error.retry_after <= self.max_retry_after else None
+        else:
+            wait = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        budget = remaining()
+        if wait is not None and budget is not None and wait >= budget:
+            return None
+        return wait
+
+    def call(self, func, no_retry: tuple = ()):
+        """
+        Call func() until it succeeds or the policy gives up
+
+        Raises:
+            ServiceError: The typed error of the last failed call
+            Exception: Anything that is not a service failure, unchanged and not retried
+        """
+        attempt = 1
+        while True:
+            try:
+                return func()
+            except SERVICE_EXCEPTIONS as e:
+                error = classify_error(e)
+                wait = self.delay(attempt, error, no_retry)
+                if wait is None:
+                    if error is e:
+                        raise
+                    raise error from e
+                self.record_retry(attempt, error, wait)
+                time.sleep(wait)
+                attempt += 1
+
+    async def acall(self, func, no_retry: tuple = ()):
+        """Async version of call(); func() returns an awaitable"""
+        attempt = 1
+        while True:
+            try:
+                return await func()
+            except SERVICE_EXCEPTIONS as e:
+                error = classify_error(e)
+                wait = self.delay(attempt, error, no_retry)
+                if wait is None:
+                    if error is e:
+                        raise
+                    raise error from e
+                self.record_retry(attempt, error, wait)
+                await asyncio.sleep(wait)
+                attempt += 1
+
+    def record_retry(self, attempt: int, error, wait: float):
+        """Log and count a retry"""
+        logger.warning(f"{self.name} call failed ({type(error).__name__}: {error}), retry {attempt} of {self.attempts - 1} in {wait:.2f}s")
+        get_metrics().counter("travel_retries_total", "Calls retried after a transient failure").inc(
+            service=self.name, error=type(error).__name__)
@@ -1,95 +1,184 @@
 # router.py - Decision/classification/extraction logic using LLMService
+import hashlib
 import json
 import logging
+import re
 from apis import LLMService
+from cache import TTLCache
+from config import ROUTER_CACHE_TTL, ROUTER_CACHE_MAX_ENTRIES, ROUTER_FAST_PATH_ENABLED, DEADLINE_ROUTER_MIN
+from conversation_state import ConversationState
+from deadline import record_degradation, remaining
+from fast_path import get_fast_classifier
 from prompts import UNIFIED_ANALYSIS_PROMPT
+from tracing import set_attribute
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+ANALYSIS_SYSTEM_MESSAGE = "You are a travel assistant analyzing questions for classification, weather needs, and location extraction. Consider conversation context when available."
+
+# Reasons marking a default analysis produced because the LLM call failed - never memoized
+RATE_LIMIT_FALLBACK_REASON = "Rate limit error - using fallback analysis"
+LLM_ERROR_FALLBACK_REASON = "LLM error - using default analysis"
+ANALYSIS_ERROR_REASON = "Analysis error"
+DEADLINE_FALLBACK_REASON = "Deadline - no time for an analysis"
+FALLBACK_REASONS = {RATE_LIMIT_FALLBACK_REASON, LLM_ERROR_FALLBACK_REASON, ANALYSIS_ERROR_REASON, DEADLINE_FALLBACK_REASON}
+
+# Analysis results shared by every Router in the process
+_analysis_cache = TTLCache(ttl=ROUTER_CACHE_TTL, max_entries=ROUTER_CACHE_MAX_ENTRIES, name="router")
+
 class Router:
-    def __init__(self):
-        """Initialize the router with LLM service"""
-        self.llm_service = LLMService()
+    def __init__(self, analysis_cache: TTLCache = None, fast_classifier=None):
+        """Initialize the router with the router-stage LLM service and, if enabled, the local fast path"""
+        self.llm_service = LLMService.for_stage("router")
+        self.analysis_cache = analysis_cache if analysis_cache is not None else _analysis_cache
+        if fast_classifier is None and ROUTER_FAST_PATH_ENABLED:
+            fast_classifier = get_fast_classifier()
+        self.fast_classifier = fast_classifier
     
-    def analyze_question(self, user_message: str, conversation_history: list = None) -> dict:
+    def analyze_question(self, user_message: str, conversation_state: ConversationState = None) -> dict:
         """
         Unified analysis: classification, weather decision, and location extraction in one call
         
+        Under a turn deadline with less than DEADLINE_ROUTER_MIN seconds left,
+        only the fast path and cached analyses are used, never the LLM.
+        
         Args:
             user_message: User's input message
-            conversation_history: Optional conversation history for context
+            conversation_state: Slot state of the conversation so far, for follow-up questions
             
         Returns:
             Dictionary with all analysis results
         """
         try:
-            # Prepare unified analysis prompt with conversation context
-            if conversation_history:
-                # Include recent conversation context for better analysis
-                context_messages = conversation_history[-4:]  # Last 4 messages (2 exchanges)
-                context_text = "\n".join([f"{msg['role']}: {msg['content']}" for msg in context_messages])
-                logger.info(f"Using conversation context: {context_text}")
-                analysis_prompt = UNIFIED_ANALYSIS_PROMPT.format(user_message=user_message, context=context_text)
-            else:
-                logger.info("No conversation history available")
-                analysis_prompt = UNIFIED_ANALYSIS_PROMPT.format(user_message=user_message, context="")
+            fast_analysis = self._fast_path(user_message, conversation_state)
+            if fast_analysis:
+                return fast_analysis
             
-            # Get analysis from LLM
-            result = self.llm_service.run_json(
-                system="You are a travel assistant analyzing questions for classification, weather needs, and location extraction. Consider conversation context when available.",
-                user=analysis_prompt
-            )
+            context_text = self._context_text(conversation_state)
+            cache_key = self._cache_key(user_message, context_text)
+            if self._short_of_time():
+                return self._deadline_analysis(cache_key)
             
-            logger.info(f"Unified Analysis JSON Response: {result}")
+            def analyze():
+                analysis_prompt = self._build_analysis_prompt(user_message, context_text)
+                
+                # Get analysis from LLM
+                result = self.llm_service.run_json(
+                    system=ANALYSIS_SYSTEM_MESSAGE,
+                    user=analysis_prompt
+                )
+                
+                return self._normalize_analysis(result)
             
-            # Check for rate limit error
-            if "error" in result and result["error"] == "rate_limit":
-                logger.error(f"Rate limit error in analysis: {result.get('message', 'Unknown error')}")
-                # Temporarily return a default analysis instead of rate limit error
-                return {
-                    "category": "GENERAL",
-                    "needs_weather": False,
-                    "mode": "none",
-                    "city": "",
-                    "country": "",
-                    "when": "",
-                    "needs_clarification": True,  # Default to clarification for safety
-                    "confidence": 0.0,
-                    "reason": "Rate limit error - using fallback analysis"
-                }
+            # Identical questions in the same context reuse one analysis; failures are not cached
+            return dict(self.analysis_cache.get_or_load(cache_key, analyze, should_cache=self._is_cacheable))
             
-            # Normalize the result with defaults
-            normalized_result = {
-                "category": result.get("category", "GENERAL"),
-                "needs_weather": result.get("needs_weather", False),
-                "mode": result.get("mode", "none"),
-                "city": result.get("city", ""),
-                "country": result.get("country", ""),
-                "when": result.get("when", ""),
-                "needs_clarification": result.get("needs_clarification", False),
-                "confidence": float(result.get("confidence", 0.0)),
-                "reason": result.get("reason", "No reason provided")
-            }
+        except Exception as e:
+            logger.error(f"Unified Analysis Error: {e}")
+            return self._error_analysis()
+    
+    async def aanalyze_question(self, user_message: str, conversation_state: ConversationState = None) -> dict:
+        """
+        Async version of analyze_question()
+        
+        Args:
+            user_message: User's input message
+            conversation_state: Slot state of the conversation so far, for follow-up questions
+            
+        Returns:
+            Dictionary with all analysis results
+        """
+        try:
+            fast_analysis = self._fast_path(user_message, conversation_state)
+            if fast_analysis:
+                return fast_analysis
             
-            # Validate category
-            valid_categories = ["DESTINATION", "COMPLEX_REASONING", "PACKING", "ATTRACTIONS", "WEATHER", "GENERAL"]
-            if normalized_result["category"] not in valid_categories:
-                logger.warning(f"Invalid category: {normalized_result['category']}, defaulting to GENERAL")
-                normalized_result["category"] = "GENERAL"
+            context_text = self._context_text(conversation_state)
+            cache_key = self._cache_key(user_message, context_text)
+            if self._short_of_time():
+                return self._deadline_analysis(cache_key)
+            cached = self.analysis_cache.get(cache_key)
+            if cached is not None:
+                logger.info("Using cached analysis")
+                return dict(cached)
             
-            # Validate weather mode
-            valid_modes = ["current", "forecast", "climate", "none"]
-            if normalized_result["mode"] not in valid_modes:
-                logger.warning(f"Invalid weather mode: {normalized_result['mode']}, defaulting to none")
-                normalized_result["mode"] = "none"
+            analysis_prompt = self._build_analysis_prompt(user_message, context_text)
             
-            logger.info(f"Analysis: {normalized_result['category']}, weather: {normalized_result['needs_weather']} ({normalized_result['mode']}), location: {normalized_result.get('city', normalized_result.get('country', 'unknown'))}, clarification: {normalized_result['needs_clarification']}")
+            result = await self.llm_service.arun_json(
+                system=ANALYSIS_SYSTEM_MESSAGE,
+                user=analysis_prompt
+            )
             
-            return normalized_result
+            analysis = self._normalize_analysis(result)
+            if self._is_cacheable(analysis):
+                self.analysis_cache.set(cache_key, analysis)
+            return dict(analysis)
             
         except Exception as e:
             logger.error(f"Unified Analysis Error: {e}")
+            return self._error_analysis()
+    
+    def _fast_path(self, user_message: str, conversation_state: ConversationState = None):
+        """Local analysis for easy questions, or None when the LLM has to decide"""
+        if self.fast_classifier is None:
+            return None
+        analysis = self.fast_classifier.classify(user_message, conversation_state)
+        set_attribute("router", "fast_path" if analysis else "llm")
+        if analysis:
+            logger.info(f"Fast path analysis: {analysis['category']}, weather: {analysis['needs_weather']} ({analysis['mode']}), location: {analysis['city'] or analysis['country']}, {analysis['reason']}")
+        return analysis
+    
+    def _short_of_time(self) -> bool:
+        """Whether the turn's deadline leaves too little time for an LLM analysis"""
+        budget = remaining()
+        return budget is not None and budget < DEADLINE_ROUTER_MIN
+    
+    def _deadline_analysis(self, cache_key: str) -> dict:
+        """A cached analysis if there is one, otherwise the default analysis, without calling the LLM"""
+        cached = self.analysis_cache.get(cache_key)
+        if cached is not None:
+            logger.info("Deadline: using the cached analysis")
+            return dict(cached)
+        record_degradation("router", "skipped")
+        analysis = self._error_analysis()
+        analysis["reason"] = DEADLINE_FALLBACK_REASON
+        return analysis
+    
+    def _context_text(self, conversation_state: ConversationState = None) -> str:
+        """Conversation context used by the analysis: the compact slot state, never raw messages"""
+        if conversation_state is None:
+            return ""
+        return conversation_state.to_context()
+    
+    def _cache_key(self, user_message: str, context_text: str) -> str:
+        """Memo key: canonical message plus a hash of the context the analysis sees"""
+        canonical = " ".join(re.sub(r"[^\w\s]", " ", user_message.lower()).split())
+        context_hash = hashlib.sha1(context_text.encode("utf-8")).hexdigest()
+        return f"{canonical}|{context_hash}"
+    
+    def _is_cacheable(self, analysis: dict) -> bool:
+        """Only real LLM analyses are memoized, never fallbacks produced by errors"""
+        return analysis.get("reason") not in FALLBACK_REASONS
+    
+    def _build_analysis_prompt(self, user_message: str, context_text: str) -> str:
+        """Prepare unified analysis prompt with conversation context"""
+        if context_text:
+            # Include recent conversation context for better analysis
+            logger.info(f"Using conversation context: {context_text}")
+            return UNIFIED_ANALYSIS_PROMPT.format(user_message=user_message, context=context_text)
+        
+        logger.info("No conversation history available")
+        return UNIFIED_ANALYSIS_PROMPT.format(user_message=user_message, context="")
+    
+    def _normalize_analysis(self, result: dict) -> dict:
+        """Validate the raw LLM analysis and fill in defaults"""
+        logger.info(f"Unified Analysis JSON Response: {result}")
+        
+        # Check for rate limit error
+        if "error" in result and result["error"] == "rate_limit":
+            logger.error(f"Rate limit error in analysis: {result.get('message', 'Unknown error')}")
+            # Temporarily return a default analysis instead of rate limit error
             return {
                 "category": "GENERAL",
                 "needs_weather": False,
@@ -97,7 +186,50 @@ class Router:
                 "city": "",
                 "country": "",
                 "when": "",
-                "needs_clarification": False,
+                "needs_clarification": True,  # Default to clarification for safety
                 "confidence": 0.0,
-                "reason": "Analysis error"
-            }
\ No newline at end of file
+                "reason": RATE_LIMIT_FALLBACK_REASON
+            }
+        
+        # Normalize the result with defaults
+        normalized_result = {
+            "category": result.get("category", "GENERAL"),
+            "needs_weather": result.get("needs_weather", False),
+            "mode": result.get("mode", "none"),
+            "city": result.get("city", ""),
+            "country": result.get("country", ""),
+            "when": result.get("when", ""),
+            "needs_clarification": result.get("needs_clarification", False),
+            "confidence": float(result.get("confidence", 0.0)),
+            "reason": LLM_ERROR_FALLBACK_REASON if "error" in result else result.get("reason", "No reason provided")
+        }
+        
+        # Validate category
+        valid_categories = ["DESTINATION", "COMPLEX_REASONING", "PACKING", "ATTRACTIONS", "WEATHER", "GENERAL"]
+        if normalized_result["category"] not in valid_categories:
+            logger.warning(f"Invalid category: {normalized_result['category']}, defaulting to GENERAL")
+            normalized_result["category"] = "GENERAL"
+        
+        # Validate weather mode
+        valid_modes = ["current", "forecast", "climate", "none"]
+        if normalized_result["mode"] not in valid_modes:
+            logger.warning(f"Invalid weather mode: {normalized_result['mode']}, defaulting to none")
+            normalized_result["mode"] = "none"
+        
+        logger.info(f"Analysis: {normalized_result['category']}, weather: {normalized_result['needs_weather']} ({normalized_result['mode']}), location: {normalized_result.get('city', normalized_result.get('country', 'unknown'))}, clarification: {normalized_result['needs_clarification']}")
+        
+        return normalized_result
+    
+    def _error_analysis(self) -> dict:
+        """Default analysis returned when the analysis step itself fails"""
+        return {
+            "category": "GENERAL",
+            "needs_weather": False,
+            "mode": "none",
+            "city": "",
+            "country": "",
+            "when": "",
+            "needs_clarification": False,
+            "confidence": 0.0,
+            "reason": ANALYSIS_ERROR_REASON
+        }
@@ -0,0 +1,77 @@
+# services.py - Process-wide services shared by every conversation
+import threading
+
+from apis import LLMService, WeatherService
+from history import HistoryManager
+from router import Router
+from response_cache import get_response_cache
+from config import METRICS_PORT, RESPONSE_CACHE_ENABLED
+from metrics import get_metrics, start_metrics_server
+
+# Pipeline stages that call the LLM outside the router, each with its own model (see config.STAGE_MODELS)
+ANSWER_STAGES = ("generation", "clarification", "complex_reasoning", "summary")
+
+
+class AssistantServices:
+    """
+    The expensive parts of the assistant: LLM clients, weather service, router and caches
+
+    Create once per process and hand to every TravelAssistant; none of these
+    objects hold conversation state.
+
+    Args:
+        llm_service: Service for answer generation
+        llm_services: Services for other pipeline stages by name ("clarification", "complex_reasoning",
+                      "summary"); missing stages use the models configured in config.STAGE_MODELS
+        weather_service: Weather lookups (with their caches)
+        router: Question analysis (with its memo)
+        response_cache: Semantic answer cache, or None to disable it
+        history_manager: Token budget and rolling summaries of conversation history
+    """
+    def __init__(self, llm_service: LLMService = None, weather_service: WeatherService = None,
+                 router: Router = None, response_cache=None, history_manager: HistoryManager = None,
+                 llm_services: dict = None):
+        self.llm_services = dict(llm_services or {})
+        if llm_service is not None:
+            self.llm_services["generation"] = llm_service
+        for stage in ANSWER_STAGES:
+            if stage not in self.llm_services:
+                self.llm_services[stage] = LLMService.for_stage(stage)
+        self.llm_service = self.llm_services["generation"]
+        self.weather_service = weather_service or WeatherService()
+        self.router = router or Router()
+        if response_cache is None and RESPONSE_CACHE_ENABLED:
+            response_cache = get_response_cache()
+        self.response_cache = response_cache
+        self.history_manager = history_manager or HistoryManager(self.llm_services["summary"])
+
+
+_services = None
+_services_lock = threading.Lock()
+
+
+def get_shared_services() -> AssistantServices:
+    """Get the process-wide services, creating them on first use"""
+    global _services
+    with _services_lock:
+        if _services is None:
+            _services = AssistantServices()
+            register_cache_metrics(_services)
+            if METRICS_PORT:
+                start_metrics_server(METRICS_PORT)
+        return _services
+
+
+def register_cache_metrics(services: AssistantServices):
+    """Expose the hit/miss counters of every cache behind these services on /metrics"""
+    metrics = get_metrics()
+    weather = services.weather_service
+    if hasattr(weather, "cache"):
+        metrics.register_cache("weather", weather.cache.stats)
+        metrics.register_cache("geocode_lookups", weather.geocode_lookups.stats)
+        metrics.register_cache("geocode_store", lambda: {"hits": weather.geocode_store.hits, "misses": weather.geocode_store.misses})
+    metrics.register_cache("router", services.router.analysis_cache.stats)
+    if services.router.fast_classifier is not None:
+        metrics.register_cache("router_fast_path", services.router.fast_classifier.stats)
+    if services.response_cache is not None:
+        metrics.register_cache("response", services.response_cache.stats)
@@ -0,0 +1,42 @@
+# session.py - Lightweight per-conversation state (one per user / browser session)
+import threading
+import uuid
+
+from config import SHOW_CHAIN_OF_THOUGHT
+from conversation_state import ConversationState
+
+
+class ConversationSession:
+    """
+    Everything that belongs to a single conversation
+
+    Heavy, shareable objects (LLM clients, weather service, caches) live in
+    AssistantServices; a session only holds what must never leak between users.
+
+    Args:
+        session_id: Optional identifier (a random one is generated otherwise)
+        show_chain_of_thought: Show the reasoning steps of complex answers
+                               (SHOW_CHAIN_OF_THOUGHT by default)
+    """
+    def __init__(self, session_id: str = None, show_chain_of_thought: bool = None):
+        self.session_id = session_id or uuid.uuid4().hex
+        # A per-user setting: it survives clear() and never changes other sessions' prompts
+        self.show_chain_of_thought = SHOW_CHAIN_OF_THOUGHT if show_chain_of_thought is None else show_chain_of_thought
+        self.history = []
+        self.summary = ""  # Rolling summary of turns folded out of history (see history.py)
+        self.summary_pending = False
+        self.lock = threading.Lock()  # Guards history/summary against the background summarizer
+        self.state = ConversationState()  # Compact slots the router sees instead of raw messages
+        self.last_timing = {}
+        self.last_analysis = {}  # Router output for the latest turn
+        self.last_error = None  # ServiceError that kept the latest turn from being answered, if any
+
+    def clear(self):
+        """Start the conversation over"""
+        with self.lock:
+            self.history = []
+            self.summary = ""
+        self.state = ConversationState()
+        self.last_timing = {}
+        self.last_analysis = {}
+        self.last_error = None
@@ -0,0 +1,165 @@
+# stubs.py - Offline stand-ins for the Groq LLM, weather service and OpenWeatherMap HTTP API (benchmarks and load tests)
+import asyncio
+import json
+import time
+
+import requests
+
+# Canned router output used when a stub LLM receives the unified analysis prompt
+STUB_ANALYSIS = {
+    "category": "PACKING",
+    "needs_weather": True,
+    "mode": "climate",
+    "city": "Tokyo",
+    "country": "Japan",
+    "when": "December",
+    "needs_clarification": False
+}
+
+STUB_ANSWER = (
+    "Tokyo in December is cool and dry, with highs around 12°C.\n"
+    "* A warm coat\n* Layers\n* Comfortable walking shoes\n* Scarf and gloves"
+)
+
+
+class StubMessage:
+    """Minimal stand-in for a LangChain AIMessage"""
+    def __init__(self, content: str):
+        self.content = content
+
+
+class StubChatModel:
+    """
+    Drop-in replacement for ChatGroq that answers from canned text after a fixed delay
+
+    Args:
+        latency: Seconds to wait before answering (simulates provider latency)
+        analysis: JSON dict returned for router (analysis) prompts
+        answer: Text returned for every other prompt
+        token_delay: Seconds between streamed chunks after the first one
+    """
+    def __init__(self, latency: float = 0.5, analysis: dict = None, answer: str = STUB_ANSWER, token_delay: float = 0.0):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.analysis = analysis or STUB_ANALYSIS
+        self.answer = answer
+        self.max_tokens = None
+        self.calls = 0
+
+    def _reply(self, messages: list) -> StubMessage:
+        """Pick the canned reply for a message list"""
+        self.calls += 1
+        last = messages[-1]["content"] if messages else ""
+        if "Respond with ONLY this JSON format" in last:
+            return StubMessage(json.dumps(self.analysis))
+        return StubMessage(self.answer)
+
+    def invoke(self, messages: list, **kwargs) -> StubMessage:
+        time.sleep(self.latency)
+        return self._reply(messages)
+
+    async def ainvoke(self, messages: list, **kwargs) -> StubMessage:
+        await asyncio.sleep(self.latency)
+        return self._reply(messages)
+
+    def stream(self, messages: list, **kwargs):
+        time.sleep(self.latency)
+        for i, word in enumerate(self._reply(messages).content.split(" ")):
+            if i:
+                time.sleep(self.token_delay)
+            yield StubMessage(word if i == 0 else " " + word)
+
+    async def astream(self, messages: list, **kwargs):
+        await asyncio.sleep(self.latency)
+        for i, word in enumerate(self._reply(messages).content.split(" ")):
+            if i:
+                await asyncio.sleep(self.token_delay)
+            yield StubMessage(word if i == 0 else " " + word)
+
+
+class StubWeatherService:
+    """
+    Drop-in replacement for WeatherService that returns a fixed climate snapshot
+
+    Args:
+        latency: Seconds each lookup takes (simulates geocode + forecast round trips)
+    """
+    def __init__(self, latency: float = 0.2):
+        self.latency = latency
+        self.calls = 0
+
+    def get_weather(self, city: str, weather_type: str = "current", when: str = None) -> dict:
+        self.calls += 1
+        time.sleep(self.latency)
+        return {
+            'city': city,
+            'country': 'JP',
+            'type': weather_type,
+            'temperature': 9.5,
+            'min_temp': 5.0,
+            'max_temp': 12.0,
+            'description': 'clear sky',
+            'humidity': 55,
+            'message': f"{(when or 'Now').title()} in {city} typically has cold weather, possible snow; this is a seasonal snapshot based on forecast data."
+        }
+
+    async def aget_weather(self, city: str, weather_type: str = "current", when: str = None) -> dict:
+        return await asyncio.to_thread(self.get_weather, city, weather_type, when)
+
+
+def stub_forecast_payload(slots: int = 40, start: int = None, timezone: int = 0) -> dict:
+    """A /data/2.5/forecast response with `slots` 3-hour entries starting at `start` (the current slot by default)"""
+    start = start if start is not None else int(time.time()) // 10800 * 10800
+    entries = []
+    for i in range(slots):
+        rainy = i % 3 == 0
+        entries.append({
+            "dt": start + i * 10800,
+            "main": {"temp": 10 + i % 8, "temp_min": 9 + i % 8, "temp_max": 11 + i % 8, "humidity": 60 + i % 5},
+            "weather": [{"main": "Rain" if rainy else "Clear", "description": "light rain" if rainy else "clear sky"}],
+            "wind": {"speed": 3.0 + i % 4}
+        })
+    return {"cod": "200", "cnt": slots, "list": entries, "city": {"name": "Stub City", "country": "XX", "timezone": timezone}}
+
+
+class StubHTTPClient:
+    """
+    Drop-in replacement for PooledHTTPClient that answers OpenWeatherMap requests with canned JSON
+
+    Responses are real requests.Response objects, so WeatherService parses them
+    exactly as it would live ones.
+
+    Args:
+        latency: Seconds each request takes
+        payload: Forecast response body (stub_forecast_payload() by default)
+    """
+    def __init__(self, latency: float = 0.0, payload: dict = None):
+        self.latency = latency
+        self.forecast_body = json.dumps(payload or stub_forecast_payload()).encode("utf-8")
+        self.calls = 0
+
+    def get(self, url: str, params: dict = None, timeout=None, **kwargs) -> requests.Response:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response.encoding = "utf-8"
+        response.headers["Content-Type"] = "application/json"
+        if "/geo/" in url:
+            response._content = json.dumps([{"name": (params or {}).get("q", ""), "lat": 35.68, "lon": 139.69, "country": "JP"}]).encode("utf-8")
+        else:
+            response._content = self.forecast_body
+        return response
+
+    def close(self):
+        pass
+
+
+def use_stub_llm(services, model):
+    """Answer every LLM call behind the services (each stage, its fallback model and the router) with a stub"""
+    for llm_service in list(services.llm_services.values()) + [services.router.llm_service]:
+        llm_service.llm = model
+        if llm_service.fallback_llm is not None:
+            llm_service.fallback_llm = model
@@ -0,0 +1,374 @@
+# temporal.py - Resolve time expressions ("this weekend", "next Tuesday", "mid-July", "Christmas") to date ranges
+import calendar
+import re
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import NamedTuple
+
+# Days the 5-day / 3-hour forecast reaches, today included
+FORECAST_DAYS = 5
+# Longest range still answered from forecast slots; longer ones ("July", "summer") are climate questions
+MAX_FORECAST_RANGE_DAYS = 14
+
+_WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+_MONTHS = ("january", "february", "march", "april", "may", "june", "july", "august",
+           "september", "october", "november", "december")
+# Abbreviations that are not also common words ("mar", "may" and "jun" are left out)
+_MONTH_ABBREVIATIONS = {"jan": 1, "feb": 2, "apr": 4, "jul": 7, "aug": 8, "sep": 9, "sept": 9, "oct": 10, "nov": 11, "dec": 12}
+_MONTH_NUMBERS = {**{name: i + 1 for i, name in enumerate(_MONTHS)}, **_MONTH_ABBREVIATIONS}
+# A `when` that is nothing but a month name is a date even when the name is also a word
+_WHOLE_MONTH_NUMBERS = {**_MONTH_NUMBERS, "mar": 3, "jun": 6}
+_NUMBER_WORDS = {"a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+                 "eight": 8, "nine": 9, "ten": 10, "couple of": 2, "a couple of": 2, "few": 3, "a few": 3}
+# Northern hemisphere meteorological seasons by first month; the southern hemisphere is shifted by six months
+_SEASON_STARTS = {"spring": 3, "summer": 6, "autumn": 9, "fall": 9, "winter": 12}
+_SEASON_OF_MONTH = {12: "winter", 1: "winter", 2: "winter", 3: "spring", 4: "spring", 5: "spring",
+                    6: "summer", 7: "summer", 8: "summer", 9: "autumn", 10: "autumn", 11: "autumn"}
+_OPPOSITE_SEASON = {"winter": "summer", "summer": "winter", "spring": "autumn", "autumn": "spring"}
+
+_MONTH = r"(?P<month>" + "|".join(sorted(_MONTH_NUMBERS, key=len, reverse=True)) + r")\.?"
+_NUMBER = r"(?P<number>\d+|an?|one|two|three|four|five|six|seven|eight|nine|ten|(?:a )?couple of|(?:a )?few)"
+_YEAR = r"(?:,? (?P<year>20\d\d))?"
+# "may", "march" and "fall" are also verbs and nouns: read as dates only after one of these words
+# ("in the fall" counts, "the fall of Rome" does not)
+_LEAD = r"(?:(?P<lead>in|during|early|late|mid|around|this|next|last|for|until|through|by|of|from) (?:the )?|the )"
+_AMBIGUOUS = {"may", "march", "fall"}
+
+
+class Period(NamedTuple):
+    """
+    A resolved time expression
+
+    Attributes:
+        start: First day of the range
+        end: Last day of the range (inclusive)
+        text: The expression as written
+        now: The expression means the present moment ("now", "today", "tonight")
+        season: The season the user named ("summer"), if any
+    """
+    start: date
+    end: date
+    text: str
+    now: bool = False
+    season: str = None
+
+    @property
+    def days(self) -> int:
+        return (self.end - self.start).days + 1
+
+    def mode(self, today: date, last_forecast_day: date = None) -> str:
+        """
+        Weather mode that answers a question about this period
+
+        Args:
+            today: The location's current date
+            last_forecast_day: Last day the forecast covers (FORECAST_DAYS from today by default)
+
+        Returns:
+            "current" for the present, "forecast" for a short range the forecast
+            reaches, "climate" for anything further out or longer
+        """
+        if self.now:
+            return "current"
+        last_forecast_day = last_forecast_day or today + timedelta(days=FORECAST_DAYS - 1)
+        if self.end >= today and self.start <= last_forecast_day and self.days <= MAX_FORECAST_RANGE_DAYS:
+            return "forecast"
+        return "climate"
+
+    def season_in(self, southern: bool = False) -> str:
+        """Season of the period at a location (the named one, or that of its middle month)"""
+        if self.season:
+            return self.season
+        return season_of((self.start + (self.end - self.start) / 2).month, southern)
+
+
+def _number(text: str) -> int:
+    return int(text) if text.isdigit() else _NUMBER_WORDS[text.lower()]
+
+
+def _month_end(year: int, month: int) -> date:
+    return date(year, month, calendar.monthrange(year, month)[1])
+
+
+def _upcoming(build, today: date, year: int = None):
+    """The period build(year) this year, or next year once it is over (an explicit year is kept)"""
+    if year:
+        return build(year)
+    start, end = build(today.year)
+    return (start, end) if end >= today else build(today.year + 1)
+
+
+def _easter(year: int) -> date:
+    """Easter Sunday (anonymous Gregorian algorithm)"""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month = (h + l - 7 * m + 114) // 31
+    day = (h + l - 7 * m + 114) % 31 + 1
+    return date(year, month, day)
+
+
+def _thanksgiving(year: int) -> date:
+    """US Thanksgiving: fourth Thursday of November"""
+    first = date(year, 11, 1)
+    return first + timedelta(days=(3 - first.weekday()) % 7 + 21)
+
+
+# Fixed or computed holidays -> (year -> (start, end)); the apostrophe is optional when matching
+_HOLIDAYS = {
+    "christmas eve": lambda y: (date(y, 12, 24), date(y, 12, 24)),
+    "christmas day": lambda y: (date(y, 12, 25), date(y, 12, 25)),
+    "christmas": lambda y: (date(y, 12, 24), date(y, 12, 26)),
+    "new year's eve": lambda y: (date(y, 12, 31), date(y, 12, 31)),
+    "new year's day": lambda y: (date(y, 1, 1), date(y, 1, 1)),
+    "new year's": lambda y: (date(y - 1, 12, 31), date(y, 1, 1)),
+    "new year": lambda y: (date(y - 1, 12, 31), date(y, 1, 1)),
+    "halloween": lambda y: (date(y, 10, 31), date(y, 10, 31)),
+    "valentine's day": lambda y: (date(y, 2, 14), date(y, 2, 14)),
+    "easter": lambda y: (_easter(y) - timedelta(days=2), _easter(y) + timedelta(days=1)),
+    "thanksgiving": lambda y: (_thanksgiving(y), _thanksgiving(y) + timedelta(days=3)),
+}
+_HOLIDAY_BUILDERS = {name.replace("'", ""): build for name, build in _HOLIDAYS.items()}
+
+
+def _now(m, today):
+    return today, today, {"now": True}
+
+
+def _relative_day(m, today):
+    offset = 2 if m.group(0).lower().startswith(("the day after", "day after")) else 1
+    day = today + timedelta(days=offset)
+    return day, day, {}
+
+
+def _weekend(m, today):
+    # The coming Saturday and Sunday (the current weekend on a Saturday or Sunday); "next weekend" is the one after
+    saturday = today + timedelta(days=(5 - today.weekday()) % 7) if today.weekday() < 6 else today - timedelta(days=1)
+    if (m.group("which") or "").lower() in ("next", "following"):
+        saturday += timedelta(days=7)
+    return max(saturday, today), saturday + timedelta(days=1), {}
+
+
+def _weekday(m, today):
+    # "Tuesday" / "this Tuesday": the next one (today included); "next Tuesday": the one in the following week
+    target = _WEEKDAYS.index(m.group("weekday").lower())
+    which = (m.group("which") or "").lower()
+    if which in ("next", "following"):
+        day = today - timedelta(days=today.weekday()) + timedelta(days=7 + target)
+    else:
+        day = today + timedelta(days=(target - today.weekday()) % 7)
+    return day, day, {}
+
+
+def _in_n(m, today):
+    n = _number(m.group("number"))
+    if m.group("unit").lower().startswith("week"):
+        start = today + timedelta(days=7 * n)
+        return start, start + timedelta(days=6), {}
+    day = today + timedelta(days=n)
+    return day, day, {}
+
+
+def _next_n_days(m, today):
+    n = _number(m.group("number")) if m.group("number") else 3  # "the coming days"
+    days = n * 7 if m.group("unit").lower().startswith("week") else n
+    return today, today + timedelta(days=max(1, days) - 1), {}
+
+
+def _week(m, today):
+    monday = today - timedelta(days=today.weekday())
+    if m.group("which").lower() == "this":
+        return today, monday + timedelta(days=6), {}
+    return monday + timedelta(days=7), monday + timedelta(days=13), {}
+
+
+def _month_relative(m, today):
+    if m.group("which").lower() == "this":
+        return today, _month_end(today.year, today.month), {}
+    year, month = (today.year + 1, 1) if today.month == 12 else (today.year, today.month + 1)
+    return date(year, month, 1), _month_end(year, month), {}
+
+
+def _month_part(m, today):
+    month = _MONTH_NUMBERS[m.group("month").lower()]
+    part = m.group("part").lower()
+    year = int(m.group("year")) if m.group("year") else None
+
+    def build(y):
+        last = _month_end(y, month).day
+        if part in ("early", "beginning of", "start of"):
+            return date(y, month, 1), date(y, month, 10)
+        if part.startswith("mid"):
+            return date(y, month, 11), date(y, month, 20)
+        return date(y, month, 21), date(y, month, last)
+    start, end = _upcoming(build, today, year)
+    return start, end, {}
+
+
+def _day_of_month(m, today):
+    month = _MONTH_NUMBERS[m.group("month").lower()]
+    day = int(m.group("day"))
+    year = int(m.group("year")) if m.group("year") else None
+    if day > calendar.monthrange(year or today.year, month)[1]:
+        return None
+    start, end = _upcoming(lambda y: (date(y, month, day), date(y, month, day)), today, year)
+    return start, end, {}
+
+
+def _month(m, today):
+    month = _WHOLE_MONTH_NUMBERS[m.group("month").lower()]
+    year = int(m.group("year")) if m.group("year") else None
+    start, end = _upcoming(lambda y: (date(y, month, 1), _month_end(y, month)), today, year)
+    return start, end, {}
+
+
+def _iso_date(m, today):
+    try:
+        day = date(int(m.group("year")), int(m.group("month")), int(m.group("day")))
+    except ValueError:
+        return None
+    return day, day, {}
+
+
+def _season(m, today):
+    season = m.group("season").lower()
+    season = "autumn" if season == "fall" else season
+    first_month = _SEASON_STARTS[season]
+    year = int(m.group("year")) if m.group("year") else None
+
+    def build(y):
+        # Winter starts in December of the year before the one it mostly falls in
+        start_year = y - 1 if first_month == 12 else y
+        end_month = (first_month + 1) % 12 + 1
+        end_year = start_year + 1 if end_month < first_month else start_year
+        return date(start_year, first_month, 1), _month_end(end_year, end_month)
+    start, end = _upcoming(build, today, year)
+    return start, end, {"season": season}
+
+
+def _holiday(m, today):
+    name = re.sub(r"['’]", "", m.group("holiday").lower())
+    year = int(m.group("year")) if m.group("year") else None
+    start, end = _upcoming(_HOLIDAY_BUILDERS[name], today, year)
+    return start, end, {}
+
+
+def _compile(pattern: str):
+    return re.compile(pattern, re.IGNORECASE)
+
+
+# (words that must appear, pattern, handler); a handler returns (start, end, extra Period fields) or None.
+# The expression is the "expr" group when there is one (without lead words), otherwise the whole match.
+# Patterns whose words are absent are not run, so a question without dates costs one word split.
+_MONTH_WORDS = frozenset(_MONTH_NUMBERS)
+_PATTERNS = [
+    ({"now", "currently", "moment", "today", "tonight", "morning", "afternoon", "evening"},
+     _compile(r"\b(?P<expr>right now|currently|at the moment|now|today|tonight|this (?:morning|afternoon|evening))\b"), _now),
+    ({"tomorrow"}, _compile(r"\b(?:the )?day after tomorrow\b"), _relative_day),
+    ({"tomorrow", "day"}, _compile(r"\b(?:tomorrow|next day)\b"), _relative_day),
+    ({"weekend"}, _compile(r"\b(?:(?P<which>this|next|coming|following) )?weekend\b"), _weekend),
+    (set(_WEEKDAYS), _compile(r"\b(?:(?P<which>this|next|coming|following|on) )?(?P<weekday>" + "|".join(_WEEKDAYS) + r")\b"), _weekday),
+    ({"day", "days", "week", "weeks"}, _compile(r"\bin " + _NUMBER + r" (?P<unit>days?|weeks?)\b"), _in_n),
+    ({"day", "days", "week", "weeks"}, _compile(r"\b" + _NUMBER + r" (?P<unit>days?|weeks?) from (?:now|today)\b"), _in_n),
+    ({"days", "weeks"}, _compile(r"\b(?:the )?(?:next|coming|following) (?:" + _NUMBER + r" )?(?P<unit>days|weeks)\b"), _next_n_days),
+    ({"week"}, _compile(r"\b(?P<which>this|next|coming) week\b"), _week),
+    ({"month"}, _compile(r"\b(?P<which>this|next|coming) month\b"), _month_relative),
+    (None, _compile(r"\b(?P<year>20\d\d)-(?P<month>\d\d)-(?P<day>\d\d)\b"), _iso_date),
+    (_MONTH_WORDS, _compile(r"\b(?P<part>early|mid|late|end of|beginning of|start of)[- ]" + _MONTH + _YEAR + r"\b"), _month_part),
+    (_MONTH_WORDS, _compile(r"\b" + _MONTH + r" (?P<day>\d{1,2})(?:st|nd|rd|th)?" + _YEAR + r"\b"), _day_of_month),
+    (_MONTH_WORDS, _compile(r"\b(?P<day>\d{1,2})(?:st|nd|rd|th)? (?:of )?" + _MONTH + _YEAR + r"\b"), _day_of_month),
+    (_MONTH_WORDS, _compile(r"\b" + _LEAD + r"?(?P<expr>" + _MONTH + _YEAR + r")\b"), _month),
+    (set(_SEASON_STARTS), _compile(r"\b" + _LEAD + r"?(?P<expr>(?:early |late |mid-?)?(?P<season>spring|summer|autumn|fall|winter)" + _YEAR + r")\b"), _season),
+    ({"christmas", "new", "halloween", "valentine", "valentines", "easter", "thanksgiving"},
+     _compile(r"\b(?P<holiday>" + "|".join(re.escape(h).replace("'", "['’]?") for h in sorted(_HOLIDAYS, key=len, reverse=True)) + r")" + _YEAR + r"\b"), _holiday),
+]
+_WORDS = re.compile(r"[a-z]+")
+# A bare duration ("3 days") is a date only when it is the whole expression, as in the router's `when`;
+# so is a month or season on its own ("May", "Mar", "fall"), which in a sentence needs a lead word
+_BARE_EXPRESSIONS = [
+    (_compile(r"^\s*(?:the )?" + _NUMBER + r" (?P<unit>days?|weeks?)\s*$"), _next_n_days),
+    (_compile(r"^\s*(?:the )?(?P<month>" + "|".join(sorted(_WHOLE_MONTH_NUMBERS, key=len, reverse=True)) + r")\.?" + _YEAR + r"\s*$"), _month),
+    (_compile(r"^\s*(?:the )?(?:early |late |mid-?)?(?P<season>spring|summer|autumn|fall|winter)" + _YEAR + r"\s*$"), _season),
+]
+# Resolutions are immutable and questions repeat (and every turn resolves `when` again): keep recent ones
+_RESOLVED_CACHE_SIZE = 4096
+
+
+def find_period(text: str, today: date = None):
+    """
+    The first time expression in a text, resolved to a date range
+
+    Args:
+        text: A question or a `when` value ("this weekend", "in 3 days", "mid-July", "Christmas", ...)
+        today: Reference date (the location's current date; date.today() by default)
+
+    Returns:
+        Tuple of (start offset, end offset, Period), or None if the text has no time expression
+    """
+    if not text:
+        return None
+    return _find_period(text, today or date.today())
+
+
+@lru_cache(maxsize=_RESOLVED_CACHE_SIZE)
+def _find_period(text: str, today: date):
+    words = set(_WORDS.findall(text.lower()))
+    best = None
+    for triggers, pattern, handler in _PATTERNS:
+        if triggers is not None and words.isdisjoint(triggers):
+            continue
+        for m in pattern.finditer(text):
+            groups = m.groupdict()
+            span = m.span("expr") if groups.get("expr") is not None else m.span()
+            word = (groups.get("month") or groups.get("season") or "").lower()
+            if word in _AMBIGUOUS and not (groups.get("lead") or groups.get("year")) and handler in (_month, _season):
+                continue  # "you may", "leaves fall"
+            if best is not None and (span[0], -span[1]) >= (best[0], -best[1]):
+                break
+            resolved = handler(m, today)
+            if resolved is None:
+                continue
+            start, end, extra = resolved
+            best = (span[0], span[1], Period(start, end, text[span[0]:span[1]], **extra))
+            break
+    return best
+
+
+def resolve_period(when: str, today: date = None):
+    """
+    Resolve a time reference such as the router's `when` field
+
+    Args:
+        when: Time reference ("tomorrow", "next Tuesday", "3 days", "December", ...)
+        today: Reference date (the location's current date; date.today() by default)
+
+    Returns:
+        Period, or None if it is not recognized
+    """
+    if not when:
+        return None
+    return _resolve_period(when, today or date.today())
+
+
+@lru_cache(maxsize=_RESOLVED_CACHE_SIZE)
+def _resolve_period(when: str, today: date):
+    found = _find_period(when, today)
+    if found:
+        return found[2]
+    for pattern, handler in _BARE_EXPRESSIONS:
+        m = pattern.match(when)
+        if m:
+            start, end, extra = handler(m, today)
+            return Period(start, end, when.strip(), **extra)
+    return None
+
+
+def season_of(month: int, southern: bool = False) -> str:
+    """Meteorological season of a month in either hemisphere"""
+    season = _SEASON_OF_MONTH[month]
+    return _OPPOSITE_SEASON[season] if southern else season
@@ -1,6 +1,6 @@
 # test_debug.py - Test script to demonstrate Chain of Thought functionality
-import os
 from assistant import TravelAssistant
+from session import ConversationSession
 
 def test_chain_of_thought():
     """Test and demonstrate chain of thought functionality"""
@@ -27,10 +27,9 @@ def test_chain_of_thought():
     print()
     
     # Test 1: Normal Mode (Final Answer Only)
-    print("1. NORMAL MODE (SHOW_CHAIN_OF_THOUGHT=false)")
+    print("1. NORMAL MODE (show_chain_of_thought=False)")
     print("-" * 50)
-    os.environ["SHOW_CHAIN_OF_THOUGHT"] = "false"
-    assistant_normal = TravelAssistant()
+    assistant_normal = TravelAssistant(session=ConversationSession(show_chain_of_thought=False))
     
     response_normal = assistant_normal.get_response(test_question)
     print("Response (Final Answer Only):")
@@ -38,10 +37,9 @@ def test_chain_of_thought():
     print()
     
     # Test 2: Debug Mode (Thinking Process Only)
-    print("2. DEBUG MODE (SHOW_CHAIN_OF_THOUGHT=true)")
+    print("2. DEBUG MODE (show_chain_of_thought=True)")
     print("-" * 50)
-    os.environ["SHOW_CHAIN_OF_THOUGHT"] = "true"
-    assistant_debug = TravelAssistant()
+    assistant_debug = TravelAssistant(session=ConversationSession(show_chain_of_thought=True))
     
     response_debug = assistant_debug.get_response(test_question)
     print("Response (Thinking Process Only):")
@@ -1,147 +1,342 @@
-# test_run.py - Batch test suite for Travel Assistant
+# test_run.py - Batch test suite for Travel Assistant (parallel runner with a JSON latency/routing report)
+import argparse
+import json
 import logging
+import os
+import sys
 import time
-from assistant import TravelAssistant
-
-# Set up logging for test suite (separate from CLI)
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('travel_assistant_test.log'),
-        logging.FileHandler('travel_assistant_test.log', encoding='utf-8'),
-        logging.StreamHandler()
-    ],
-    force=True  # Override any existing logging configuration
-)
 
 logger = logging.getLogger(__name__)
 
-def run_test_suite():
-    """Run comprehensive test suite for Travel Assistant"""
-    
-    # Initialize the assistant
+# Test questions organized by expected router category
+TEST_QUESTIONS = {
+    "DESTINATION": [
+        "Is it a good time to visit Rome in May?",
+        "Should I go to Thailand in August?",
+        "What are the best cities to visit in Japan?",
+        "Is December a good month to go to New York?",
+        "Which European country is best to visit in winter?",
+        "What are the safest destinations in South America?",
+        "Where should I go for a beach vacation in September?",
+        "Should I visit Iceland in November?"
+    ],
+
+    "COMPLEX_REASONING": [
+        # Chain of thought questions
+        "Where should I go for vacation?",
+        "What do you recommend for a trip?",
+        "Best places to visit?",
+        "Where should I go for a romantic getaway?",
+        "Best places to travel with kids?",
+        "Where should I go for an adventure trip?",
+        "What's the best destination for a solo traveler?",
+        "Where should I go for a cultural experience?"
+    ],
+
+    "PACKING": [
+        "What should I pack for Tokyo in December?",
+        "I'm going to Iceland next week, what clothes should I bring?",
+        "What should I pack for a 5-day hiking trip in the Alps?",
+        "Do I need warm clothes for Lisbon in April?",
+        "Should I bring a raincoat for London in October?",
+        "What should I pack for a beach holiday in Greece?",
+        "What essentials do I need for a road trip across the US?",
+        "Do I need adapters for my electronics in the UK?",
+        # Open-ended questions that should trigger clarification
+        "What should I pack?",
+        "What do I need for my trip?",
+        "Packing list?",
+        "What should I bring?"
+    ],
+
+    "ATTRACTIONS": [
+        "What are the top attractions in Paris?",
+        "Tell me about the Louvre.",
+        "What are the best restaurants in London?",
+        "What can I do in Barcelona at night?",
+        "What museums should I see in Berlin?",
+        "What are the hidden gems in Lisbon?",
+        "Is the Colosseum in Rome worth a visit?",
+        "What are the best things to do in Bali?",
+        # Open-ended questions that should trigger clarification
+        "What should I see in Rome?",
+        "What to do in Tokyo?",
+        "Best attractions in Paris?",
+        "What can I do in London?"
+    ],
+
+    # "WEATHER": [
+    #     "What is the weather like in Paris tomorrow?",
+    #     "Is it raining in London right now?",
+    #     "Should I expect snow in New York in January?",
+    #     "What is the average temperature in Madrid in July?",
+    #     "Will it be hot in Dubai in August?",
+    #     "How cold will it be in Moscow in winter?",
+    #     "Do I need an umbrella in Singapore this week?",
+    #     "Is there hurricane season in Miami in September?"
+    # ],
+
+    # "GENERAL": [
+    #     "Can I travel from New York to London?",
+    #     "How do I get to Tokyo airport?",
+    #     "What is the history of Athens?",
+    #     "How many hours does it take to fly from Los Angeles to Sydney?",
+    #     "What currency is used in Morocco?",
+    #     "Do I need a visa to visit Canada?",
+    #     "How expensive is Switzerland compared to France?",
+    #     "What language is spoken in Brazil?"
+    # ]
+}
+
+BACKENDS = ["live", "record", "replay", "stub"]
+
+
+def setup_logging():
+    """Log the suite to travel_assistant_test.log and the console (separate from the CLI log)"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(threadName)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('travel_assistant_test.log', encoding='utf-8'),
+            logging.StreamHandler()
+        ],
+        force=True  # Override any existing logging configuration
+    )
+
+
+def make_services(backend: str, llm_latency: float, weather_latency: float):
+    """
+    Create the services the suite runs against
+
+    Args:
+        backend: "live" (Groq + OpenWeatherMap), "record" (live, saved to cassettes), "replay"
+                 (offline, from cassettes) or "stub" (offline, canned answers and router output)
+        llm_latency: Stub LLM latency in seconds
+        weather_latency: Stub weather latency in seconds
+    """
+    if backend == "stub":
+        # Imported here so its offline settings (dummy keys, no throttling) apply before config loads
+        os.environ["BACKEND_MODE"] = "live"  # The stubs replace the backends themselves
+        os.environ.setdefault("ROUTER_FAST_PATH_ENABLED", "true")  # Routing is what this suite reports
+        from bench_async import make_services as make_stub_services
+        return make_stub_services(llm_latency, weather_latency)
+
+    # config reads BACKEND_MODE on import, which has not happened yet
+    os.environ["BACKEND_MODE"] = backend
+    from services import AssistantServices
+    return AssistantServices()
+
+
+def percentile(values: list, pct: float) -> float:
+    """Linear-interpolated percentile of a list of numbers (None for an empty list)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(results: list) -> dict:
+    """Latency percentiles, routing accuracy, fast path rate and error count for a list of question results"""
+    latencies = [r["latency"] for r in results if not r["error"]]
+    ttfts = [r["ttft"] for r in results if r["ttft"] is not None and not r["error"]]
+    routed = [r for r in results if r["routed_category"]]
+    matches = sum(1 for r in routed if r["routed_category"] == r["category"])
+    router_categories = {}
+    for r in routed:
+        router_categories[r["routed_category"]] = router_categories.get(r["routed_category"], 0) + 1
+    return {
+        "count": len(results),
+        "errors": sum(1 for r in results if r["error"]),
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "mean": sum(latencies) / len(latencies) if latencies else None,
+        "ttft_p50": percentile(ttfts, 50),
+        "router_accuracy": matches / len(routed) if routed else None,
+        "router_categories": router_categories,
+        "fast_path_rate": sum(1 for r in results if r.get("fast_path")) / len(results) if results else None,
+        "clarifications": sum(1 for r in results if r["clarification"])
+    }
+
+
+def run_test_suite(backend: str = "live", workers: int = 4, llm_latency: float = 0.5, weather_latency: float = 0.2,
+                   categories: list = None, deadline: float = None) -> dict:
+    """
+    Run the test questions concurrently and build a report
+
+    Every question is a fresh conversation, so questions never see each
+    other's history and can run on separate workers.
+
+    Args:
+        backend: Which backend to run against (see make_services)
+        workers: Number of questions answered at the same time
+        llm_latency: Stub LLM latency in seconds
+        weather_latency: Stub weather latency in seconds
+        categories: Only run these categories (all by default)
+        deadline: Latency budget of each turn in seconds (TURN_DEADLINE by default)
+
+    Returns:
+        Report dict with per-question results, per-category and overall summaries
+    """
+    services = make_services(backend, llm_latency, weather_latency)
+    from assistant import TravelAssistant
+    from fast_path import FAST_PATH_REASON
+
+    questions = [
+        (category, question)
+        for category, category_questions in TEST_QUESTIONS.items()
+        if not categories or category in categories
+        for question in category_questions
+    ]
+
     logger.info("=" * 80)
-    logger.info("STARTING TRAVEL ASSISTANT TEST SUITE")
+    logger.info(f"STARTING TRAVEL ASSISTANT TEST SUITE ({len(questions)} questions, backend={backend}, workers={workers})")
     logger.info("=" * 80)
-    
-    assistant = TravelAssistant()
-    
-    # Test questions organized by category
-    test_questions = {
-        "DESTINATION": [
-            "Is it a good time to visit Rome in May?",
-            "Should I go to Thailand in August?",
-            "What are the best cities to visit in Japan?",
-            "Is December a good month to go to New York?",
-            "Which European country is best to visit in winter?",
-            "What are the safest destinations in South America?",
-            "Where should I go for a beach vacation in September?",
-            "Should I visit Iceland in November?"
-        ],
-        
-        "COMPLEX_REASONING": [
-            # Chain of thought questions
-            "Where should I go for vacation?",
-            "What do you recommend for a trip?",
-            "Best places to visit?",
-            "Where should I go for a romantic getaway?",
-            "Best places to travel with kids?",
-            "Where should I go for an adventure trip?",
-            "What's the best destination for a solo traveler?",
-            "Where should I go for a cultural experience?"
-        ],
-        
-        "PACKING": [
-            "What should I pack for Tokyo in December?",
-            "I'm going to Iceland next week, what clothes should I bring?",
-            "What should I pack for a 5-day hiking trip in the Alps?",
-            "Do I need warm clothes for Lisbon in April?",
-            "Should I bring a raincoat for London in October?",
-            "What should I pack for a beach holiday in Greece?",
-            "What essentials do I need for a road trip across the US?",
-            "Do I need adapters for my electronics in the UK?",
-            # Open-ended questions that should trigger clarification
-            "What should I pack?",
-            "What do I need for my trip?",
-            "Packing list?",
-            "What should I bring?"
-        ],
-        
-        "ATTRACTIONS": [
-            "What are the top attractions in Paris?",
-            "Tell me about the Louvre.",
-            "What are the best restaurants in London?",
-            "What can I do in Barcelona at night?",
-            "What museums should I see in Berlin?",
-            "What are the hidden gems in Lisbon?",
-            "Is the Colosseum in Rome worth a visit?",
-            "What are the best things to do in Bali?",
-            # Open-ended questions that should trigger clarification
-            "What should I see in Rome?",
-            "What to do in Tokyo?",
-            "Best attractions in Paris?",
-            "What can I do in London?"
-        ],
-        
-        # "WEATHER": [
-        #     "What is the weather like in Paris tomorrow?",
-        #     "Is it raining in London right now?",
-        #     "Should I expect snow in New York in January?",
-        #     "What is the average temperature in Madrid in July?",
-        #     "Will it be hot in Dubai in August?",
-        #     "How cold will it be in Moscow in winter?",
-        #     "Do I need an umbrella in Singapore this week?",
-        #     "Is there hurricane season in Miami in September?"
-        # ],
-        
-        # "GENERAL": [
-        #     "Can I travel from New York to London?",
-        #     "How do I get to Tokyo airport?",
-        #     "What is the history of Athens?",
-        #     "How many hours does it take to fly from Los Angeles to Sydney?",
-        #     "What currency is used in Morocco?",
-        #     "Do I need a visa to visit Canada?",
-        #     "How expensive is Switzerland compared to France?",
-        #     "What language is spoken in Brazil?"
-        # ]
+
+    assistant = TravelAssistant(services=services)
+    sessions = {}
+    requests = [(f"q{i}", question) for i, (_, question) in enumerate(questions)]
+
+    start_time = time.perf_counter()
+    responses = assistant.get_responses(requests, max_workers=workers, sessions=sessions, deadline=deadline)
+    elapsed = time.perf_counter() - start_time
+
+    results = []
+    for (session_id, question), (category, _), response in zip(requests, questions, responses):
+        session = sessions[session_id]
+        analysis = session.last_analysis or {}
+        error = not response or session.last_error is not None
+        results.append({
+            "category": category,
+            "question": question,
+            "routed_category": analysis.get("category"),
+            "clarification": bool(analysis.get("needs_clarification")),
+            "fast_path": str(analysis.get("reason", "")).startswith(FAST_PATH_REASON),
+            "latency": session.last_timing.get("total"),
+            "ttft": session.last_timing.get("ttft"),
+            "error": error,
+            "response": response
+        })
+        logger.info(f"[{category} -> {analysis.get('category')}] {question} ({session.last_timing.get('total', 0):.2f}s){' ERROR' if error else ''}")
+
+    by_category = {}
+    for r in results:
+        by_category.setdefault(r["category"], []).append(r)
+
+    # A replayed request without a recording means the cassettes are out of date, not a slow or failing backend
+    misses = []
+    if backend == "replay":
+        from cassettes import cassette_misses
+        misses = cassette_misses()
+
+    report = {
+        "backend": backend,
+        "workers": workers,
+        "deadline": deadline,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "elapsed": elapsed,
+        "throughput": len(results) / elapsed if elapsed else None,
+        "overall": summarize(results),
+        "categories": {category: summarize(rs) for category, rs in by_category.items()},
+        "cassette_misses": misses,
+        "questions": results
     }
-    
-    total_questions = sum(len(questions) for questions in test_questions.values())
-    current_question = 0
-    
-    # Run tests for each category
-    for category, questions in test_questions.items():
-        logger.info(f"\n{'='*20} TESTING {category} CATEGORY {'='*20}")
-        
-        for i, question in enumerate(questions, 1):
-            current_question += 1
-            logger.info(f"\n--- Question {current_question}/{total_questions} ({category} #{i}) ---")
-            logger.info(f"Question: {question}")
-            
-            try:
-                start_time = time.time()
-                response = assistant.get_response(question)
-                end_time = time.time()
-                
-                logger.info(f"Response: {response}")
-                logger.info(f"Response time: {end_time - start_time:.2f} seconds")
-                
-                # Clear history between questions to avoid context bleeding
-                assistant.clear_history()
-                
-            except Exception as e:
-                logger.error(f"Error processing question: {e}")
-                logger.error(f"Question: {question}")
-            
-            # Small delay between questions to be respectful to APIs (only for batch testing)
-            time.sleep(2.0)  # 2 second delay for batch testing to avoid rate limits
-    
-    logger.info("\n" + "=" * 80)
-    logger.info("TEST SUITE COMPLETED")
+
+    logger.info("=" * 80)
+    logger.info(f"TEST SUITE COMPLETED: {len(results)} questions in {elapsed:.2f}s")
     logger.info("=" * 80)
-    logger.info(f"Total questions tested: {total_questions}")
-    logger.info("Check 'travel_assistant_test.log' for detailed logs")
+    return report
+
+
+def compare_to_baseline(report: dict, baseline: dict, tolerance: float) -> dict:
+    """
+    Compare a report with a saved one
+
+    A category regresses when its p95 latency grows by more than `tolerance`
+    (a fraction), its router accuracy drops, or it has more errors.
+
+    Returns:
+        {"categories": {category: deltas}, "regressions": [descriptions]}
+    """
+    comparison = {"categories": {}, "regressions": []}
+    sections = dict(report["categories"], overall=report["overall"])
+    baseline_sections = dict(baseline.get("categories", {}), overall=baseline.get("overall", {}))
+    for name, current in sections.items():
+        previous = baseline_sections.get(name)
+        if not previous:
+            continue
+        deltas = {}
+        for metric in ("p50", "p95", "p99", "router_accuracy", "errors"):
+            if current.get(metric) is not None and previous.get(metric) is not None:
+                deltas[metric] = current[metric] - previous[metric]
+        comparison["categories"][name] = deltas
+
+        if previous.get("p95") and current.get("p95") is not None and current["p95"] > previous["p95"] * (1 + tolerance):
+            comparison["regressions"].append(f"{name}: p95 {previous['p95']:.2f}s -> {current['p95']:.2f}s")
+        if deltas.get("router_accuracy", 0) < 0:
+            comparison["regressions"].append(f"{name}: router accuracy {previous['router_accuracy']:.0%} -> {current['router_accuracy']:.0%}")
+        if deltas.get("errors", 0) > 0:
+            comparison["regressions"].append(f"{name}: errors {previous['errors']} -> {current['errors']}")
+    return comparison
+
+
+def print_report(report: dict):
+    """Print the per-category summary table"""
+    def fmt(value, pattern="{:.2f}"):
+        return "-" if value is None else pattern.format(value)
+
+    print(f"\n{report['overall']['count']} questions in {report['elapsed']:.2f}s (backend={report['backend']}, workers={report['workers']})")
+    print(f"{'category':<18} {'n':>3} {'err':>4} {'p50(s)':>7} {'p95(s)':>7} {'p99(s)':>7} {'router':>7} {'fast':>5}")
+    for name, s in list(report["categories"].items()) + [("overall", report["overall"])]:
+        print(f"{name:<18} {s['count']:>3} {s['errors']:>4} {fmt(s['p50']):>7} {fmt(s['p95']):>7} {fmt(s['p99']):>7} {fmt(s['router_accuracy'], '{:.0%}'):>7} {fmt(s.get('fast_path_rate'), '{:.0%}'):>5}")
+
+    comparison = report.get("baseline_comparison")
+    if comparison:
+        print("\nChange vs baseline (p95 seconds, router accuracy):")
+        for name, deltas in comparison["categories"].items():
+            print(f"  {name:<18} p95 {fmt(deltas.get('p95'), '{:+.2f}')}  router {fmt(deltas.get('router_accuracy'), '{:+.0%}')}")
+        for regression in comparison["regressions"]:
+            print(f"  REGRESSION {regression}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the Travel Assistant test questions and report latency and routing")
+    parser.add_argument("--workers", type=int, default=4, help="Questions answered at the same time")
+    parser.add_argument("--backend", choices=BACKENDS, default="live", help="live APIs, live with recording, cassette replay, or offline stubs (canned router output)")
+    parser.add_argument("--categories", help="Comma-separated categories to run (default: all)")
+    parser.add_argument("--output", default="test_report.json", help="Where to write the JSON report")
+    parser.add_argument("--baseline", help="Earlier report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed p95 slowdown vs the baseline (fraction)")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Stub LLM latency in seconds")
+    parser.add_argument("--weather-latency", type=float, default=0.2, help="Stub weather latency in seconds")
+    parser.add_argument("--deadline", type=float, help="Latency budget of each turn in seconds (default: TURN_DEADLINE)")
+    args = parser.parse_args()
+
+    setup_logging()
+    categories = args.categories.split(",") if args.categories else None
+    report = run_test_suite(args.backend, args.workers, args.llm_latency, args.weather_latency, categories, args.deadline)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            report["baseline_comparison"] = compare_to_baseline(report, json.load(f), args.tolerance)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    print_report(report)
+    print(f"\nReport written to {os.path.abspath(args.output)}")
+
+    if report["cassette_misses"]:
+        print(f"\nFAILED: {len(report['cassette_misses'])} requests had no recording (re-record with --backend record):")
+        for miss in report["cassette_misses"]:
+            print(f"  {miss}")
+        sys.exit(1)
+    if report.get("baseline_comparison", {}).get("regressions"):
+        sys.exit(1)
+
 
 if __name__ == "__main__":
-    run_test_suite()
+    main()
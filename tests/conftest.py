@@ -0,0 +1,12 @@
+# conftest.py - Offline settings for the unit tests (dummy API keys, caches in a temporary directory)
+import os
+import sys
+import tempfile
+
+# config.py reads these on import and refuses to start without keys; no test talks to a real API
+os.environ.setdefault("GROQ_API_KEY", "test-no-key")
+os.environ.setdefault("WEATHER_API_KEY", "test-no-key")
+os.environ.setdefault("CACHE_DIR", tempfile.mkdtemp(prefix="travel-assistant-tests-"))
+
+# The modules live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,43 @@
+# test_deadline.py - A streamed turn closed from another thread or context unwinds its deadline cleanly
+import contextvars
+import threading
+
+from bench_async import make_assistant
+from deadline import current_deadline, deadline_scope
+
+
+def _close_in_thread(stream):
+    errors = []
+
+    def close():
+        try:
+            stream.close()
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=close)
+    thread.start()
+    thread.join()
+    return errors
+
+
+def test_scope_closed_from_another_context():
+    def stream():
+        with deadline_scope(30):
+            yield current_deadline()
+            yield None
+
+    chunks = stream()
+    assert next(chunks) is not None
+    contextvars.copy_context().run(chunks.close)
+    with deadline_scope(None):
+        assert current_deadline() is None
+
+
+def test_partly_consumed_stream_closed_from_another_thread():
+    assistant = make_assistant(llm_latency=0.0, weather_latency=0.0)
+    stream = assistant.stream_response("What should I pack for Rome?", deadline=30)
+    assert next(stream)
+    assert _close_in_thread(stream) == []
+    with deadline_scope(None):
+        assert current_deadline() is None
@@ -0,0 +1,28 @@
+# test_hedging.py - Failed attempts count towards the hedge delay, capped at the request timeout
+import time
+
+import pytest
+
+from hedging import Hedger
+
+
+def _slow_failure(seconds: float):
+    def call():
+        time.sleep(seconds)
+        raise TimeoutError("read timed out")
+    return call
+
+
+def test_failed_attempts_are_recorded():
+    hedger = Hedger("test", min_samples=1, default_delay=5.0, min_delay=0.0)
+    with pytest.raises(TimeoutError):
+        hedger.call(_slow_failure(0.05))
+    assert len(hedger._latencies) == 1
+    assert hedger.hedge_delay() >= 0.05
+
+
+def test_recorded_latency_is_capped_at_the_timeout():
+    hedger = Hedger("test", min_samples=1, default_delay=5.0, min_delay=0.0, timeout=0.01)
+    with pytest.raises(TimeoutError):
+        hedger.call(_slow_failure(0.05))
+    assert list(hedger._latencies) == [pytest.approx(0.01)]
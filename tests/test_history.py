@@ -0,0 +1,30 @@
+# test_history.py - A summary that crashes still releases the session for the next summary
+import pytest
+
+from errors import ServerError
+from history import HistoryManager
+from session import ConversationSession
+
+
+class FailingLLM:
+    def __init__(self, error: Exception):
+        self.error = error
+
+    def run(self, system_prompt, user_message, max_tokens=None):
+        raise self.error
+
+
+@pytest.mark.parametrize("error", [ServerError("502 Bad Gateway"), KeyError("choices")])
+def test_failed_summary_releases_the_session(error):
+    manager = HistoryManager(FailingLLM(error), token_budget=50, keep_tokens=10)
+    session = ConversationSession()
+    session.history = [{"role": "user", "content": "word " * 40}, {"role": "assistant", "content": "word " * 40},
+                       {"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}]
+    folded = session.history[:2]
+    session.summary_pending = True
+
+    manager._summarize(session, folded, None)
+
+    assert session.summary_pending is False
+    assert manager.summary_failures == 1
+    assert session.summary == ""
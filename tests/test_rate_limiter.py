@@ -0,0 +1,37 @@
+# test_rate_limiter.py - A failed LLM call gives its token reservation back
+import pytest
+
+from apis import LLMService
+from errors import ServerError
+from rate_limiter import RateLimiter
+from retry_policy import RetryPolicy
+
+
+class FailingChatModel:
+    """Chat model stand-in whose every call fails before producing text"""
+    def invoke(self, messages, **params):
+        raise ServerError("502 Bad Gateway")
+
+    def stream(self, messages, **params):
+        raise ServerError("502 Bad Gateway")
+        yield
+
+
+@pytest.fixture
+def service():
+    service = LLMService("test-model", retry_policy=RetryPolicy("test", attempts=3, base_delay=0))
+    service.llm = FailingChatModel()
+    service.rate_limiter = RateLimiter(requests_per_minute=600, tokens_per_minute=10000)
+    return service
+
+
+def test_failed_call_refunds_its_reservation(service):
+    with pytest.raises(ServerError):
+        service.run("system", "user", max_tokens=2000)
+    assert service.rate_limiter._tokens == pytest.approx(10000, abs=50)
+
+
+def test_failed_stream_refunds_its_reservation(service):
+    with pytest.raises(ServerError):
+        list(service.stream("system", "user", max_tokens=2000))
+    assert service.rate_limiter._tokens == pytest.approx(10000, abs=50)
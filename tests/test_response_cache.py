@@ -0,0 +1,37 @@
+# test_response_cache.py - Paraphrases share a cached answer; questions with other qualifiers or places do not
+import pytest
+
+from response_cache import SemanticResponseCache
+
+PARTITION = SemanticResponseCache.partition_key("ATTRACTIONS", "Paris")
+
+
+@pytest.fixture
+def cache():
+    return SemanticResponseCache()
+
+
+@pytest.mark.parametrize("cached, asked", [
+    ("What are the top attractions in Paris?", "Which are the best sights in Paris?"),
+    ("Tell me the famous landmarks in Paris please", "best attractions in Paris"),
+    ("What should I pack for Rome?", "What should I bring to Rome?"),
+])
+def test_paraphrase_hits(cache, cached, asked):
+    cache.put(PARTITION, cached, "answer")
+    assert cache.get(PARTITION, asked) == "answer"
+
+
+@pytest.mark.parametrize("cached, asked", [
+    ("attractions in Paris", "attractions in Paris for kids"),
+    ("best attractions in Paris", "best free attractions in Paris"),
+    ("Should I visit Paris or Rome?", "Should I visit Rome or Paris?"),
+])
+def test_near_misses_are_not_served(cache, cached, asked):
+    cache.put(PARTITION, cached, "answer")
+    assert cache.get(PARTITION, asked) is None
+    assert cache.get(PARTITION, cached) == "answer"
+
+
+def test_other_partition_misses(cache):
+    cache.put(PARTITION, "What are the top attractions in Paris?", "answer")
+    assert cache.get(SemanticResponseCache.partition_key("ATTRACTIONS", "Rome"), "What are the top attractions in Paris?") is None
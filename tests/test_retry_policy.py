@@ -0,0 +1,52 @@
+# test_retry_policy.py - Only service failures are classified and retried; bugs propagate unchanged
+import pytest
+import requests
+
+from circuit_breaker import CircuitBreaker
+from errors import RequestError, ServerError
+from retry_policy import RetryPolicy
+
+
+def _failing(exceptions, result="ok"):
+    """A call that raises the given exceptions in turn, then returns result"""
+    calls = []
+
+    def call():
+        calls.append(1)
+        if len(calls) <= len(exceptions):
+            raise exceptions[len(calls) - 1]
+        return result
+    return call, calls
+
+
+def test_transient_service_failures_are_retried():
+    call, calls = _failing([requests.exceptions.ConnectionError("reset"), requests.exceptions.ConnectionError("reset")])
+    assert RetryPolicy("test", attempts=3, base_delay=0).call(call) == "ok"
+    assert len(calls) == 3
+
+
+def test_last_service_failure_is_raised_as_a_typed_error():
+    call, calls = _failing([requests.exceptions.ConnectionError("reset")] * 3)
+    with pytest.raises(ServerError) as raised:
+        RetryPolicy("test", attempts=2, base_delay=0).call(call)
+    assert len(calls) == 2
+    assert isinstance(raised.value.__cause__, requests.exceptions.ConnectionError)
+
+
+def test_typed_error_is_not_its_own_cause():
+    error = RequestError("401 Unauthorized", status_code=401)
+    call, _ = _failing([error])
+    breaker = CircuitBreaker("test")
+    with pytest.raises(RequestError) as raised:
+        breaker.call(lambda: RetryPolicy("test", attempts=3, base_delay=0).call(call))
+    assert raised.value is error
+    assert raised.value.__cause__ is None
+
+
+@pytest.mark.parametrize("bug", [TypeError("bad argument"), KeyError("content"), AttributeError("no attribute")])
+def test_bugs_are_not_classified_or_retried(bug):
+    call, calls = _failing([bug])
+    with pytest.raises(type(bug)) as raised:
+        RetryPolicy("test", attempts=3, base_delay=0).call(call)
+    assert raised.value is bug
+    assert len(calls) == 1
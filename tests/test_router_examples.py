@@ -0,0 +1,19 @@
+# test_router_examples.py - The fast-path training examples stay separate from the test_run.py questions
+import csv
+import re
+
+from fast_path import EXAMPLES_PATH
+from test_run import TEST_QUESTIONS
+
+
+def _normalized(question: str) -> str:
+    return " ".join(re.findall(r"[a-z0-9]+", question.lower()))
+
+
+def test_training_examples_do_not_contain_test_questions():
+    """test_run.py reports routing accuracy and fast path rate: trained-on questions would only measure recall"""
+    with open(EXAMPLES_PATH, newline="", encoding="utf-8") as f:
+        examples = {_normalized(row["question"]) for row in csv.DictReader(f)}
+    questions = {_normalized(q): q for category_questions in TEST_QUESTIONS.values() for q in category_questions}
+    overlap = sorted(q for key, q in questions.items() if key in examples)
+    assert not overlap, f"test_run.py questions found in {EXAMPLES_PATH}: {overlap}"
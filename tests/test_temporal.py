@@ -0,0 +1,38 @@
+# test_temporal.py - A month or season that is the whole `when` resolves; in a sentence it needs a lead word
+from datetime import date
+
+import pytest
+
+from temporal import find_period, resolve_period
+
+TODAY = date(2026, 10, 17)
+
+
+@pytest.mark.parametrize("when, start, end, season", [
+    ("May", date(2027, 5, 1), date(2027, 5, 31), "spring"),
+    ("March", date(2027, 3, 1), date(2027, 3, 31), "spring"),
+    ("Mar", date(2027, 3, 1), date(2027, 3, 31), "spring"),
+    ("Fall", date(2026, 9, 1), date(2026, 11, 30), "autumn"),
+    ("the fall", date(2026, 9, 1), date(2026, 11, 30), "autumn"),
+])
+def test_bare_month_or_season(when, start, end, season):
+    period = resolve_period(when, TODAY)
+    assert (period.start, period.end) == (start, end)
+    assert period.season_in() == season
+    assert period.mode(TODAY) == "climate"
+
+
+@pytest.mark.parametrize("text", ["you may like it", "when the leaves fall", "march to the castle", "the fall of Rome",
+                                  "is the may pole up", "join the march downtown"])
+def test_ambiguous_words_in_a_sentence(text):
+    assert find_period(text, TODAY) is None
+    assert resolve_period(text, TODAY) is None
+
+
+@pytest.mark.parametrize("text, start", [
+    ("in May", date(2027, 5, 1)),
+    ("Is Kyoto nice in the fall?", date(2026, 9, 1)),
+    ("during the march holidays", date(2027, 3, 1)),
+])
+def test_lead_word_makes_it_a_date(text, start):
+    assert resolve_period(text, TODAY).start == start
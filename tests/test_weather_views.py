@@ -0,0 +1,40 @@
+# test_weather_views.py - Weather views answer from a stale forecast whose slots are all in the past
+import time
+
+import pytest
+
+from apis import WeatherService
+from daily_forecast import DailyForecast
+
+
+@pytest.fixture
+def stale_service():
+    """A WeatherService whose cached forecast ended a day ago"""
+    start = int(time.time()) // 10800 * 10800 - 6 * 86400
+    payload = {"city": {"timezone": 0}, "list": [
+        {"dt": start + i * 10800, "main": {"temp": 10.0 + i % 4, "humidity": 70}, "pop": 0.2, "wind": {"speed": 3.0},
+         "weather": [{"description": "light rain"}]} for i in range(40)]}
+    forecast = DailyForecast(payload)
+    service = WeatherService.__new__(WeatherService)
+    service._geocode = lambda city: (48.8, 2.3, "FR")
+    service._get_forecast = lambda lat, lon: forecast
+    return service
+
+
+@pytest.mark.parametrize("when", [None, "later on"])
+def test_forecast_of_a_stale_payload(stale_service, when):
+    weather = stale_service.get_weather("Paris", "forecast", when)
+    assert weather["type"] == "forecast"
+    assert weather["temperature"] == 13.0
+    assert "does not cover" in weather["message"]
+
+
+def test_climate_of_a_stale_payload(stale_service):
+    weather = stale_service.get_weather("Paris", "climate")
+    assert weather["type"] == "climate"
+    assert "does not cover" in weather["message"]
+
+
+def test_days_past_a_stale_payload_get_the_climate_view(stale_service):
+    weather = stale_service.get_weather("Paris", "forecast", "tomorrow")
+    assert weather["type"] == "climate"
@@ -0,0 +1,26 @@
+# tokens.py - Local token estimation (no tokenizer download or API call needed)
+import re
+
+# Words, numbers and single punctuation marks are the units BPE tokenizers split on
+_TOKEN_PIECES = re.compile(r"\w+|[^\w\s]")
+
+# Chat formats add a few tokens per message for role markers and separators
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate how many tokens a text uses
+
+    Every word or punctuation mark counts as at least one token, and long
+    words count one token per 4 characters, which is close to what Llama
+    tokenizers produce for English text.
+    """
+    if not text:
+        return 0
+    return sum((len(piece) + 3) // 4 for piece in _TOKEN_PIECES.findall(text))
+
+
+def estimate_message_tokens(messages: list) -> int:
+    """Estimate the prompt tokens of a list of {"role", "content"} messages"""
+    return sum(estimate_tokens(msg.get("content", "")) + MESSAGE_OVERHEAD_TOKENS for msg in messages)
@@ -0,0 +1,196 @@
+# tracing.py - Per-request traces with timed, nested spans, exported as JSON and to the metrics histograms
+import contextvars
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+from config import TRACE_EXPORT_PATH, TRACE_BUFFER_SIZE
+from metrics import get_metrics
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# The trace and innermost open span of the running request. Context variables follow
+# the request into asyncio tasks and asyncio.to_thread workers.
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+_recent = deque(maxlen=TRACE_BUFFER_SIZE)
+_export_lock = threading.Lock()
+
+
+class Span:
+    """One timed stage of a request"""
+    def __init__(self, name: str, parent=None, attributes: dict = None):
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:8]
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes or {})
+        self.start = time.perf_counter()
+        self.duration = None
+
+    def set(self, key: str, value):
+        """Attach an attribute (cache hit, token counts, ...)"""
+        self.attributes[key] = value
+
+    def add(self, key: str, amount: float):
+        """Add to a numeric attribute"""
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+
+class Trace:
+    """
+    Everything recorded for one request: its spans, token counts and attributes
+
+    Args:
+        name: What the request was (e.g. "get_response")
+        attributes: Initial attributes (session ID, ...)
+    """
+    def __init__(self, name: str, attributes: dict = None):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.tokens = {"prompt": 0, "completion": 0}
+        self.spans = []
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.duration = None
+        self._lock = threading.Lock()
+
+    def add_span(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def to_dict(self) -> dict:
+        """JSON-ready view; span offsets and durations are in milliseconds"""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start)
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(self.started_at)) + f".{int(self.started_at % 1 * 1000):03d}Z",
+            "duration_ms": round(1000 * self.duration, 3) if self.duration is not None else None,
+            "attributes": self.attributes,
+            "tokens": dict(self.tokens),
+            "spans": [
+                {
+                    "name": s.name,
+                    "span_id": s.span_id,
+                    "parent_id": s.parent_id,
+                    "offset_ms": round(1000 * (s.start - self.start), 3),
+                    "duration_ms": round(1000 * s.duration, 3) if s.duration is not None else None,
+                    "attributes": s.attributes
+                }
+                for s in spans
+            ]
+        }
+
+
+def reset_context(var: contextvars.ContextVar, token):
+    """Restore a context variable; a generator closed from another context cannot, which is harmless"""
+    try:
+        var.reset(token)
+    except ValueError:
+        pass
+
+
+def current_trace():
+    """The running request's trace, or None outside a request"""
+    return _current_trace.get()
+
+
+def current_span():
+    """The innermost open span, or None"""
+    return _current_span.get()
+
+
+@contextmanager
+def start_trace(name: str, **attributes):
+    """
+    Trace everything that happens inside the block as one request
+
+    The finished trace is exported: kept in memory for /traces, appended to
+    TRACE_EXPORT_PATH (JSONL) if set, and its spans feed the stage histograms.
+    """
+    trace = Trace(name, attributes)
+    trace_token = _current_trace.set(trace)
+    span_token = _current_span.set(None)
+    try:
+        yield trace
+    finally:
+        trace.duration = time.perf_counter() - trace.start
+        reset_context(_current_span, span_token)
+        reset_context(_current_trace, trace_token)
+        _export(trace)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Time the block as a span of the current trace (timed for metrics even outside a trace)"""
+    trace = _current_trace.get()
+    current = Span(name, _current_span.get(), attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.set("error", type(e).__name__)
+        raise
+    finally:
+        current.duration = time.perf_counter() - current.start
+        reset_context(_current_span, token)
+        if trace is not None:
+            trace.add_span(current)
+        get_metrics().histogram("travel_stage_duration_seconds", "Time spent in each pipeline stage").observe(current.duration, stage=name)
+
+
+def set_attribute(key: str, value):
+    """Attach an attribute to the innermost open span (no-op outside one)"""
+    current = _current_span.get()
+    if current is not None:
+        current.set(key, value)
+
+
+def add_tokens(prompt_tokens: int, completion_tokens: int):
+    """Count an LLM call's tokens on the open span, the trace and the token counter"""
+    current = _current_span.get()
+    if current is not None:
+        current.add("prompt_tokens", prompt_tokens)
+        current.add("completion_tokens", completion_tokens)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.tokens["prompt"] += prompt_tokens
+        trace.tokens["completion"] += completion_tokens
+    counter = get_metrics().counter("travel_llm_tokens_total", "Estimated LLM tokens by kind")
+    counter.inc(prompt_tokens, kind="prompt")
+    counter.inc(completion_tokens, kind="completion")
+
+
+def recent_traces() -> list:
+    """The last TRACE_BUFFER_SIZE finished traces, oldest first"""
+    with _export_lock:
+        return list(_recent)
+
+
+def _export(trace: Trace):
+    """Record a finished trace in the buffer, the export file and the request metrics"""
+    record = trace.to_dict()
+    metrics = get_metrics()
+    metrics.histogram("travel_request_duration_seconds", "Total time per request").observe(trace.duration, name=trace.name)
+    if trace.attributes.get("ttft") is not None:
+        metrics.histogram("travel_time_to_first_token_seconds", "Time until the first answer chunk").observe(trace.attributes["ttft"], name=trace.name)
+    metrics.counter("travel_requests_total", "Requests by outcome").inc(name=trace.name, outcome=trace.attributes.get("outcome", "ok"))
+
+    line = json.dumps(record, ensure_ascii=False, default=str)
+    with _export_lock:
+        _recent.append(record)
+        if TRACE_EXPORT_PATH:
+            try:
+                with open(TRACE_EXPORT_PATH, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+            except OSError as e:
+                logger.warning(f"Could not export trace {trace.trace_id}: {e}")
+    logger.debug(line)